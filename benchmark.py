@@ -0,0 +1,332 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from fixture_server import LOGIN_COOKIE, LIST_PATH, start_server_process
+from http_fetch_engine import HttpFetchEngine, DISH_DETAIL_PATH, FOOD_DETAIL_PATH
+from detail_parser import (FIXTURE_DIR, make_soup, make_tree, has_content, extract_image_url,
+                           parse_dish_page, parse_food_page)
+from image_pipeline import ImageDownloader
+
+try:
+    import resource
+except ImportError:  # Windows无resource模块，不统计峰值内存
+    resource = None
+
+# ==================== 配置常量 ====================
+FIXTURE_COOKIE = {"name": LOGIN_COOKIE, "value": "fixture"}
+PARSERS = {"dish": parse_dish_page, "food": parse_food_page}
+
+
+def percentile(values, q):
+    """最近秩百分位数（values为空时返回None）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # macOS单位为字节，Linux为KB
+
+
+# ==================== 抓取引擎 ====================
+def http_fetcher(base_url, kind, workers):
+    """HTTP引擎：返回 (抓取函数, 清理函数)"""
+    engine = HttpFetchEngine(cookies=[{**FIXTURE_COOKIE, "domain": ""}], base_url=base_url, pool_size=workers)
+    return (engine.fetch_dish if kind == "dish" else engine.fetch_food), engine.close
+
+
+def selenium_fetcher(base_url, kind, workers):
+    """Selenium引擎：每个线程一个浏览器，加载页面后按页面源码解析（只测页面加载和解析，不含点击交互）"""
+    from selenium_get_nutrition_data import init_driver  # 依赖selenium和Chrome，只在使用时导入
+
+    local = threading.local()
+    drivers = []
+    lock = threading.Lock()
+    path = DISH_DETAIL_PATH if kind == "dish" else FOOD_DETAIL_PATH
+
+    def fetch(item_id):
+        driver = getattr(local, "driver", None)
+        if driver is None:
+            driver = local.driver = init_driver()
+            driver.get(f"{base_url}/login")
+            driver.add_cookie(FIXTURE_COOKIE)
+            with lock:
+                drivers.append(driver)
+        driver.get(f"{base_url}{path.format(dish_id=item_id, food_id=item_id)}")
+        tree = make_tree(driver.page_source)
+        if not has_content(tree):
+            return None
+        return PARSERS[kind](tree, item_id, extract_image_url(tree), "")
+
+    def close():
+        for driver in drivers:
+            driver.quit()
+
+    return fetch, close
+
+
+FETCHERS = {"http": http_fetcher, "selenium": selenium_fetcher}
+
+
+def run_case(case, result_queue):
+    """在独立进程中跑一组 (引擎, 线程数)，CPU和峰值内存只统计该组"""
+    server, base_url = start_server_process(**case["server"])
+    fetch, close = FETCHERS[case["engine"]](base_url, case["kind"], case["workers"])
+    latencies = []
+    counts = {"records": 0, "fallbacks": 0, "errors": 0}
+    lock = threading.Lock()
+
+    with tempfile.TemporaryDirectory() as image_dir:
+        downloader = ImageDownloader(image_dir, concurrency=case["workers"]) if case["images"] else None
+
+        def timed_fetch(item_id):
+            start = time.perf_counter()
+            try:
+                record = fetch(item_id)
+                key = "fallbacks" if record is None else "records"
+            except Exception:
+                record, key = None, "errors"
+            elapsed = time.perf_counter() - start
+            if record and downloader and record.image_url.startswith("http"):
+                downloader.submit(item_id, record.image_url)
+            with lock:
+                latencies.append(elapsed)
+                counts[key] += 1
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=case["workers"]) as executor:
+                list(executor.map(timed_fetch, case["ids"]))
+            image_failures = len(downloader.close()) if downloader else 0
+        finally:
+            close()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    server.terminate()
+    pages = len(case["ids"])
+    result_queue.put({
+        "engine": case["engine"],
+        "workers": case["workers"],
+        "pages": pages,
+        **counts,
+        "image_failures": image_failures,
+        "seconds": round(wall, 3),
+        "pages_per_sec": round(pages / wall, 1),
+        "records_per_sec": round(counts["records"] / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(cpu / wall * 100, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    })
+
+
+def run_crawl_benchmarks(engines, workers_list, kind="dish", count=200, images=True, **server_options):
+    """依次跑每个引擎和线程数的组合（每组使用新的进程和新的替身站点）"""
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        for workers in workers_list:
+            case = {"engine": engine, "workers": workers, "kind": kind, "ids": list(range(1, count + 1)),
+                    "images": images, "server": server_options}
+            result_queue = context.Queue()
+            process = context.Process(target=run_case, args=(case, result_queue))
+            process.start()
+            result = None
+            while result is None and process.is_alive():
+                try:
+                    result = result_queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+            process.join()
+            if result is None:
+                result = {"engine": engine, "workers": workers, "error": f"进程异常退出（退出码 {process.exitcode}）"}
+            print_result(result)
+            results.append(result)
+    return results
+
+
+def print_result(result):
+    if "error" in result:
+        print(f"❌ [{result['engine']} x{result['workers']}] {result['error']}")
+        return
+    print(f"⏱️ [{result['engine']} x{result['workers']}] {result['pages_per_sec']} 页/秒，"
+          f"{result['records_per_sec']} 条/秒，p50 {result['p50_ms']} ms，p95 {result['p95_ms']} ms，"
+          f"CPU {result['cpu_seconds']} 秒（{result['cpu_percent']}%），峰值内存 {result['peak_rss_mb']} MB，"
+          f"兜底 {result['fallbacks']}，失败 {result['errors']}")
+
+
+# ==================== 解析与清洗微基准 ====================
+def best_of(func, repeat=5):
+    """重复执行取最快一次的耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def fixture_pages(fixture_dir=FIXTURE_DIR):
+    pages = []
+    for filename in sorted(f for f in os.listdir(fixture_dir) if f.endswith(".html")):
+        with open(os.path.join(fixture_dir, filename), 'r', encoding='utf-8') as f:
+            pages.append((PARSERS["dish" if filename.startswith("dish") else "food"], f.read()))
+    return pages
+
+
+def fixture_records(kind, count):
+    """用语料中的完整详情页生成 count 条爬虫记录（ID递增）"""
+    with open(os.path.join(FIXTURE_DIR, f"{kind}_1.html"), 'r', encoding='utf-8') as f:
+        tree = make_tree(f.read())
+    template = PARSERS[kind](tree, 0, extract_image_url(tree), "").to_dict()
+    id_key = next(iter(template))
+    return [{**template, id_key: i} for i in range(1, count + 1)]
+
+
+def run_micro_benchmarks(rows=20000, rounds=200):
+    """解析和清洗各阶段的微基准，返回 {名称: 指标}"""
+    results = {}
+    pages = fixture_pages()
+
+    for name, build in (("parse_bs4", make_soup), ("parse_lxml", make_tree)):
+        def parse_all():
+            for _ in range(rounds):
+                for parse_page, html in pages:
+                    tree = build(html)
+                    parse_page(tree, 0, extract_image_url(tree), "")
+        seconds = best_of(parse_all, repeat=3)
+        results[name] = {"ms_per_page": round(seconds / (rounds * len(pages)) * 1000, 3)}
+
+    try:
+        import pandas as pd
+        from nutridata_data.nutrient_parser import combine_nutrient_text, parse_nutrients
+        from nutridata_data.category_matcher import match_categories
+        from stream_cleaner import StreamCleaner, RECORD_COLUMNS
+    except ImportError as e:
+        print(f"⚠️ 未安装清洗依赖，跳过清洗微基准：{e}")
+        return results
+
+    records = fixture_records("dish", rows)
+    df = pd.DataFrame.from_records(records).rename(columns=RECORD_COLUMNS["dish"])
+    texts = combine_nutrient_text(df, ["macronutrients", "vitamin", "minerals"])
+    seconds = best_of(lambda: parse_nutrients(texts), repeat=3)
+    results["parse_nutrients"] = {"rows_per_sec": round(rows / seconds)}
+
+    details = pd.DataFrame({"dish_name": [f"菜品{i % (rows // 2)}" for i in range(rows)],
+                            "energy_num": [float(i % 500) for i in range(rows)]})
+    categories = pd.DataFrame({"dish_name": details["dish_name"], "category": "热菜",
+                               "calorie": [f"{i % 500}.0kcal" for i in range(rows)]})
+    categories["pure_calorie"] = categories["calorie"].str.extract(r'(\d+\.?\d*)\s*kcal', expand=False).astype(float)
+    seconds = best_of(lambda: match_categories(details, categories, "dish_name", "dish_name", ["category"],
+                                               detail_energy="energy_num", category_energy="pure_calorie"), repeat=3)
+    results["match_categories"] = {"rows_per_sec": round(rows / seconds)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cleaner = StreamCleaner("dish", os.path.join(tmp, "bench.db"))
+        try:
+            seconds = best_of(lambda: cleaner.clean_chunk(records[:cleaner.chunk_size]), repeat=5)
+        finally:
+            cleaner.close()
+    results["stream_clean_chunk"] = {"rows_per_sec": round(cleaner.chunk_size / seconds)}
+
+    for name, metrics in results.items():
+        print(f"🔬 {name}: {metrics}")
+    return results
+
+
+def run_list_benchmarks(rounds=20):
+    """列表页解析的微基准：extract_single_page（菜品列表）、crawl_table_data（食物分类表格）
+
+    两者都通过WebDriver读取已渲染的页面，需要selenium和Chrome；浏览器打开替身站点的列表页一次后反复解析。
+    """
+    try:
+        import selenium_get_nutrition_category as dish_list
+        import selenium_get_nutrition_ingredient_category as food_category
+    except ImportError as e:
+        print(f"⚠️ 未安装selenium，跳过列表页微基准：{e}")
+        return {}
+
+    cases = [
+        ("extract_single_page", dish_list, "2", lambda driver: dish_list.extract_single_page(driver, 1)),
+        ("crawl_table_data", food_category, "1", lambda driver: food_category.crawl_table_data(driver, "谷类及制品", "小麦")),
+    ]
+    results = {}
+    server, base_url = start_server_process(require_login=False)
+    try:
+        for name, module, list_id, parse in cases:
+            try:
+                driver = module.init_driver()
+            except Exception as e:
+                driver = None
+                print(f"⚠️ 浏览器启动失败，跳过 {name}：{e}")
+            if not driver:
+                print(f"⚠️ 浏览器不可用，跳过 {name}")
+                continue
+            try:
+                driver.get(f"{base_url}{LIST_PATH}?id={list_id}&page=1")
+                rows = len(parse(driver))
+                seconds = best_of(lambda: [parse(driver) for _ in range(rounds)], repeat=3)
+                results[name] = {"ms_per_page": round(seconds / rounds * 1000, 2), "rows_per_page": rows}
+                print(f"🔬 {name}: {results[name]}")
+            finally:
+                driver.quit()
+    finally:
+        server.terminate()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线性能基准：本地替身站点 + 解析/清洗微基准")
+    parser.add_argument("--engines", nargs="+", default=["http"], choices=sorted(FETCHERS))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--kind", default="dish", choices=sorted(PARSERS))
+    parser.add_argument("--ids", type=int, default=200, help="每组抓取的ID数量")
+    parser.add_argument("--no-images", action="store_true", help="不下载图片")
+    parser.add_argument("--latency", type=float, default=0.02, help="替身站点每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--login-redirect-rate", type=float, default=0.0)
+    parser.add_argument("--shell-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-crawl", action="store_true", help="只跑解析/清洗微基准")
+    parser.add_argument("--skip-micro", action="store_true", help="只跑抓取基准")
+    parser.add_argument("--skip-list", action="store_true", help="不跑列表页微基准（需要selenium和Chrome）")
+    parser.add_argument("--json", help="结果另存为JSON文件")
+    args = parser.parse_args(argv)
+
+    report = {}
+    if not args.skip_crawl:
+        report["crawl"] = run_crawl_benchmarks(
+            args.engines, args.workers, kind=args.kind, count=args.ids, images=not args.no_images,
+            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+            login_redirect_rate=args.login_redirect_rate, shell_rate=args.shell_rate, seed=args.seed)
+    if not args.skip_micro:
+        report["micro"] = run_micro_benchmarks()
+        if not args.skip_list:
+            report["micro"].update(run_list_benchmarks())
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已保存：{args.json}")
+
+
+if __name__ == "__main__":
+    # 用法：python benchmark.py --engines http selenium --workers 1 4 8 --ids 200 --latency 0.02
+    main()
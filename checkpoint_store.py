@@ -0,0 +1,157 @@
+import os
+import json
+import logging
+import threading
+from records import as_dict
+
+logger = logging.getLogger(__name__)
+
+
+def is_failed_record(record, name_key):
+    """记录是否为失败记录（带错误信息、名称为空或名称为"处理失败"类提示）"""
+    if '错误信息' in record:
+        return True
+    name = record.get(name_key) or ""
+    return not name or "处理失败" in name
+
+
+class CheckpointStore:
+    """追加写入的断点存储（JSONL）：每条记录一行，只写新增记录，按批次fsync
+
+    同一ID多次写入时以最后一条为准；进程崩溃最多截断最后一行，读取时跳过。
+    """
+
+    def __init__(self, path, id_key, fsync_every=100):
+        self.path = path
+        self.id_key = id_key
+        self.fsync_every = fsync_every
+        self._file = None
+        self._pending = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """懒打开文件；上次崩溃留下的半行先补换行，避免与新记录粘连"""
+        if self._file is None:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b"\n"
+                if needs_newline:
+                    with open(self.path, 'ab') as f:
+                        f.write(b"\n")
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def add_listener(self, callback):
+        """注册写入回调 callback(records)：每次追加后按写入顺序收到新记录（如流式清洗）"""
+        self._listeners.append(callback)
+
+    def append(self, record):
+        """追加单条记录"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """追加多条记录（记录类转为中文键字典写入；攒够 fsync_every 条落盘一次）"""
+        records = [as_dict(record) for record in records]
+        with self._lock:
+            f = self._open()
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._pending += 1
+            if self._pending >= self.fsync_every:
+                self._sync()
+            for callback in self._listeners:
+                try:
+                    callback(records)
+                except Exception as e:  # 回调失败不影响断点写入
+                    logger.error(f"断点写入回调失败：{e}")
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def flush(self):
+        """立即落盘"""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def close(self):
+        """落盘并关闭文件"""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def iter_records(self):
+        """按写入顺序逐条读取记录（跳过损坏的行）"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过损坏的断点记录（{self.path} 第{line_no}行）")
+
+    def records_since(self, offset=0):
+        """读取文件偏移 offset 之后新写入的完整行，返回 (记录列表, 新偏移)；未写完的末行留到下次读取"""
+        records = []
+        if not os.path.exists(self.path):
+            return records, 0
+        if os.path.getsize(self.path) < offset:
+            offset = 0  # 文件已被替换或截断，从头读取
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    if line.strip():
+                        records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过损坏的断点记录（{self.path}）")
+        return records, offset
+
+    def latest(self):
+        """每个ID的最新记录 {id: record}"""
+        self.flush()  # 先落盘缓冲区，保证读到本次运行刚写入的记录
+        records = {}
+        for record in self.iter_records():
+            records[record[self.id_key]] = record
+        return records
+
+    def patch(self, ids, fields):
+        """修正已写入的记录：以最新记录为底更新字段后追加一条新记录"""
+        ids = set(ids)
+        if not ids:
+            return
+        latest = self.latest()
+        self.append_many([{**latest[i], **fields} for i in ids if i in latest])
+
+    def pending_ids(self, ids, name_key, retry_names=()):
+        """断点续爬：返回ids中尚未抓取、最新记录为失败或名称属于 retry_names 的ID（保持原顺序）"""
+        latest = self.latest()
+        return [i for i in ids if i not in latest or is_failed_record(latest[i], name_key)
+                or latest[i].get(name_key) in retry_names]
+
+    def compact(self, output_path):
+        """压缩为完整JSON（按ID排序、去重），先写临时文件再原子替换；返回记录列表"""
+        latest = self.latest()
+        result = [latest[key] for key in sorted(latest)]
+
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+        logger.info(f"断点数据已压缩到：{output_path}（{len(result)} 条）")
+        return result
@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 直方图分桶上限（秒），覆盖 WebDriverWait 的2秒/3秒超时
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 2.5, 3.0, 3.5, 5.0, 10.0, 30.0)
+
+
+def format_labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+class CrawlMetrics:
+    """逐ID各步骤耗时统计：span() 记录一次步骤耗时，按步骤汇总为直方图
+
+    export_text() 输出Prometheus文本格式（可由node_exporter的textfile收集器采集），
+    summary() 汇总墙钟时间都花在了哪些步骤上。所有抓取线程共用一个实例。
+    """
+
+    def __init__(self, job, buckets=DEFAULT_BUCKETS):
+        self.job = job
+        self.buckets = tuple(buckets)
+        self._histograms = {}  # {步骤: [各桶计数..., 总耗时, 次数]}
+        self._events = {}  # {事件: 次数}
+        self._rate_limiter = None  # 导出其当前速率和降速次数
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, textfile=None):
+        """清空统计并重新开始计时（每次运行开始时调用），textfile 为 flush() 写入的文件"""
+        with self._lock:
+            self._histograms.clear()
+            self._events.clear()
+            self._started = time.monotonic()
+            self.textfile = textfile
+
+    @contextmanager
+    def span(self, stage):
+        """记录 with 块的耗时（块内抛出异常也会记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def watch_rate_limiter(self, rate_limiter):
+        """导出时附带限速器的当前速率（gauge）和各原因的降速次数（counter）"""
+        self._rate_limiter = rate_limiter
+
+    def event(self, name, count=1):
+        """记录事件次数（如等待超时、页面加载失败）"""
+        with self._lock:
+            self._events[name] = self._events.get(name, 0) + count
+
+    def export_text(self):
+        """Prometheus文本格式"""
+        with self._lock:
+            histograms = {stage: list(values) for stage, values in self._histograms.items()}
+            events = dict(self._events)
+            elapsed = time.monotonic() - self._started
+
+        lines = ["# HELP crawl_stage_seconds 每个ID各步骤耗时", "# TYPE crawl_stage_seconds histogram"]
+        for stage, values in histograms.items():
+            labels = {"job": self.job, "stage": stage}
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"crawl_stage_seconds_bucket{{{format_labels({**labels, 'le': bound})}}} {count}")
+            lines.append(f"crawl_stage_seconds_bucket{{{format_labels({**labels, 'le': '+Inf'})}}} {values[-1]}")
+            lines.append(f"crawl_stage_seconds_sum{{{format_labels(labels)}}} {values[-2]:.6f}")
+            lines.append(f"crawl_stage_seconds_count{{{format_labels(labels)}}} {values[-1]}")
+
+        lines += ["# HELP crawl_events_total 爬取过程中的事件次数", "# TYPE crawl_events_total counter"]
+        for name, count in events.items():
+            lines.append(f"crawl_events_total{{{format_labels({'job': self.job, 'event': name})}}} {count}")
+
+        if self._rate_limiter is not None:
+            lines += ["# HELP crawl_rate_limit_rps 自适应限速器的当前速率（次/秒）", "# TYPE crawl_rate_limit_rps gauge",
+                      f"crawl_rate_limit_rps{{{format_labels({'job': self.job})}}} {self._rate_limiter.current_rate:.4f}",
+                      "# HELP crawl_rate_limit_backoffs_total 限速器降速次数（按原因）",
+                      "# TYPE crawl_rate_limit_backoffs_total counter"]
+            for reason, count in self._rate_limiter.backoff_counts().items():
+                lines.append(f"crawl_rate_limit_backoffs_total{{{format_labels({'job': self.job, 'reason': reason})}}} "
+                             f"{count}")
+
+        lines += ["# HELP crawl_run_seconds 本次运行已用时间", "# TYPE crawl_run_seconds gauge",
+                  f"crawl_run_seconds{{{format_labels({'job': self.job})}}} {elapsed:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """原子写入文本文件（先写临时文件再替换，采集方不会读到半个文件）"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.export_text())
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """写出到 reset() 指定的文件（未指定时不写）"""
+        if not self.textfile:
+            return
+        try:
+            self.write_textfile(self.textfile)
+        except OSError as e:
+            logger.warning(f"写入指标文件失败（{self.textfile}）：{e}")
+
+    def quantile(self, stage, q):
+        """按分桶估算分位数（返回所在桶的上限，超出最大桶时返回inf）"""
+        with self._lock:
+            values = list(self._histograms.get(stage, []))
+        if not values or not values[-1]:
+            return None
+        target = q * values[-1]
+        for bound, count in zip(self.buckets, values):
+            if count >= target:
+                return bound
+        return float("inf")
+
+    def summary(self):
+        """各步骤耗时汇总（按累计耗时降序），返回多行文本"""
+        with self._lock:
+            histograms = {stage: list(values) for stage, values in self._histograms.items()}
+            events = dict(self._events)
+            elapsed = time.monotonic() - self._started
+
+        total = sum(values[-2] for values in histograms.values()) or 1.0
+        lines = [f"[{self.job}] 运行 {elapsed:.1f} 秒，各步骤累计耗时（多线程累加，占比按全部步骤合计计算）："]
+        for stage, values in sorted(histograms.items(), key=lambda item: item[1][-2], reverse=True):
+            seconds, count = values[-2], values[-1]
+            lines.append(f"  {stage:<18} {seconds:>9.1f} 秒 {seconds / total:>6.1%}  次数 {count:<7} "
+                         f"平均 {seconds / count * 1000:.0f} ms  p95≤{self.quantile(stage, 0.95)} 秒")
+        if events:
+            lines.append(f"  事件：{events}")
+        if self._rate_limiter is not None:
+            lines.append(f"  限速器：当前 {self._rate_limiter.current_rate:.2f} 次/秒，"
+                         f"降速次数 {self._rate_limiter.backoff_counts()}")
+        return "\n".join(lines)
@@ -0,0 +1,428 @@
+import os
+import sys
+import glob
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import importlib
+import threading
+import multiprocessing
+from collections import namedtuple
+
+from checkpoint_store import CheckpointStore, is_failed_record
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+QUEUE_DB = "crawl_queue.db"
+PROGRESS_DIR = "orchestrator_progress"  # 每个worker一个断点文件，结束后合并
+LEASE_SIZE = 20  # 每个租约的ID数量（小租约让快慢worker自然均衡）
+LEASE_TTL = 300  # 租约有效期（秒），worker崩溃后过期的租约重新分配
+MAX_ATTEMPTS = 3  # 同一租约最多分配次数，超过后标记为failed
+POLL_INTERVAL = 5  # 暂无可领取租约（其他worker仍在处理）时的轮询间隔
+MAX_FAILURE_RATIO = 0.5  # 租约内失败ID占比超过该值时归还租约并停止worker（多为账号被封或登录失效）
+
+# 各数据集对应的爬虫模块及其函数
+JOBS = {
+    "dish": {
+        "module": "selenium_get_nutrition_data",
+        "batch": "process_dish_batch",
+        "http": "crawl_dish_data_http",
+        "batches": "crawl_dish_batches",
+        "id_key": "菜品ID",
+        "name_key": "菜品名称",
+        "image_dir": "dish_images",
+        "progress_file": "dishes_data_progress.jsonl",
+        "category_file": ("菜品信息.csv", "分类"),  # 列表页分类数据（文件, 分类列），按名称关联
+    },
+    "food": {
+        "module": "selenium_get_nutrition_ingredient_data",
+        "batch": "process_food_batch",
+        "http": "crawl_food_data_http",
+        "batches": "crawl_food_batches",
+        "id_key": "食物ID",
+        "name_key": "食物名称",
+        "image_dir": "food_images",
+        "progress_file": "foods_data_progress.jsonl",
+        "category_file": ("food_categories.csv", "二级分类"),
+    },
+}
+
+Lease = namedtuple("Lease", ["job", "start_id", "end_id", "attempts"])
+
+
+# ==================== 租约队列 ====================
+class LeaseQueue:
+    """SQLite持久化的ID租约队列：worker动态领取小段ID，定期续约，完成后标记done
+
+    租约过期（worker崩溃或失联）后可被其他worker重新领取；多个进程/主机共用同一个数据库文件。
+    多台主机共用时数据库须放在支持文件锁的共享目录上，并以 wal=False 打开（WAL要求同一主机）。
+    """
+
+    def __init__(self, db_path=QUEUE_DB, wal=True, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()  # 同一连接被工作线程和续约线程共用
+        if wal:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                job TEXT NOT NULL,
+                start_id INTEGER NOT NULL,
+                end_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                failed_ids INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (job, start_id)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leases_status ON leases (job, status)")
+
+    def _transaction(self, func):
+        """在写事务中执行（BEGIN IMMEDIATE 立即加写锁，避免多个进程领取到同一租约）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, job, start_id, end_id, lease_size=LEASE_SIZE):
+        """按 lease_size 切分ID范围写入队列（已存在的租约不重复写入），返回新增的租约数"""
+        rows = [(job, s, min(s + lease_size - 1, end_id), time.time())
+                for s in range(start_id, end_id + 1, lease_size)]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO leases (job, start_id, end_id, updated_at) VALUES (?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+        return self._transaction(insert)
+
+    def claim(self, job, owner, ttl=LEASE_TTL):
+        """领取一个待处理或已过期的租约，没有可领取的租约时返回None"""
+        def take(conn):
+            now = time.time()
+            conn.execute("UPDATE leases SET status = 'failed', error = '租约多次过期', updated_at = ? "
+                         "WHERE job = ? AND status = 'leased' AND expires_at < ? AND attempts >= ?",
+                         (now, job, now, self.max_attempts))
+            row = conn.execute("SELECT start_id, end_id, attempts FROM leases "
+                               "WHERE job = ? AND (status = 'pending' OR (status = 'leased' AND expires_at < ?)) "
+                               "ORDER BY start_id LIMIT 1", (job, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE leases SET status = 'leased', owner = ?, expires_at = ?, attempts = attempts + 1, "
+                         "updated_at = ? WHERE job = ? AND start_id = ?", (owner, now + ttl, now, job, row[0]))
+            return Lease(job, row[0], row[1], row[2] + 1)
+        return self._transaction(take)
+
+    def renew(self, lease, owner, ttl=LEASE_TTL):
+        """续约（租约已被其他worker接管时返回False）"""
+        def extend(conn):
+            cursor = conn.execute("UPDATE leases SET expires_at = ?, updated_at = ? "
+                                  "WHERE job = ? AND start_id = ? AND owner = ? AND status = 'leased'",
+                                  (time.time() + ttl, time.time(), lease.job, lease.start_id, owner))
+            return cursor.rowcount == 1
+        return self._transaction(extend)
+
+    def complete(self, lease, owner, failed_ids=0):
+        """标记租约完成（失败的ID保留在断点文件中，可用 --resume 补爬）"""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE leases SET status = 'done', failed_ids = ?, error = NULL, updated_at = ? "
+            "WHERE job = ? AND start_id = ? AND owner = ?", (failed_ids, time.time(), lease.job, lease.start_id, owner)))
+
+    def release(self, lease, owner, error):
+        """处理异常时归还租约：未超过最大次数则重新排队，否则标记为failed"""
+        status = "failed" if lease.attempts >= self.max_attempts else "pending"
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE leases SET status = ?, owner = NULL, expires_at = NULL, error = ?, updated_at = ? "
+            "WHERE job = ? AND start_id = ? AND owner = ?",
+            (status, str(error)[:500], time.time(), lease.job, lease.start_id, owner)))
+
+    def requeue_failed(self, job):
+        """失败的租约重新排队（重置分配次数），返回数量"""
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE leases SET status = 'pending', attempts = 0, owner = NULL, expires_at = NULL, updated_at = ? "
+            "WHERE job = ? AND status = 'failed'", (time.time(), job)).rowcount)
+
+    def outstanding(self, job):
+        """尚未完成的租约数（待处理 + 处理中）"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM leases WHERE job = ? AND status IN ('pending', 'leased')",
+                                      (job,)).fetchone()[0]
+
+    def progress(self, job):
+        """各状态的租约数和ID数，以及已完成租约中的失败ID数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*), SUM(end_id - start_id + 1), SUM(failed_ids) "
+                                      "FROM leases WHERE job = ? GROUP BY status", (job,)).fetchall()
+        return {status: {"leases": leases, "ids": ids, "failed_ids": failed or 0}
+                for status, leases, ids, failed in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LeaseHeartbeat:
+    """处理租约期间在后台定期续约（间隔为有效期的1/3）"""
+
+    def __init__(self, queue, lease, owner, ttl=LEASE_TTL):
+        self.queue = queue
+        self.lease = lease
+        self.owner = owner
+        self.ttl = ttl
+        self.lost = False  # 租约已过期并被其他worker接管
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                if not self.queue.renew(self.lease, self.owner, self.ttl):
+                    self.lost = True
+                    logger.warning(f"租约 [{self.lease.start_id}-{self.lease.end_id}] 已被其他worker接管")
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"续约失败（下次重试）：{e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# ==================== worker进程 ====================
+def worker_progress_path(job, worker_name, progress_dir=PROGRESS_DIR):
+    return os.path.join(progress_dir, f"{job}.{worker_name}.jsonl")
+
+
+def crawl_lease(crawler, config, lease, pool, downloader, store, engine, threads, id_index=None, http_engine=None):
+    """抓取一个租约内的全部ID（复用爬虫脚本的批次函数），返回 (失败ID数, 实际抓取的ID数)
+
+    http_engine: worker级共用的HTTP引擎（为空时由爬虫脚本为本租约新建）
+    """
+    ids = list(range(lease.start_id, lease.end_id + 1))
+    if id_index is not None:
+        ids = id_index.schedule(ids)  # 跳过已确认不存在的ID
+    attempted = len(ids)
+    stats = {"processed": 0, "success": 0}
+    if engine == "http" and ids:
+        ids = getattr(crawler, config["http"])(ids, pool, downloader, len(ids), threads, store, stats, len(ids),
+                                               http_engine=http_engine)
+    if ids:
+        batch_data = getattr(crawler, config["batch"])((lease.start_id, ids, pool, downloader))
+        crawler.save_progress(store, stats, batch_data, lease.end_id - lease.start_id + 1)
+    return stats["processed"] - stats["success"], attempted
+
+
+def run_worker(job, worker_name, account, db_path=QUEUE_DB, wal=True, engine="selenium", threads=1,
+               image_workers=2, lease_ttl=LEASE_TTL, progress_dir=PROGRESS_DIR, id_index=None,
+               max_failure_ratio=MAX_FAILURE_RATIO, rate_share=1):
+    """worker主循环：领取租约 -> 抓取 -> 标记完成，直到队列中没有未完成的租约
+
+    租约内失败ID占比超过 max_failure_ratio 时不标记完成，归还租约后以退出码1停止worker。
+    rate_share: 本机使用同一账号的worker数，限速器的速率按该数均分（同一账号的总请求速率不变）。
+    """
+    config = JOBS[job]
+    crawler = importlib.import_module(config["module"])
+    # 爬虫模块导入时可能已配置根日志（如食物爬虫的 setup_logging），此时只替换格式，避免重复输出
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=logging.INFO)
+    for handler in root.handlers:
+        handler.setFormatter(logging.Formatter(f'%(asctime)s - {worker_name} - %(levelname)s - %(message)s'))
+    from driver_pool import DriverPool
+    from image_pipeline import ImageDownloader
+    from http_fetch_engine import HttpFetchEngine
+
+    if rate_share > 1:
+        crawler.rate_limiter.scale(1 / rate_share)
+
+    owner = f"{worker_name}-{os.getpid()}"
+    os.makedirs(progress_dir, exist_ok=True)
+    crawler.metrics.reset(os.path.join(progress_dir, f"{job}.{worker_name}.prom"))
+    queue = LeaseQueue(db_path, wal=wal)
+    store = CheckpointStore(worker_progress_path(job, worker_name, progress_dir), config["id_key"])
+    # 每个worker一个已登录浏览器（不同worker可使用不同账号）
+    pool = DriverPool(1, crawler.init_driver, crawler.login_driver, account["username"], account["password"])
+    downloader = ImageDownloader(config["image_dir"], concurrency=image_workers, metrics=crawler.metrics)
+    if id_index:
+        from id_discovery import IdIndex
+        id_index = IdIndex(id_index)  # 只读使用，由 id_discovery.py 或单机爬虫刷新
+    http_engine = None
+    if engine == "http":
+        try:
+            http_engine = HttpFetchEngine.from_pool(pool, pool_size=threads)  # 整个worker共用一个会话和连接池
+        except Exception as e:
+            logger.warning(f"HTTP引擎建立失败，各租约单独重试：{e}")
+    leases = 0
+    stopped = False
+    try:
+        while True:
+            lease = queue.claim(job, owner, lease_ttl)
+            if lease is None:
+                if not queue.outstanding(job):
+                    break
+                time.sleep(POLL_INTERVAL)  # 剩余租约都在其他worker手中，等待其完成或过期
+                continue
+
+            logger.info(f"领取租约 [{lease.start_id}-{lease.end_id}]（第{lease.attempts}次分配）")
+            try:
+                with LeaseHeartbeat(queue, lease, owner, lease_ttl) as heartbeat:
+                    failed, attempted = crawl_lease(crawler, config, lease, pool, downloader, store, engine, threads,
+                                                    id_index, http_engine)
+            except Exception as e:
+                logger.error(f"租约 [{lease.start_id}-{lease.end_id}] 处理异常：{e}")
+                queue.release(lease, owner, e)
+                continue
+            if attempted and failed > attempted * max_failure_ratio:
+                logger.error(f"租约 [{lease.start_id}-{lease.end_id}] 失败 {failed}/{attempted} 个ID，归还租约并停止worker")
+                queue.release(lease, owner, f"失败率过高：{failed}/{attempted}")
+                stopped = True
+                break
+            if not heartbeat.lost:
+                queue.complete(lease, owner, failed)
+                leases += 1
+    finally:
+        if http_engine is not None:
+            http_engine.close()
+        pool.close()
+        store.patch(downloader.close(), {"本地图片路径": ""})
+        store.close()
+        queue.close()
+        crawler.metrics.flush()
+        logger.info(f"worker结束，共处理 {leases} 个租约\n{crawler.metrics.summary()}")
+    if stopped:
+        sys.exit(1)
+
+
+def load_accounts(accounts_file=None, username="", password=""):
+    """账号列表：JSON文件 [{"username": ..., "password": ...}, ...]，未提供时使用单个账号"""
+    if accounts_file:
+        with open(accounts_file, 'r', encoding='utf-8') as f:
+            accounts = json.load(f)
+        if not accounts:
+            raise ValueError(f"账号文件为空：{accounts_file}")
+        return accounts
+    return [{"username": username, "password": password}]
+
+
+def start_workers(job, workers, accounts, account_offset=0, **options):
+    """在本机启动 workers 个worker进程（账号按序号轮流分配），等待全部结束"""
+    context = multiprocessing.get_context("spawn")
+    host = socket.gethostname()
+    processes = []
+    slots = [(account_offset + i) % len(accounts) for i in range(workers)]
+    for i, slot in enumerate(slots):
+        # 同一账号的多个worker均分该账号的请求速率（其他主机上的worker不在统计范围内）
+        process = context.Process(target=run_worker, args=(job, f"{host}-w{i}", accounts[slot]),
+                                  kwargs={**options, "rate_share": slots.count(slot)}, name=f"{job}-worker-{i}")
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
+    return [process.exitcode for process in processes]
+
+
+def merge_progress(job, output=None, progress_dir=PROGRESS_DIR):
+    """将各worker的断点文件合并追加到数据集的断点文件（同一ID成功记录优先），返回合并的记录数"""
+    config = JOBS[job]
+    name_key = config["name_key"]
+    merged = {}
+    for path in sorted(glob.glob(os.path.join(progress_dir, f"{job}.*.jsonl"))):
+        for item_id, record in CheckpointStore(path, config["id_key"]).latest().items():
+            if item_id not in merged or is_failed_record(merged[item_id], name_key) or \
+                    not is_failed_record(record, name_key):
+                merged[item_id] = record
+
+    target = CheckpointStore(output or config["progress_file"], config["id_key"])
+    existing = target.latest()
+    records = [record for item_id, record in sorted(merged.items())
+               if item_id not in existing or is_failed_record(existing[item_id], name_key)
+               or not is_failed_record(record, name_key)]  # 不用失败记录覆盖已有的成功记录
+    target.append_many(records)
+    target.close()
+    logger.info(f"合并 {len(records)} 条记录到 {target.path}")
+    return len(records)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="多进程爬取调度：SQLite租约队列 + 动态领取")
+    parser.add_argument("--db", default=QUEUE_DB, help="租约队列数据库（多台主机共用时放在共享目录）")
+    parser.add_argument("--no-wal", action="store_true", help="不使用WAL（数据库位于网络共享目录时使用）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="按ID范围生成租约")
+    enqueue.add_argument("job", choices=sorted(JOBS))
+    enqueue.add_argument("start_id", type=int)
+    enqueue.add_argument("end_id", type=int)
+    enqueue.add_argument("--lease-size", type=int, default=LEASE_SIZE)
+
+    work = commands.add_parser("work", help="在本机启动worker进程")
+    work.add_argument("job", choices=sorted(JOBS))
+    work.add_argument("--workers", type=int, default=2)
+    work.add_argument("--accounts", help="账号JSON文件，worker按序号轮流使用")
+    work.add_argument("--account-offset", type=int, default=0, help="多台主机时错开账号分配")
+    work.add_argument("--username", default="")
+    work.add_argument("--password", default="")
+    work.add_argument("--engine", default="selenium", choices=["selenium", "http"])
+    work.add_argument("--threads", type=int, default=1, help="HTTP引擎每个worker的并发数")
+    work.add_argument("--image-workers", type=int, default=2)
+    work.add_argument("--lease-ttl", type=int, default=LEASE_TTL)
+    work.add_argument("--id-index", help="ID索引缓存文件（跳过已确认不存在的ID）")
+    work.add_argument("--max-failure-ratio", type=float, default=MAX_FAILURE_RATIO,
+                      help="租约失败ID占比超过该值时归还租约并停止worker")
+
+    status = commands.add_parser("status", help="查看租约进度")
+    status.add_argument("job", choices=sorted(JOBS))
+    status.add_argument("--requeue-failed", action="store_true", help="失败的租约重新排队")
+
+    merge = commands.add_parser("merge", help="合并各worker的断点文件")
+    merge.add_argument("job", choices=sorted(JOBS))
+    merge.add_argument("--output", help="默认为数据集的断点文件")
+
+    args = parser.parse_args(argv)
+    wal = not args.no_wal
+
+    if args.command == "enqueue":
+        queue = LeaseQueue(args.db, wal=wal)
+        added = queue.enqueue(args.job, args.start_id, args.end_id, args.lease_size)
+        logger.info(f"新增 {added} 个租约，当前进度：{queue.progress(args.job)}")
+    elif args.command == "work":
+        accounts = load_accounts(args.accounts, args.username, args.password)
+        exit_codes = start_workers(args.job, args.workers, accounts, args.account_offset, db_path=args.db, wal=wal,
+                                   engine=args.engine, threads=args.threads, image_workers=args.image_workers,
+                                   lease_ttl=args.lease_ttl, id_index=args.id_index,
+                                   max_failure_ratio=args.max_failure_ratio)
+        logger.info(f"worker退出码：{exit_codes}，当前进度：{LeaseQueue(args.db, wal=wal).progress(args.job)}")
+        merge_progress(args.job)
+    elif args.command == "status":
+        queue = LeaseQueue(args.db, wal=wal)
+        if args.requeue_failed:
+            logger.info(f"重新排队 {queue.requeue_failed(args.job)} 个失败租约")
+        logger.info(json.dumps(queue.progress(args.job), ensure_ascii=False))
+    elif args.command == "merge":
+        merge_progress(args.job, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    # 用法：
+    #   python crawl_orchestrator.py enqueue dish 1 25000
+    #   python crawl_orchestrator.py work dish --workers 4 --accounts accounts.json
+    #   python crawl_orchestrator.py status dish
+    sys.exit(main())
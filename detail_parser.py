@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import logging
+from functools import lru_cache
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup, Tag
+from records import DishRecord, FoodRecord, Nutrients
+
+try:
+    from lxml import html as lxml_html
+    from lxml.cssselect import CSSSelector
+except ImportError:  # 未安装lxml时退回BeautifulSoup解析
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+# ==================== 选择器常量 ====================
+TITLE_SELECTOR = ".info-title.ellipsis-1"
+IMAGE_SELECTOR = "span.el-link--inner img"
+UNIT_ITEM_SELECTOR = ".el-select-dropdown__list .el-select-dropdown__item"
+UNIT_SELECT_SELECTOR = "div.unit-select"
+EMPTY_STATE_SELECTOR = ".el-empty"
+
+# 浏览器端的页面渲染状态（一次组合判断代替标题、图片、下拉菜单的分别等待）：
+# "ready" 详情已渲染，"login" 被重定向到登录页，"empty" 站点渲染了空状态，null 仍在渲染
+READY_STATE_SCRIPT = """
+if (document.readyState !== 'complete') return null;
+if (location.pathname.toLowerCase().indexOf('login') !== -1) return 'login';
+var title = document.querySelector(arguments[0]);
+if (title && title.textContent.trim()) return 'ready';
+if (document.querySelector(arguments[1])) return 'empty';
+return null;
+"""
+
+# 营养成分图表（字段名, 选择器）
+CHART_SELECTORS = [
+    ("能量及宏量营养素", ".chart-item.color-class-0 .item-chart-outer"),
+    ("维生素", ".chart-item.color-class-1 .item-chart-outer"),
+    ("矿物质", ".chart-item.color-class-2 .item-chart-outer")
+]
+
+# 与 BeautifulSoup get_text() 一致：这些标签内的字符串不算作文本
+NON_TEXT_TAGS = {"script", "style", "template"}
+
+# 解析一致性校验语料目录（dish_*.html / food_*.html）
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "detail_pages")
+# 原脚本（get_text + BeautifulSoup）对语料页面的输出（{页面名}.json，ID为1、本地图片路径为空）
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "golden")
+
+
+# ==================== 解析树 ====================
+def make_soup(html):
+    """构建BeautifulSoup解析树（纯Python解析，用于兜底和一致性校验）"""
+    return BeautifulSoup(html, "html.parser")
+
+
+def make_tree(html):
+    """构建解析树：优先使用lxml（C实现，整页只解析一次），未安装时退回BeautifulSoup"""
+    if lxml_html is None:
+        return make_soup(html)
+    return lxml_html.document_fromstring(html if html.strip() else "<html></html>")
+
+
+@lru_cache(maxsize=None)
+def compiled_selector(selector):
+    """CSS选择器预编译为XPath（每个选择器只编译一次）"""
+    return CSSSelector(selector)
+
+
+def select(tree, selector):
+    """查找选择器匹配的全部元素（文档顺序）"""
+    if isinstance(tree, BeautifulSoup):
+        return tree.select(selector)
+    return compiled_selector(selector)(tree)
+
+
+def select_one(tree, selector):
+    """查找选择器匹配的第一个元素"""
+    if isinstance(tree, BeautifulSoup):
+        return tree.select_one(selector)
+    matches = select(tree, selector)
+    return matches[0] if matches else None
+
+
+def element_text(elem):
+    """元素文本，等价于 BeautifulSoup 的 get_text(strip=True)"""
+    if isinstance(elem, Tag):
+        return elem.get_text(strip=True)
+    parts = []
+    _collect_text(elem, parts)
+    return "".join(parts)
+
+
+def _collect_text(elem, parts):
+    """递归收集lxml元素的文本（跳过注释和script/style/template内容，每段去除首尾空白）"""
+    if isinstance(elem.tag, str) and elem.tag not in NON_TEXT_TAGS:
+        if elem.text and elem.text.strip():
+            parts.append(elem.text.strip())
+        for child in elem:
+            _collect_text(child, parts)
+            if child.tail and child.tail.strip():
+                parts.append(child.tail.strip())
+
+
+# ==================== 工具函数 ====================
+def get_text(soup, selector, is_single=True):
+    """提取选择器匹配的文本内容"""
+    try:
+        if is_single:
+            elem = select_one(soup, selector)
+            return element_text(elem) if elem is not None else "未获取到数据"
+        else:
+            elems = select(soup, selector)
+            return [element_text(el) for el in elems] if elems else []
+    except Exception as e:
+        logger.error(f"解析选择器 [{selector}] 失败：{e}")
+        return "" if is_single else []
+
+
+def join_lines(items):
+    """多行文本合并为以换行分隔的字符串（每项内部换行替换为空格）"""
+    return "\n".join([i.replace("\n", " ").strip() for i in items])
+
+
+def has_content(soup):
+    """页面是否已渲染出详情内容（客户端渲染的空壳页面返回False）"""
+    return select_one(soup, TITLE_SELECTOR) is not None
+
+
+def is_empty_page(soup):
+    """页面已渲染但提示没有数据（空状态），与尚未渲染的空壳页面区分"""
+    return not has_content(soup) and select_one(soup, EMPTY_STATE_SELECTOR) is not None
+
+
+def extract_image_url(soup, page_url=None):
+    """从页面中提取图片地址（给出 page_url 时相对地址转为绝对地址）"""
+    img_elem = select_one(soup, IMAGE_SELECTOR)
+    src = img_elem.get("src") if img_elem is not None else ""
+    if src and page_url:
+        src = urljoin(page_url, src)
+    return src or "未获取到图片URL"
+
+
+def needs_unit_click(soup):
+    """页面有单位下拉框但选项未预先渲染到DOM中（只有这种情况才需要点击展开）"""
+    return select_one(soup, UNIT_SELECT_SELECTOR) is not None and not select(soup, UNIT_ITEM_SELECTOR)
+
+
+# ==================== 记录组装 ====================
+def parse_nutrients(soup):
+    """三个营养素图表解析为按固定顺序对齐的数值数组"""
+    return Nutrients.parse({name: join_lines(get_text(soup, selector, False)) for name, selector in CHART_SELECTORS})
+
+
+def parse_dish_page(soup, dish_id, img_url, img_local_path):
+    """将菜品详情页解析为菜品记录（DishRecord）"""
+    ingredients = get_text(soup, ".ingredients span")
+    steps = get_text(soup, ".practice-step", is_single=False)
+
+    return DishRecord(
+        dish_id=dish_id,
+        name=get_text(soup, TITLE_SELECTOR),
+        composition=join_lines(get_text(soup, ".info-tag .tag-item", False)),
+        unit=get_text(soup, ".title-tip"),
+        image_url=img_url,
+        image_path=img_local_path,
+        cooking_method=f"{ingredients}\n" + "\n".join(steps) if (ingredients or steps) else "未获取到做法",
+        quantity="\n".join(get_text(soup, UNIT_ITEM_SELECTOR, False)) or "未获取到单位量",
+        nutrients=parse_nutrients(soup),
+    )
+
+
+def parse_food_page(soup, food_id, img_url, img_local_path):
+    """将食物详情页解析为食物记录（FoodRecord）"""
+    return FoodRecord(
+        food_id=food_id,
+        name=get_text(soup, TITLE_SELECTOR),
+        composition=join_lines(get_text(soup, ".info-desc .desc-item", False)),
+        unit=get_text(soup, ".title-tip"),
+        image_url=img_url,
+        image_path=img_local_path,
+        quantity="\n".join(get_text(soup, UNIT_ITEM_SELECTOR, False)) or "未获取到单位量",
+        nutrients=parse_nutrients(soup),
+    )
+
+
+# ==================== 一致性校验 ====================
+def dump_record(record):
+    """记录序列化为期望输出文件的格式（字段顺序与断点文件一致）"""
+    return json.dumps(record.to_dict(), ensure_ascii=False, indent=2) + "\n"
+
+
+def verify_corpus(fixture_dir=FIXTURE_DIR, golden_dir=GOLDEN_DIR):
+    """对语料中的每个页面分别用BeautifulSoup和lxml解析，比较两者的记录及与原脚本输出是否完全一致
+
+    原脚本输出见 golden_dir（没有对应文件的页面只比较两种解析）；返回不一致的页面数。
+    """
+    if lxml_html is None:
+        print("❌ 未安装lxml，无法校验")
+        return 1
+
+    mismatches = 0
+    files = sorted(f for f in os.listdir(fixture_dir) if f.endswith(".html"))
+    for filename in files:
+        parse_page = parse_dish_page if filename.startswith("dish") else parse_food_page
+        with open(os.path.join(fixture_dir, filename), 'r', encoding='utf-8') as f:
+            html = f.read()
+
+        records = []
+        for tree in (make_soup(html), make_tree(html)):
+            record = parse_page(tree, 1, extract_image_url(tree), "")
+            records.append((has_content(tree), record))
+
+        golden_path = os.path.join(golden_dir, f"{filename[:-len('.html')]}.json")
+        golden_ok = True
+        if os.path.exists(golden_path):
+            with open(golden_path, 'r', encoding='utf-8') as f:
+                golden = f.read()
+            golden_ok = all(dump_record(record) == golden for _, record in records)
+
+        if records[0] == records[1] and golden_ok:
+            print(f"✅ {filename}")
+            continue
+        mismatches += 1
+        print(f"❌ {filename}")
+        if not golden_ok:
+            expected = json.loads(golden)
+            for name, (_, record) in zip(("BeautifulSoup", "lxml"), records):
+                actual = record.to_dict()
+                for key in expected.keys() | actual.keys():
+                    if expected.get(key) != actual.get(key):
+                        print(f"   [{name}] {key}: 期望 {expected.get(key)!r}，实际 {actual.get(key)!r}")
+        (soup_ok, soup_record), (lxml_ok, lxml_record) = records
+        soup_record, lxml_record = soup_record.to_dict(), lxml_record.to_dict()
+        if soup_ok != lxml_ok:
+            print(f"   has_content: {soup_ok!r} != {lxml_ok!r}")
+        for key in soup_record:
+            if soup_record[key] != lxml_record.get(key):
+                print(f"   {key}: {soup_record[key]!r} != {lxml_record.get(key)!r}")
+
+    print(f"共校验 {len(files)} 个页面，不一致 {mismatches} 个")
+    return mismatches
+
+
+if __name__ == "__main__":
+    # 用法：python detail_parser.py [语料目录]（可将抓到的真实详情页另存为 dish_*.html / food_*.html 加入语料）
+    sys.exit(1 if verify_corpus(*sys.argv[1:2]) else 0)
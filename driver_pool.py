@@ -0,0 +1,154 @@
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class DriverLoginError(Exception):
+    """新建浏览器登录失败"""
+
+
+class DriverPool:
+    """已登录浏览器的有界池：整个爬取过程复用，取出时做健康检查，登录失效才重新登录"""
+
+    def __init__(self, size, init_driver, login_driver, username, password):
+        self.size = size
+        self._init_driver = init_driver
+        self._login_driver = login_driver
+        self._username = username
+        self._password = password
+
+        self._idle = queue.LifoQueue()  # 后进先出，优先复用刚归还的热浏览器
+        self._all = []
+        self._lock = threading.Lock()
+        self.acquire_times = []  # 每次获取浏览器的耗时（秒），包含新建与重新登录
+
+    def _create(self):
+        """新建浏览器并登录"""
+        driver = self._init_driver()
+        if not self._login_driver(driver, self._username, self._password):
+            driver.quit()
+            raise DriverLoginError("浏览器登录失败")
+        return driver
+
+    def _is_healthy(self, driver):
+        """浏览器存活且未被重定向到登录页"""
+        try:
+            return "login" not in driver.current_url.lower()
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        """关闭并移除失效的浏览器"""
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _ensure_ready(self, driver):
+        """健康检查：会话过期则在原浏览器上重新登录，浏览器崩溃则重建"""
+        if self._is_healthy(driver):
+            return driver
+
+        try:
+            driver.current_url  # 浏览器已崩溃时此处抛出异常
+            logger.info("浏览器登录态失效，重新登录")
+            if self._login_driver(driver, self._username, self._password):
+                return driver
+        except Exception as e:
+            logger.warning(f"浏览器不可用，准备重建：{e}")
+
+        self._discard(driver)
+        driver = self._create()
+        with self._lock:
+            self._all.append(driver)
+        return driver
+
+    def acquire(self, timeout=None):
+        """取出一个可用的已登录浏览器（池满时阻塞等待归还）"""
+        start_time_ts = time.time()
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = len(self._all) < self.size
+                if can_create:
+                    self._all.append(None)  # 先占位，避免并发超建
+            if can_create:
+                try:
+                    driver = self._create()
+                finally:
+                    with self._lock:
+                        self._all.remove(None)
+                with self._lock:
+                    self._all.append(driver)
+            else:
+                driver = self._idle.get(timeout=timeout)
+
+        try:
+            driver = self._ensure_ready(driver)
+        except Exception:
+            self._discard(driver)
+            raise
+
+        duration = time.time() - start_time_ts
+        self.acquire_times.append(duration)
+        logger.info(f"获取浏览器耗时：{duration:.2f} 秒（池大小 {len(self._all)}/{self.size}）")
+        return driver
+
+    def release(self, driver):
+        """归还浏览器"""
+        self._idle.put(driver)
+
+    def fresh_cookies(self, url):
+        """打开url确认登录态（被重定向到登录页则重新登录），返回浏览器当前的Cookie"""
+        driver = self.acquire()
+        try:
+            driver.get(url)
+            driver = self._ensure_ready(driver)
+        except Exception:
+            self._discard(driver)
+            raise
+        try:
+            return driver.get_cookies()
+        finally:
+            self.release(driver)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """with 语句方式取用浏览器"""
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def acquire_stats(self):
+        """获取耗时统计"""
+        times = self.acquire_times
+        if not times:
+            return {"count": 0, "total": 0.0, "avg": 0.0, "max": 0.0}
+        return {
+            "count": len(times),
+            "total": round(sum(times), 2),
+            "avg": round(sum(times) / len(times), 2),
+            "max": round(max(times), 2),
+        }
+
+    def close(self):
+        """关闭池内所有浏览器"""
+        with self._lock:
+            drivers = [d for d in self._all if d is not None]
+            self._all = []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        logger.info(f"浏览器池已关闭，共关闭 {len(drivers)} 个浏览器")
@@ -0,0 +1,220 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import logging
+import argparse
+import threading
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+FIXTURE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DETAIL_DIR = os.path.join(FIXTURE_ROOT, "detail_pages")
+SITE_DIR = os.path.join(FIXTURE_ROOT, "site")
+# 详情页中的图片域名，回放时改写为本地地址，图片下载也走本地服务
+IMAGE_HOST = "https://img.nutridata.cn"
+LOGIN_COOKIE = "token"
+
+LIST_PATH = "/database/list"  # 列表页：?id=2 菜肴库（菜品列表），?id=1 食物库（分类表格），&page=N 页码
+LIST_PAGES = {"2": "dish_list", "1": "food_category"}
+DISH_DETAIL_RE = re.compile(r"^/database/dishes/(\d+)$")
+FOOD_DETAIL_RE = re.compile(r"^/database/ingredient/(\d+)$")
+
+
+def read_fixture(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def id_fraction(item_id, seed):
+    """ID对应的[0, 1)固定值（同一ID每次回放结果一致）"""
+    return zlib.crc32(f"{seed}:{item_id}".encode("utf-8")) % 10000 / 10000
+
+
+class FixtureSite:
+    """本地替身站点：回放录制的登录页、列表页、详情页和图片，支持注入延迟和错误
+
+    latency/jitter: 每个请求固定延迟 + 随机抖动（秒）
+    error_rate: 按比例返回 error_status（默认503，会触发抓取引擎的重试）
+    login_redirect_rate: 按比例重定向到登录页（模拟登录态失效）
+    shell_rate: 按比例返回无服务端渲染内容的空壳详情页（HTTP引擎会转由Selenium兜底）
+    require_login: 列表页和详情页需要登录Cookie，否则重定向到登录页
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, login_redirect_rate=0.0,
+                 shell_rate=0.0, require_login=True, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.login_redirect_rate = login_redirect_rate
+        self.shell_rate = shell_rate
+        self.require_login = require_login
+        self.seed = seed
+
+        self.pages = {
+            "dish": read_fixture(os.path.join(DETAIL_DIR, "dish_1.html")),
+            "food": read_fixture(os.path.join(DETAIL_DIR, "food_1.html")),
+            "shell": read_fixture(os.path.join(DETAIL_DIR, "dish_2_shell.html")),
+            "login": read_fixture(os.path.join(SITE_DIR, "login.html")),
+            "dish_list": read_fixture(os.path.join(SITE_DIR, "dish_list.html")),
+            "food_category": read_fixture(os.path.join(SITE_DIR, "food_category_list.html")),
+        }
+        with open(os.path.join(SITE_DIR, "image.png"), 'rb') as f:
+            self.image = f.read()
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "injected_errors": 0, "login_redirects": 0, "shell_pages": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _roll(self):
+        with self._lock:
+            return self._random.random()
+
+    def respond(self, path, query, cookies, host):
+        """返回 (状态码, 响应头, 响应体)"""
+        self._count("requests")
+        if path == "/__stats":
+            with self._lock:
+                return 200, {"Content-Type": "application/json"}, json.dumps(self.stats).encode("utf-8")
+
+        delay = self.latency + (self._roll() * self.jitter if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        if path == "/login":
+            return self._html(self.pages["login"])
+        if path.startswith("/img/"):
+            return self._inject() or (200, {"Content-Type": "image/png"}, self.image)
+
+        dish = DISH_DETAIL_RE.match(path)
+        food = FOOD_DETAIL_RE.match(path)
+        list_page = LIST_PAGES.get(query.get("id", [""])[0]) if path == LIST_PATH else None
+        if not (dish or food or list_page):
+            return 404, {"Content-Type": "text/plain"}, b"not found"
+        if self.require_login and LOGIN_COOKIE not in cookies:
+            return self._redirect_login()
+        injected = self._inject()
+        if injected:
+            return injected
+        if self.login_redirect_rate and self._roll() < self.login_redirect_rate:
+            self._count("login_redirects")
+            return self._redirect_login()
+
+        if list_page:
+            return self._html(self.pages[list_page].replace("{page}", query.get("page", ["1"])[0]))
+        item_id = (dish or food).group(1)
+        if dish and self.shell_rate and id_fraction(item_id, self.seed) < self.shell_rate:
+            self._count("shell_pages")
+            return self._html(self.pages["shell"])
+        html = self.pages["dish" if dish else "food"]
+        return self._html(html.replace(IMAGE_HOST, f"http://{host}/img"))
+
+    def _inject(self):
+        if self.error_rate and self._roll() < self.error_rate:
+            self._count("injected_errors")
+            return self.error_status, {"Content-Type": "text/plain"}, b"injected error"
+        return None
+
+    @staticmethod
+    def _html(html):
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, html.encode("utf-8")
+
+    @staticmethod
+    def _redirect_login():
+        return 302, {"Location": "/login"}, b""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持keep-alive，与真实站点的连接复用行为一致
+    disable_nagle_algorithm = True  # 响应头和响应体分两次写出，避免Nagle与延迟ACK叠加出约40ms的额外延迟
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        cookies = dict(part.strip().split("=", 1) for part in self.headers.get("Cookie", "").split(";") if "=" in part)
+        status, headers, body = self.server.site.respond(url.path, parse_qs(url.query), cookies,
+                                                         self.headers.get("Host", ""))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 压测时不逐条输出访问日志
+
+
+class FixtureHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return  # 客户端关闭连接池时断开的连接，无需输出
+        super().handle_error(request, client_address)
+
+
+def make_server(site, host="127.0.0.1", port=0):
+    """创建替身站点服务（port=0 时自动分配端口）"""
+    server = FixtureHTTPServer((host, port), FixtureHandler)
+    server.site = site
+    return server
+
+
+def _serve(port_queue, host, port, options):
+    server = make_server(FixtureSite(**options), host, port)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_server_process(host="127.0.0.1", port=0, **options):
+    """在独立进程中启动替身站点（不占用被测进程的CPU和内存），返回 (进程, base_url)"""
+    context = multiprocessing.get_context("spawn")
+    port_queue = context.Queue()
+    process = context.Process(target=_serve, args=(port_queue, host, port, options), daemon=True)
+    process.start()
+    return process, f"http://{host}:{port_queue.get(timeout=30)}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地替身站点（回放 fixtures/ 下录制的页面）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机抖动上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误响应的比例")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--login-redirect-rate", type=float, default=0.0, help="重定向到登录页的比例")
+    parser.add_argument("--shell-rate", type=float, default=0.0, help="返回空壳详情页的比例")
+    parser.add_argument("--no-login", action="store_true", help="不校验登录Cookie")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    site = FixtureSite(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       error_status=args.error_status, login_redirect_rate=args.login_redirect_rate,
+                       shell_rate=args.shell_rate, require_login=not args.no_login, seed=args.seed)
+    server = make_server(site, args.host, args.port)
+    logger.info(f"替身站点已启动：http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"请求统计：{site.stats}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from detail_parser import make_tree, has_content, extract_image_url, parse_dish_page, parse_food_page
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+BASE_URL = "https://nutridata.cn"
+DISH_DETAIL_PATH = "/database/dishes/{dish_id}"
+FOOD_DETAIL_PATH = "/database/ingredient/{food_id}?baseId=1"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+
+
+class SessionExpiredError(Exception):
+    """登录态失效（请求被重定向到登录页）"""
+
+
+class HttpFetchEngine:
+    """免浏览器抓取引擎：登录一次后复用Cookie，通过连接池直接请求详情页
+
+    relogin: 登录态失效时调用的回调 relogin(url) -> 最新Cookie列表（如池中浏览器重新登录），刷新后重试一次
+    api: {"dish"/"food": (路径模板, 解析函数)}，页面数据来自XHR接口时直接请求JSON，
+         解析函数 parser(payload, item_id) 返回记录（未配置的类型解析服务端渲染的HTML）
+    """
+
+    def __init__(self, cookies=None, base_url=BASE_URL, pool_size=10, timeout=10, relogin=None, api=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.relogin = relogin
+        self.api = api or {}
+        self._cookie_lock = threading.Lock()
+        self._cookie_version = 0  # 每次刷新Cookie加1，并发失效时只刷新一次
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9",
+        })
+
+        # 连接池大小与并发线程数一致，保持长连接复用
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.set_cookies(cookies)
+
+    def set_cookies(self, cookies):
+        for cookie in cookies or []:
+            self.session.cookies.set(cookie["name"], cookie["value"],
+                                     domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs):
+        """从已登录的driver复制Cookie构建引擎（不会自动重新登录）"""
+        return cls(cookies=driver.get_cookies(), **kwargs)
+
+    @classmethod
+    def from_pool(cls, pool, base_url=BASE_URL, **kwargs):
+        """从浏览器池取登录Cookie构建引擎，登录态失效时由池中浏览器重新登录并刷新Cookie"""
+        return cls(cookies=pool.fresh_cookies(base_url), base_url=base_url, relogin=pool.fresh_cookies, **kwargs)
+
+    @classmethod
+    def login(cls, username, password, init_driver, login_driver, **kwargs):
+        """借助浏览器完成一次登录，随后关闭浏览器，仅保留Cookie（登录失败返回None）
+
+        登录态失效时重新启动浏览器登录一次并刷新Cookie。
+        """
+        def relogin(url=None):
+            driver = init_driver()
+            try:
+                if not login_driver(driver, username, password):
+                    raise SessionExpiredError("重新登录失败")
+                return driver.get_cookies()
+            finally:
+                driver.quit()
+
+        try:
+            cookies = relogin()
+        except SessionExpiredError:
+            return None
+        return cls(cookies=cookies, relogin=relogin, **kwargs)
+
+    def refresh_session(self, url, seen_version):
+        """刷新登录Cookie（其他线程已在 seen_version 之后刷新过时直接返回）；无法刷新时返回False"""
+        with self._cookie_lock:
+            if self._cookie_version != seen_version:
+                return True
+            if self.relogin is None:
+                return False
+            try:
+                cookies = self.relogin(url)
+            except Exception as e:
+                logger.error(f"刷新登录Cookie失败：{e}")
+                return False
+            self.set_cookies(cookies)
+            self._cookie_version += 1
+            logger.info("登录态已失效，已重新登录并刷新Cookie")
+            return True
+
+    def _get(self, path, **kwargs):
+        """GET请求；被重定向到登录页时刷新Cookie重试一次，仍失效则抛出SessionExpiredError"""
+        url = f"{self.base_url}{path}"
+        for attempt in range(2):
+            version = self._cookie_version
+            resp = self.session.get(url, timeout=self.timeout, **kwargs)
+            resp.raise_for_status()
+            if "login" not in resp.url.lower():
+                return resp
+            if attempt or not self.refresh_session(url, version):
+                break
+        raise SessionExpiredError(f"登录态失效：{path}")
+
+    def fetch_html(self, path):
+        """请求页面HTML（登录态失效且无法刷新时抛出SessionExpiredError）"""
+        resp = self._get(path)
+        # 未声明编码时requests默认ISO-8859-1，中文页面需改为utf-8
+        if not resp.encoding or resp.encoding.lower() == "iso-8859-1":
+            resp.encoding = "utf-8"
+        return resp.text
+
+    def fetch_json(self, path, params=None):
+        """以XHR方式请求JSON接口（与页面前端发出的请求相同的请求头）"""
+        resp = self._get(path, params=params,
+                         headers={"Accept": "application/json, text/plain, */*", "X-Requested-With": "XMLHttpRequest"})
+        return resp.json()
+
+    def _fetch_api(self, kind, item_id):
+        path, parser = self.api[kind]
+        return parser(self.fetch_json(path.format(id=item_id)), item_id)
+
+    def fetch_dish(self, dish_id):
+        """抓取单个菜品详情，页面无服务端渲染内容时返回None（交由Selenium兜底）"""
+        if "dish" in self.api:
+            return self._fetch_api("dish", dish_id)
+        soup = make_tree(self.fetch_html(DISH_DETAIL_PATH.format(dish_id=dish_id)))
+        if not has_content(soup):
+            return None
+        return parse_dish_page(soup, dish_id, extract_image_url(soup), "")
+
+    def fetch_food(self, food_id):
+        """抓取单个食物详情，页面无服务端渲染内容时返回None（交由Selenium兜底）"""
+        if "food" in self.api:
+            return self._fetch_api("food", food_id)
+        soup = make_tree(self.fetch_html(FOOD_DETAIL_PATH.format(food_id=food_id)))
+        if not has_content(soup):
+            return None
+        return parse_food_page(soup, food_id, extract_image_url(soup), "")
+
+    def close(self):
+        self.session.close()
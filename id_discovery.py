@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+from checkpoint_store import CheckpointStore, is_failed_record
+from crawl_orchestrator import JOBS
+from incremental_crawl import name_keys, load_categories
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+INDEX_FILES = {"dish": "dish_id_index.json", "food": "food_id_index.json"}
+NOT_FOUND_NAME = "未获取到数据"  # 页面已加载但没有标题，解析结果的名称为该值
+MIN_MISSES = 2  # 至少两次抓取/探测都没有内容才认为ID不存在（避免一次慢加载误判）
+
+
+class IdIndex:
+    """ID索引（JSON缓存）：记录哪些ID确认存在、哪些ID不存在，详情抓取只调度可能存在的ID
+
+    证据来源：断点文件的记录（成功 -> 存在；多次为“未获取到数据” -> 不存在），以及HTTP探测
+    （有内容 -> 存在，404 -> 不存在，已渲染的空状态页 -> 一次未命中；空壳页不作为证据）。
+    未命中按抓取次数累计：每个断点文件只统计上次刷新之后新写入的记录，重复刷新不会重复计数。
+    listed 只用于统计列表页条目已关联到ID的数量（列表页没有详情ID），不影响调度。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.valid = set()
+        self.absent = set()  # 探测确认不存在
+        self.misses = {}  # {ID: 抓取或探测没有内容的次数}
+        self.offsets = {}  # {断点文件: 已统计到的字节偏移}
+        self.listed = {}  # {列表页名称键: 关联到的ID}（覆盖率统计）
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.valid = set(data.get("valid", []))
+            self.absent = set(data.get("absent", []))
+            self.misses = {int(k): v for k, v in data.get("misses", {}).items()}
+            self.offsets = data.get("offsets", {})
+            self.listed = data.get("listed", {})
+
+    def is_missing(self, item_id):
+        if item_id in self.valid:
+            return False
+        return item_id in self.absent or self.misses.get(item_id, 0) >= MIN_MISSES
+
+    def schedule(self, ids):
+        """过滤掉已确认不存在的ID（保持原顺序，未知的ID照常调度）"""
+        return [i for i in ids if not self.is_missing(i)]
+
+    def add_miss(self, item_id):
+        self.misses[item_id] = self.misses.get(item_id, 0) + 1
+
+    def update_from_checkpoint(self, progress_file, id_key, name_key, list_names=()):
+        """统计断点文件中上次刷新之后新写入的记录
+
+        同一ID在一次刷新中多条“未获取到数据”只算一次未命中（一次抓取内的重复行来自图片路径修正），
+        名称与列表页名称（list_names，名称键）一致的成功记录记入 listed，用于统计列表页覆盖率。
+        """
+        key = os.path.abspath(progress_file)
+        records, self.offsets[key] = CheckpointStore(progress_file, id_key).records_since(self.offsets.get(key, 0))
+        missed, found = set(), {}
+        for record in records:
+            item_id = record.get(id_key)
+            if not isinstance(item_id, int):
+                continue
+            name = record.get(name_key)
+            if name == NOT_FOUND_NAME:
+                missed.add(item_id)
+            elif not is_failed_record(record, name_key):
+                self.valid.add(item_id)
+                found.setdefault(item_id, name)
+        for item_id in missed:
+            self.add_miss(item_id)
+        if list_names and found:
+            for key, item_id in zip(name_keys(found.values()), found):
+                if key in list_names:
+                    self.listed.setdefault(key, item_id)
+
+    def save(self):
+        """原子写入缓存文件"""
+        data = {
+            "valid": sorted(self.valid),
+            "absent": sorted(self.absent - self.valid),
+            "misses": {str(k): v for k, v in sorted(self.misses.items())},
+            "offsets": self.offsets,
+            "listed": self.listed,
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def summary(self, ids):
+        ids = list(ids)
+        missing = sum(1 for i in ids if self.is_missing(i))
+        known = sum(1 for i in ids if i in self.valid)
+        return {"total": len(ids), "valid": known, "missing": missing, "unknown": len(ids) - known - missing,
+                "listed": len(self.listed)}
+
+
+def load_list_names(job, list_file=None):
+    """列表页（菜品列表 / 食物分类表格）抓到的名称键集合（列表页尚未抓取时为空）"""
+    list_file = list_file or JOBS[job]["category_file"][0]
+    if not os.path.exists(list_file):
+        return set()
+    return set(load_categories(job, list_file)) - {""}
+
+
+def refresh_index(job, index_file=None, progress_file=None, list_file=None):
+    """读取缓存的索引并用断点文件更新（列表页名称只用于覆盖率统计），返回IdIndex"""
+    config = JOBS[job]
+    index = IdIndex(index_file or INDEX_FILES[job])
+    list_names = load_list_names(job, list_file)
+    index.update_from_checkpoint(progress_file or config["progress_file"], config["id_key"], config["name_key"],
+                                 list_names)
+    if list_names:
+        logger.info(f"列表页名称已关联ID：{len(index.listed)}/{len(list_names)}")
+    index.save()
+    return index
+
+
+def probe_ids(index, ids, engine, kind, workers=8):
+    """HTTP探测：详情页有内容 -> 存在，404 -> 不存在，已渲染的空状态页 -> 记一次未命中
+
+    客户端渲染的空壳页（真实ID也会返回）和网络错误保持未知，不计入未命中。
+    """
+    from http_fetch_engine import DISH_DETAIL_PATH, FOOD_DETAIL_PATH
+    from detail_parser import make_tree, has_content, is_empty_page
+
+    path = DISH_DETAIL_PATH if kind == "dish" else FOOD_DETAIL_PATH
+
+    def probe(item_id):
+        try:
+            html = engine.fetch_html(path.format(dish_id=item_id, food_id=item_id))
+        except Exception as e:
+            response = getattr(e, "response", None)
+            return item_id, "absent" if response is not None and response.status_code == 404 else None
+        tree = make_tree(html)
+        if has_content(tree):
+            return item_id, "valid"
+        return item_id, "miss" if is_empty_page(tree) else None
+
+    ids = [i for i in ids if i not in index.valid and not index.is_missing(i)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item_id, result in executor.map(probe, ids):
+            if result == "valid":
+                index.valid.add(item_id)
+            elif result == "absent":
+                index.absent.add(item_id)
+            elif result == "miss":
+                index.add_miss(item_id)
+    index.save()
+    return index
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="ID索引：从断点历史和HTTP探测中找出不存在的ID")
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("start_id", type=int)
+    parser.add_argument("end_id", type=int)
+    parser.add_argument("--index", help="索引缓存文件（默认 {job}_id_index.json）")
+    parser.add_argument("--progress-file", help="断点文件（默认为数据集的断点文件）")
+    parser.add_argument("--list-file", help="列表页CSV（默认为数据集的列表页分类文件）")
+    parser.add_argument("--probe", action="store_true", help="对未知ID做HTTP探测（需要登录）")
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    ids = range(args.start_id, args.end_id + 1)
+    index = refresh_index(args.job, args.index, args.progress_file, args.list_file)
+    if args.probe:
+        from http_fetch_engine import HttpFetchEngine
+        crawler = importlib.import_module(JOBS[args.job]["module"])
+        engine = HttpFetchEngine.login(args.username, args.password, crawler.init_driver, crawler.login_driver,
+                                       pool_size=args.workers)
+        if engine is None:
+            logger.error("登录失败，跳过HTTP探测")
+        else:
+            try:
+                probe_ids(index, ids, engine, args.job, args.workers)
+            finally:
+                engine.close()
+    logger.info(f"ID索引 {index.path}：{index.summary(ids)}")
+    return 0
+
+
+if __name__ == "__main__":
+    # 用法：python id_discovery.py dish 8456 34123 [--probe --username ... --password ...]
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import time
+import queue
+import logging
+import threading
+from contextlib import nullcontext
+import requests
+from requests.adapters import HTTPAdapter
+from image_store import ImageStore
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+
+
+class ImageDownloader:
+    """独立的图片下载阶段：抓取线程只投递 (ID, URL)，后台线程共享长连接池并发下载
+
+    下载不再阻塞页面抓取；队列有上限，下载积压过多时投递方会短暂等待（背压）。
+    图片按内容哈希去重存储，本地已有且校验通过的图片直接跳过下载。
+    传入 metrics（CrawlMetrics）时记录每次下载的耗时。
+    """
+
+    def __init__(self, save_dir, concurrency=4, max_retries=2, timeout=15, queue_size=1000, metrics=None):
+        self.save_dir = save_dir
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.metrics = metrics
+        self.store = ImageStore(save_dir)
+
+        # 所有下载线程共用一个Session，连接池大小与并发数一致（keep-alive复用TCP/TLS连接）
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = {}  # {ID: 错误信息}
+        self._workers = [threading.Thread(target=self._run, name=f"image-downloader-{i}", daemon=True)
+                         for i in range(concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, item_id, image_url):
+        """投递下载任务，立即返回图片的本地保存路径（本地已有有效图片则不再下载）"""
+        if self.store.has_valid(item_id):
+            with self._lock:
+                self.skipped += 1
+        else:
+            self._queue.put((item_id, image_url))
+        return self.store.image_path(item_id)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                self._download(*task)
+            finally:
+                self._queue.task_done()
+
+    def _download(self, item_id, image_url):
+        """下载单张图片（支持重试）"""
+        for retry in range(self.max_retries):
+            try:
+                with self.metrics.span("image_download") if self.metrics else nullcontext():
+                    resp = self.session.get(image_url, timeout=self.timeout, stream=True)
+                    resp.raise_for_status()
+                    self.store.put_stream(item_id, resp.iter_content(chunk_size=8192))
+                with self._lock:
+                    self.downloaded += 1
+                    self.failed.pop(item_id, None)
+                return
+            except Exception as e:
+                logger.warning(f"图片下载失败（ID:{item_id}，重试 {retry + 1}/{self.max_retries}）：{e}")
+                if self.metrics:
+                    self.metrics.event("image_download_error")
+                if retry < self.max_retries - 1:
+                    time.sleep(1)  # 重试间隔
+                else:
+                    with self._lock:
+                        self.failed[item_id] = str(e)
+
+    def close(self):
+        """等待队列中的图片全部下载完毕并关闭连接池，返回下载失败的ID列表"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self.session.close()
+        logger.info(f"图片下载完成：成功 {self.downloaded} 张，已存在跳过 {self.skipped} 张，失败 {len(self.failed)} 张")
+        return list(self.failed)
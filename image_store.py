@@ -0,0 +1,123 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 常见图片文件头，用于接管没有清单记录的历史图片
+IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG", b"GIF8", b"RIFF")
+
+
+class ImageStore:
+    """按内容哈希存储图片：相同图片只存一份，{ID}.jpg 以硬链接指向内容文件
+
+    目录结构保持 {save_dir}/{ID}.jpg 不变，内容文件存放在 {save_dir}/.blobs/ 下；
+    manifest.jsonl 追加记录 ID -> sha256/大小，已存在且校验通过的图片不再下载。
+    """
+
+    def __init__(self, save_dir):
+        self.save_dir = save_dir
+        self.blob_dir = os.path.join(save_dir, ".blobs")
+        self.manifest_path = os.path.join(save_dir, "manifest.jsonl")
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        """读取清单（同一ID以最后一条为准）"""
+        manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    manifest[str(entry["id"])] = entry
+        return manifest
+
+    def image_path(self, item_id):
+        """图片路径（以ID命名）"""
+        filename = f"{item_id}.jpg" if str(item_id).strip() else "none.jpg"
+        return os.path.join(self.save_dir, filename)
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256[:2], f"{sha256}.jpg")
+
+    @staticmethod
+    def file_sha256(path):
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def has_valid(self, item_id):
+        """图片已存在且大小、校验和与清单一致（无清单记录的历史图片校验文件头后接管）"""
+        path = self.image_path(item_id)
+        if not os.path.isfile(path):
+            return False
+
+        entry = self.manifest.get(str(item_id))
+        if entry is None:
+            return self._adopt(item_id, path)
+        if os.path.getsize(path) != entry["size"]:
+            return False
+        return self.file_sha256(path) == entry["sha256"]
+
+    def _adopt(self, item_id, path):
+        """将没有清单记录的历史图片纳入内容存储"""
+        with open(path, 'rb') as f:
+            head = f.read(8)
+        if not head.startswith(IMAGE_SIGNATURES):
+            return False
+        tmp_path = os.path.join(self.blob_dir, f"{uuid.uuid4().hex}.tmp")
+        shutil.copyfile(path, tmp_path)
+        self._commit(item_id, tmp_path, self.file_sha256(tmp_path), os.path.getsize(tmp_path))
+        return True
+
+    def put_stream(self, item_id, chunks):
+        """写入图片内容（边写边计算哈希），返回图片路径"""
+        h = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.blob_dir, f"{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+                        h.update(chunk)
+                        size += len(chunk)
+            return self._commit(item_id, tmp_path, h.hexdigest(), size)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _commit(self, item_id, tmp_path, sha256, size):
+        """临时文件归档为内容文件，{ID}.jpg 链接到内容文件并记录清单"""
+        blob = self.blob_path(sha256)
+        path = self.image_path(item_id)
+        with self._lock:
+            if os.path.exists(blob):
+                os.remove(tmp_path)  # 重复图片，只保留已有的一份
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(tmp_path, blob)
+
+            link_tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                os.link(blob, link_tmp)
+            except OSError:
+                shutil.copyfile(blob, link_tmp)  # 不支持硬链接的文件系统退化为复制
+            os.replace(link_tmp, path)
+
+            entry = {"id": item_id, "sha256": sha256, "size": size}
+            self.manifest[str(item_id)] = entry
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return path
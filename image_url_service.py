@@ -0,0 +1,273 @@
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from urllib.parse import urlsplit, parse_qs
+from calendar import timegm
+
+from detail_parser import make_tree, extract_image_url, has_content
+from http_fetch_engine import DISH_DETAIL_PATH, FOOD_DETAIL_PATH, SessionExpiredError
+from rate_limiter import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+CACHE_DB = "image_url_cache.db"
+DEFAULT_TTL = 600  # 无法从URL中读出过期时间时的缓存时长（秒）
+TTL_RATIO = 0.8  # 缓存时长取URL剩余有效期的80%，消费方拿到的链接至少还有20%的有效期
+MIN_TTL = 30  # 剩余有效期不足该值的链接不缓存
+NEGATIVE_TTL = 300  # 详情页没有图片的ID短时间内不再重复请求
+DETAIL_PATHS = {"dish": DISH_DETAIL_PATH, "food": FOOD_DETAIL_PATH}
+
+
+def url_expires_at(url):
+    """从签名URL的查询参数读出过期时间（epoch秒），无法识别时返回None
+
+    支持 Expires / x-oss-expires / e（绝对时间）和 X-Amz-Date + X-Amz-Expires（相对时间）。
+    """
+    params = {key.lower(): values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+    for key in ("expires", "x-oss-expires", "e"):
+        if params.get(key, "").isdigit():
+            return int(params[key])
+    if params.get("x-amz-expires", "").isdigit() and "x-amz-date" in params:
+        try:
+            signed_at = timegm(time.strptime(params["x-amz-date"], "%Y%m%dT%H%M%SZ"))
+        except ValueError:
+            return None
+        return signed_at + int(params["x-amz-expires"])
+    return None
+
+
+def cache_ttl(url, now):
+    """链接的缓存时长：低于URL自带的过期时间，未带过期时间时为 DEFAULT_TTL"""
+    expires_at = url_expires_at(url)
+    if expires_at is None:
+        return DEFAULT_TTL
+    return min(DEFAULT_TTL, (expires_at - now) * TTL_RATIO)
+
+
+class ImageUnresolvedError(Exception):
+    """HTTP拿到的是未渲染的空壳页面且没有兜底，无法判断有没有图片"""
+
+
+def selenium_fallback(crawler, pool, kind):
+    """Selenium兜底：页面图片由前端渲染、HTTP请求拿不到时，用池中已登录的浏览器打开详情页"""
+    from http_fetch_engine import BASE_URL
+
+    def resolve(item_id):
+        with pool.driver() as driver:
+            driver.get(f"{BASE_URL}{DETAIL_PATHS[kind].format(dish_id=item_id, food_id=item_id)}")
+            crawler.wait_page_ready(driver)
+            return extract_image_url(make_tree(driver.page_source), driver.current_url)
+    return resolve
+
+
+class ImageUrlService:
+    """按需获取最新的图片URL：图片链接带有效期，不再长期保存，需要时按ID现取
+
+    查找顺序：SQLite缓存（未过期） -> HTTP请求详情页只解析图片（免浏览器） -> fallback（如Selenium）。
+    get_many() 批量查找：缓存命中的直接返回，其余并发请求；多个线程同时查同一ID时只请求一次。
+    只有已渲染出内容的页面没有图片才缓存为“没有图片”；空壳页面没有fallback时算作未解析，不写缓存。
+    """
+
+    def __init__(self, kind, engine, fallback=None, cache_db=CACHE_DB, workers=8, rate_limiter=None):
+        self.kind = kind
+        self.engine = engine
+        self.fallback = fallback
+        self.workers = workers
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(initial_rate=2.0, max_rate=10.0)
+        self._conn = sqlite3.connect(cache_db, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # 多个进程可共用缓存
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_urls (
+                kind TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                url TEXT,
+                expires_at REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (kind, id)
+            )""")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._inflight = {}  # {ID: Future}，同一ID的并发查找共用一次请求
+        self.stats = {"cache_hit": 0, "http": 0, "fallback": 0, "missing": 0, "unresolved": 0, "error": 0}
+
+    # ---------- 缓存 ----------
+    def _cached(self, ids, now):
+        """未过期的缓存 {ID: URL或None}"""
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), 500):  # SQLite参数个数有上限，分批查询
+                chunk = ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, url FROM image_urls WHERE kind = ? AND expires_at > ? "
+                    f"AND id IN ({','.join('?' * len(chunk))})", (self.kind, now, *chunk))
+                found.update(rows)
+        return found
+
+    def _store(self, item_id, url, now):
+        ttl = cache_ttl(url, now) if url else NEGATIVE_TTL
+        if ttl < MIN_TTL:
+            return
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO image_urls VALUES (?, ?, ?, ?, ?)",
+                               (self.kind, item_id, url, now + ttl, now))
+            self._conn.commit()
+
+    def invalidate(self, ids):
+        """消费方发现链接已失效（如返回403）时调用，下次查找重新获取"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM image_urls WHERE kind = ? AND id = ?",
+                                   [(self.kind, i) for i in ids])
+            self._conn.commit()
+
+    # ---------- 获取 ----------
+    def _fetch(self, item_id):
+        """HTTP请求详情页只提取图片地址，拿不到时走fallback；返回URL或None（页面没有图片）
+
+        空壳页面（未渲染出详情内容）没有fallback时抛出 ImageUnresolvedError，不当作“没有图片”。
+        """
+        path = DETAIL_PATHS[self.kind].format(dish_id=item_id, food_id=item_id)
+        url, error, rendered = None, None, False
+        self.rate_limiter.acquire()
+        start_time_ts = time.time()
+        try:
+            html = self.engine.fetch_html(path)
+            self.rate_limiter.report(latency=time.time() - start_time_ts)
+            tree = make_tree(html)
+            url = extract_image_url(tree, f"{self.engine.base_url}{path}")
+            rendered = has_content(tree)
+            source = "http"
+        except Exception as e:
+            self.rate_limiter.report(ok=False, login_redirect=isinstance(e, SessionExpiredError))
+            logger.warning(f"HTTP获取图片地址失败（ID:{item_id}）：{e}")
+            error = e
+        if not (url or "").startswith(("http://", "https://")) and self.fallback:
+            url = self.fallback(item_id)
+            source = "fallback"
+        elif error is not None:
+            raise error  # 网络错误不当作“没有图片”缓存
+        elif not (url or "").startswith(("http://", "https://")) and not rendered:
+            raise ImageUnresolvedError(f"详情页为未渲染的空壳页面（ID:{item_id}），需要Selenium兜底")
+        if not (url or "").startswith(("http://", "https://")):
+            return None, "missing"
+        return url, source
+
+    def _resolve(self, item_id, future):
+        try:
+            url, source = self._fetch(item_id)
+            self._store(item_id, url, time.time())
+            with self._lock:
+                self.stats[source] += 1
+            future.set_result(url)
+        except Exception as e:
+            with self._lock:
+                self.stats["unresolved" if isinstance(e, ImageUnresolvedError) else "error"] += 1
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(item_id, None)
+
+    def get(self, item_id):
+        """单个ID的最新图片URL（没有图片或获取失败时返回None）"""
+        return self.get_many([item_id]).get(item_id)
+
+    def get_many(self, ids):
+        """批量获取 {ID: URL或None}；获取失败（网络错误、空壳页面无法判断等）的ID不在结果中"""
+        ids = list(dict.fromkeys(ids))
+        result = self._cached(ids, time.time())
+        with self._lock:
+            self.stats["cache_hit"] += len(result)
+        waiting, owned = {}, []
+        with self._lock:
+            for item_id in ids:
+                if item_id in result:
+                    continue
+                future = self._inflight.get(item_id)
+                if future is None:
+                    future = self._inflight[item_id] = Future()
+                    owned.append((item_id, future))
+                waiting[item_id] = future
+
+        if owned:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(owned))) as executor:
+                for item_id, future in owned:
+                    executor.submit(self._resolve, item_id, future)
+        for item_id, future in waiting.items():
+            try:
+                result[item_id] = future.result()
+            except Exception as e:
+                logger.error(f"获取图片地址失败（ID:{item_id}）：{e}")
+        return result
+
+    def refresh_records(self, records, id_key, url_key="图片URL"):
+        """将记录中的图片URL替换为最新链接（原地修改并返回记录列表）"""
+        urls = self.get_many([record[id_key] for record in records])
+        for record in records:
+            if record[id_key] in urls:
+                record[url_key] = urls[record[id_key]] or ""
+        return records
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="按ID获取最新的图片URL（带缓存）")
+    parser.add_argument("kind", choices=sorted(DETAIL_PATHS))
+    parser.add_argument("ids", type=int, nargs="+")
+    parser.add_argument("--cache-db", default=CACHE_DB)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--fallback-drivers", type=int, default=1,
+                        help="Selenium兜底的浏览器数（空壳页面由浏览器渲染后再取图片；0 表示不兜底）")
+    args = parser.parse_args(argv)
+
+    from http_fetch_engine import HttpFetchEngine
+    from crawl_orchestrator import JOBS
+    crawler = importlib.import_module(JOBS[args.kind]["module"])
+    pool, fallback = None, None
+    if args.fallback_drivers > 0:
+        from driver_pool import DriverPool
+        pool = DriverPool(args.fallback_drivers, crawler.init_driver, crawler.login_driver, args.username,
+                          args.password)
+        try:
+            engine = HttpFetchEngine.from_pool(pool, pool_size=args.workers)
+        except Exception as e:
+            logger.error(f"登录失败：{e}")
+            pool.close()
+            return 1
+        fallback = selenium_fallback(crawler, pool, args.kind)
+    else:
+        engine = HttpFetchEngine.login(args.username, args.password, crawler.init_driver, crawler.login_driver,
+                                       pool_size=args.workers)
+        if engine is None:
+            logger.error("登录失败")
+            return 1
+    service = ImageUrlService(args.kind, engine, fallback=fallback, cache_db=args.cache_db, workers=args.workers)
+    try:
+        urls = service.get_many(args.ids)
+        print(json.dumps(urls, ensure_ascii=False, indent=2))
+        logger.info(f"图片地址获取统计：{service.stats}")
+        unresolved = [item_id for item_id in args.ids if item_id not in urls]
+        if unresolved:
+            logger.warning(f"未能获取图片地址的ID（{len(unresolved)} 个，可稍后重试）：{unresolved}")
+    finally:
+        service.close()
+        engine.close()
+        if pool is not None:
+            pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    # 用法：python image_url_service.py dish 8456 8457 --username ... --password ...
+    sys.exit(main())
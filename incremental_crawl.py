@@ -0,0 +1,316 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import importlib
+import threading
+import unicodedata
+
+from checkpoint_store import CheckpointStore, is_failed_record
+from crawl_orchestrator import JOBS
+from records import RECORD_TYPES, as_dict
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+FINGERPRINT_DBS = {"dish": "dish_fingerprints.db", "food": "food_fingerprints.db"}
+OUTPUT_DIR = "incremental_updates"  # 每次增量运行输出一个变更文件 + 一份变更报告
+NOT_FOUND_NAME = "未获取到数据"
+
+# 参与指纹计算的字段：名称、成分、营养素、做法（图片URL带有效期签名，每次抓取都会变化，不参与）
+FINGERPRINT_FIELDS = {
+    "dish": ["菜品名称", "成分", "计量单位", "菜肴做法", "能量及宏量营养素", "维生素", "矿物质", "单位量"],
+    "food": ["食物名称", "成分", "计量单位", "能量及宏量营养素", "维生素", "矿物质", "单位量"],
+}
+
+
+# ==================== 指纹 ====================
+def normalize_text(value):
+    """字段规范化：全角转半角、逐行去除首尾空白并合并连续空白、去掉空行"""
+    text = unicodedata.normalize("NFKC", "" if value is None else str(value))
+    lines = (re.sub(r"\s+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def canonical_record(job, record):
+    """统一为记录类输出的格式（字段顺序、失败记录格式一致）"""
+    return RECORD_TYPES[job].from_dict(as_dict(record)).to_dict()
+
+
+def record_fingerprint(record, fields):
+    """记录指纹：规范化后各字段的SHA-256（只因空白、全半角不同的页面视为未变化）
+
+    record 应为 canonical_record() 的结果。
+    """
+    payload = json.dumps([normalize_text(record.get(field)) for field in fields], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def changed_fields(old, new, fields):
+    """规范化后内容不同的字段列表"""
+    return [field for field in fields if normalize_text(old.get(field)) != normalize_text(new.get(field))]
+
+
+def name_keys(names):
+    """分类关联用的名称键：与清洗阶段分类匹配的规范化一致（全角转半角、去掉「」别名、去除空白、英文小写）"""
+    from nutridata_data.category_matcher import normalize_names  # 依赖pandas，只在关联分类时导入
+    return normalize_names(list(names)).tolist()
+
+
+def load_categories(job, category_file=None):
+    """读取列表页分类数据 {名称键: 分类}（文件不存在时返回空字典，全部归入未分类）"""
+    path, column = JOBS[job]["category_file"]
+    path = category_file or path
+    if not os.path.exists(path):
+        logger.warning(f"分类文件不存在：{path}，按类别抽样时全部归入未分类")
+        return {}
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    categories = {}
+    for key, row in zip(name_keys(row.get("名称") for row in rows), rows):
+        categories.setdefault(key, row.get(column) or "")
+    return categories
+
+
+class FingerprintDB:
+    """每个ID的内容指纹及上次检查/变化时间（SQLite），增量抓取按检查时间挑选ID"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                category TEXT NOT NULL DEFAULT '',
+                checked_at REAL NOT NULL,
+                changed_at REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_checked ON fingerprints (category, checked_at)")
+        self._conn.commit()
+
+    def seed(self, job, records, categories, checked_at):
+        """用断点文件中的成功记录补齐尚无指纹的ID（已有的ID只补分类），返回新增数量"""
+        id_key, name_key = JOBS[job]["id_key"], JOBS[job]["name_key"]
+        records = [record for record in records
+                   if not is_failed_record(record, name_key) and record.get(name_key) != NOT_FOUND_NAME]
+        keys = name_keys(record.get(name_key) for record in records) if categories else [""] * len(records)
+        rows = [(record[id_key], record_fingerprint(canonical_record(job, record), FINGERPRINT_FIELDS[job]),
+                 categories.get(key, ""), checked_at, checked_at)
+                for record, key in zip(records, keys)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?, ?, ?)", rows)
+            added = self._conn.total_changes - before
+            self._conn.executemany("UPDATE fingerprints SET category = ? WHERE id = ? AND category = ''",
+                                   [(row[2], row[0]) for row in rows if row[2]])
+            self._conn.commit()
+        return added
+
+    def select(self, strategy="oldest", limit=500, per_category=5):
+        """挑选待复查的ID：oldest 检查时间最早的 limit 个；sample 每个分类检查时间最早的 per_category 个"""
+        with self._lock:
+            if strategy == "oldest":
+                rows = self._conn.execute("SELECT id FROM fingerprints ORDER BY checked_at, id LIMIT ?", (limit,))
+            elif strategy == "sample":
+                rows = self._conn.execute("""
+                    SELECT id FROM (
+                        SELECT id, checked_at,
+                               ROW_NUMBER() OVER (PARTITION BY category ORDER BY checked_at, id) AS rank
+                        FROM fingerprints)
+                    WHERE rank <= ? ORDER BY checked_at, id LIMIT ?""", (per_category, limit))
+            else:
+                raise ValueError(f"未知的挑选策略：{strategy}")
+            return [row[0] for row in rows]
+
+    def get(self, item_id):
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM fingerprints WHERE id = ?", (item_id,)).fetchone()
+        return row[0] if row else None
+
+    def update(self, item_id, fingerprint, now, changed):
+        """记录一次检查结果（内容变化时同时更新变化时间）"""
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO fingerprints (id, fingerprint, checked_at, changed_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET fingerprint = excluded.fingerprint, checked_at = excluded.checked_at,
+                    changed_at = CASE WHEN ? THEN excluded.changed_at ELSE changed_at END""",
+                               (item_id, fingerprint, now, now, changed))
+            self._conn.commit()
+
+    def touch(self, item_id, now):
+        """只更新检查时间（页面已无内容时保留原指纹）"""
+        with self._lock:
+            self._conn.execute("UPDATE fingerprints SET checked_at = ? WHERE id = ?", (now, item_id))
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ==================== 变化检测 ====================
+class ChangeDetector:
+    """替代断点存储传给爬虫的批次函数：逐条比较指纹，只把内容变化的记录写入变更文件
+
+    crawl_*_batches 只通过 save_progress() 调用 append_many()，因此无需改动爬虫脚本。
+    progress_store 不为None时，变化的记录同时追加到数据集的断点文件（compact 后即为最新数据）。
+    """
+
+    def __init__(self, db, job, delta_store, previous, progress_store=None):
+        config = JOBS[job]
+        self.job = job
+        self.db = db
+        self.id_key = config["id_key"]
+        self.name_key = config["name_key"]
+        self.fields = FINGERPRINT_FIELDS[job]
+        self.delta_store = delta_store
+        self.progress_store = progress_store
+        self.previous = previous  # 抓取前各ID的最新记录，用于列出变化的字段
+        self.changes = []
+        self.counts = {"fetched": 0, "unchanged": 0, "changed": 0, "new": 0, "failed": 0, "disappeared": 0}
+
+    def append_many(self, records):
+        now = time.time()
+        delta = []
+        for record in records:
+            record = as_dict(record)
+            item_id = record[self.id_key]
+            self.counts["fetched"] += 1
+            if is_failed_record(record, self.name_key):
+                self.counts["failed"] += 1  # 不更新检查时间，下次运行优先重试
+                continue
+            if record.get(self.name_key) == NOT_FOUND_NAME:
+                self.counts["disappeared"] += 1
+                self.changes.append({"id": item_id, "type": "disappeared"})
+                self.db.touch(item_id, now)
+                continue
+
+            fingerprint = record_fingerprint(canonical_record(self.job, record), self.fields)
+            old_fingerprint = self.db.get(item_id)
+            if fingerprint == old_fingerprint:
+                self.counts["unchanged"] += 1
+                self.db.update(item_id, fingerprint, now, False)
+                continue
+
+            change_type = "new" if old_fingerprint is None else "changed"
+            old_record = canonical_record(self.job, self.previous.get(item_id, {}))
+            self.counts[change_type] += 1
+            self.changes.append({
+                "id": item_id, "name": record.get(self.name_key), "type": change_type,
+                "fields": changed_fields(old_record, canonical_record(self.job, record), self.fields),
+            })
+            self.db.update(item_id, fingerprint, now, True)
+            delta.append(record)
+
+        if delta:
+            self.delta_store.append_many(delta)
+            if self.progress_store is not None:
+                self.progress_store.append_many(delta)
+
+    def patch(self, ids, fields):
+        """图片下载失败的记录清空本地图片路径（只修正本次写入变更文件的记录）"""
+        ids = set(ids) & {change["id"] for change in self.changes if change["type"] != "disappeared"}
+        self.delta_store.patch(ids, fields)
+        if self.progress_store is not None:
+            self.progress_store.patch(ids, fields)
+
+    def report(self):
+        field_counts = {}
+        for change in self.changes:
+            for field in change.get("fields", []):
+                field_counts[field] = field_counts.get(field, 0) + 1
+        return {**self.counts, "field_counts": field_counts, "changes": self.changes}
+
+
+# ==================== 增量抓取 ====================
+def incremental_crawl(job, username, password, strategy="oldest", limit=500, per_category=5, engine="http",
+                      batch_size=100, max_workers=3, image_workers=4, db_path=None, category_file=None,
+                      output_dir=OUTPUT_DIR, update_progress=True):
+    """按优先级复查已抓取的ID，只输出内容变化的记录
+
+    strategy: "oldest" 检查时间最早的优先；"sample" 每个分类抽样 per_category 个（总数不超过 limit）
+    update_progress: 变化的记录同时追加到数据集的断点文件
+    输出 {output_dir}/{job}_delta_{时间}.jsonl（变化的记录）和 {job}_changes_{时间}.json（变更报告），返回报告
+    """
+    config = JOBS[job]
+    crawler = importlib.import_module(config["module"])
+    from driver_pool import DriverPool
+    from image_pipeline import ImageDownloader
+
+    progress = CheckpointStore(config["progress_file"], config["id_key"])
+    previous = progress.latest()
+    db = FingerprintDB(db_path or FINGERPRINT_DBS[job])
+    seeded_at = os.path.getmtime(progress.path) if os.path.exists(progress.path) else time.time()
+    added = db.seed(job, previous.values(), load_categories(job, category_file), seeded_at)
+    ids = db.select(strategy, limit, per_category)
+    logger.info(f"指纹库 {db.path}：共 {db.count()} 个ID（本次补充 {added} 个），按 {strategy} 挑选 {len(ids)} 个复查")
+
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    delta_store = CheckpointStore(os.path.join(output_dir, f"{job}_delta_{stamp}.jsonl"), config["id_key"])
+    detector = ChangeDetector(db, job, delta_store, previous, progress if update_progress else None)
+    report = {"job": job, "strategy": strategy, "selected": len(ids), "started_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    crawler.metrics.reset(None)
+    pool = DriverPool(max_workers, crawler.init_driver, crawler.login_driver, username, password)
+    downloader = ImageDownloader(config["image_dir"], concurrency=image_workers, metrics=crawler.metrics)
+    try:
+        stats = {"processed": 0, "success": 0}
+        getattr(crawler, config["batches"])(ids, pool, downloader, batch_size, max_workers, engine, detector,
+                                            stats, len(ids))
+    finally:
+        pool.close()
+        detector.patch(downloader.close(), {"本地图片路径": ""})
+        delta_store.close()
+        progress.close()
+        db.close()
+
+    report.update(detector.report())
+    report.update({"finished_at": time.strftime("%Y-%m-%d %H:%M:%S"), "delta_file": delta_store.path})
+    report_path = os.path.join(output_dir, f"{job}_changes_{stamp}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"增量抓取完成：复查 {report['fetched']} 条，变化 {report['changed']}，新增 {report['new']}，"
+                f"未变 {report['unchanged']}，失败 {report['failed']}，已无内容 {report['disappeared']}；"
+                f"变化字段 {report['field_counts']}，报告 {report_path}")
+    return report
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="增量复查：按指纹检测内容变化，只输出变化的记录")
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("--strategy", default="oldest", choices=["oldest", "sample"])
+    parser.add_argument("--limit", type=int, default=500, help="本次最多复查的ID数")
+    parser.add_argument("--per-category", type=int, default=5, help="sample 策略下每个分类抽样数")
+    parser.add_argument("--engine", default="http", choices=["selenium", "http"])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--db", help="指纹库（默认 {job}_fingerprints.db）")
+    parser.add_argument("--category-file", help="列表页分类CSV（默认为分类爬虫的输出）")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--no-update-progress", action="store_true", help="变化的记录不写回数据集的断点文件")
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    args = parser.parse_args(argv)
+
+    incremental_crawl(args.job, args.username, args.password, args.strategy, args.limit, args.per_category,
+                      args.engine, max_workers=args.workers, db_path=args.db, category_file=args.category_file,
+                      output_dir=args.output_dir, update_progress=not args.no_update_progress)
+    return 0
+
+
+if __name__ == "__main__":
+    # 用法：python incremental_crawl.py dish --strategy sample --per-category 3 --username ... --password ...
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 能量容差（kcal）：|详情能量 - 列表页能量| 不超过该值视为同一菜品
+ENERGY_TOLERANCE = 0.5
+# 「」中的别名（食物名称常见，如“稻米「粳米」”）
+ALIAS_PATTERN = r'「.*$'
+# 括号内的补充说明（NFKC规范化后全角括号已转为半角）
+BRACKET_PATTERN = r'\([^)]*\)|\[[^\]]*\]|【[^】]*】'
+
+
+def normalize_names(names):
+    """名称规范化：全角转半角（NFKC）、去掉「」别名、去除所有空白、英文小写"""
+    return (pd.Series(names).fillna("").astype(str)
+            .str.normalize("NFKC")
+            .str.replace(ALIAS_PATTERN, "", regex=True)
+            .str.replace(r"\s+", "", regex=True)
+            .str.lower())
+
+
+def base_names(normalized):
+    """去掉括号说明后的基础名称（用于名称变体的兜底匹配）"""
+    return normalized.str.replace(BRACKET_PATTERN, "", regex=True)
+
+
+def _key_lookup(left, right, key, value_columns, unique_only):
+    """按名称键哈希查找：unique_only 时只接受对应唯一分类的键，否则取第一条；返回 (匹配结果, 有歧义的键数)"""
+    right = right[right[key] != ""]
+    distinct = right.drop_duplicates([key] + value_columns)
+    counts = distinct[key].value_counts()
+    ambiguous = int((counts > 1).sum())
+    if unique_only:
+        distinct = distinct[distinct[key].map(counts) == 1]
+    lookup = distinct.drop_duplicates(key)
+    return left.merge(lookup[[key] + value_columns], on=key, how="inner"), ambiguous
+
+
+def _energy_lookup(left, right, value_columns, tolerance):
+    """同名且能量在容差内的候选中取能量最接近的一条（按能量分桶，只比较相邻桶）"""
+    left = left.dropna(subset=["energy"])
+    right = right[right["key"] != ""].dropna(subset=["energy"])
+    left = left.assign(bucket=np.floor(left["energy"] / tolerance).astype("int64"))
+    right = right.assign(bucket=np.floor(right["energy"] / tolerance).astype("int64"))
+
+    candidates = pd.concat(
+        [left.assign(bucket=left["bucket"] + shift).merge(right, on=["key", "bucket"], suffixes=("", "_category"))
+         for shift in (-1, 0, 1)],
+        ignore_index=True
+    )
+    candidates["delta"] = (candidates["energy"] - candidates["energy_category"]).abs()
+    candidates = candidates[candidates["delta"] <= tolerance]
+    # 每个详情行只保留一条：能量差最小，相同时取分类表中靠前的记录
+    best = candidates.sort_values(["row", "delta", "order"], kind="stable").drop_duplicates("row")
+    return best[["row"] + value_columns]
+
+
+def match_categories(details, categories, detail_name, category_name, value_columns,
+                     detail_energy=None, category_energy=None, tolerance=ENERGY_TOLERANCE):
+    """详情表匹配分类：每个详情行最多匹配一条分类，返回 (与details同索引的分类列 + match_tier, 匹配统计)
+
+    给出能量列时依次尝试：同名且能量在容差内 -> 同名且分类唯一；
+    否则依次尝试：同名（重名取第一条）-> 去括号说明后同名且分类唯一。
+    """
+    value_columns = list(value_columns)
+    left = pd.DataFrame({"row": np.arange(len(details)), "key": normalize_names(details[detail_name]).values})
+    right = pd.DataFrame({"key": normalize_names(categories[category_name]).values,
+                          "order": np.arange(len(categories))})
+    for col in value_columns:
+        right[col] = categories[col].values
+
+    tiers = []
+    if detail_energy is not None:
+        left["energy"] = pd.to_numeric(details[detail_energy], errors="coerce").astype("float64").values
+        right["energy"] = pd.to_numeric(categories[category_energy], errors="coerce").astype("float64").values
+        tiers.append(("name+energy", lambda rows: (_energy_lookup(rows, right, value_columns, tolerance), 0)))
+        tiers.append(("name", lambda rows: _key_lookup(rows, right, "key", value_columns, unique_only=True)))
+    else:
+        left["base"] = base_names(left["key"]).values
+        right["base"] = base_names(right["key"]).values
+        tiers.append(("name", lambda rows: _key_lookup(rows, right, "key", value_columns, unique_only=False)))
+        tiers.append(("base_name", lambda rows: _key_lookup(rows, right, "base", value_columns, unique_only=True)))
+
+    result = pd.DataFrame({col: pd.Series(pd.NA, index=range(len(details)), dtype=object) for col in value_columns})
+    result["match_tier"] = pd.Series(pd.NA, index=range(len(details)), dtype=object)
+    stats = {"rows": len(details), "by_tier": {}, "ambiguous_keys": 0}
+
+    remaining = left
+    for tier, lookup in tiers:
+        matched, ambiguous = lookup(remaining)
+        rows = matched["row"].to_numpy()
+        for col in value_columns:
+            result.loc[rows, col] = matched[col].to_numpy()
+        result.loc[rows, "match_tier"] = tier
+        stats["by_tier"][tier] = len(rows)
+        stats["ambiguous_keys"] = max(stats["ambiguous_keys"], ambiguous)
+        remaining = remaining[~remaining["row"].isin(rows)]
+
+    stats["matched"] = len(details) - len(remaining)
+    stats["match_rate"] = round(stats["matched"] / len(details), 4) if len(details) else 0.0
+    result.index = details.index
+    return result, stats
+
+
+def log_match_stats(stats, label=""):
+    logger.info(f"{label}分类匹配：{stats['matched']}/{stats['rows']}（{stats['match_rate']:.2%}），"
+                f"各层级 {stats['by_tier']}，重名且分类不同的名称 {stats['ambiguous_keys']} 个")
@@ -0,0 +1,343 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import inspect
+import logging
+import argparse
+import importlib.util
+
+import pandas as pd
+
+from nutridata_data.nutrient_parser import (CN_TO_EN, combine_nutrient_text, expand_nutrients, nutrient_columns,
+                                            enforce_nutrient_dtypes)
+from nutridata_data.category_matcher import match_categories, log_match_stats
+from nutridata_data import nutrient_parser, nutrient_schema, category_matcher
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".pipeline_cache")
+# Parquet读写依赖pyarrow；未安装时输出退回Excel
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# 去除NRV百分比和含量，只保留营养素名称（用于检查是否有未收录的营养素）
+CATEGORY_CLEAN_PATTERN = r'\d+% NRV|\d+\.?\d* (μg RAE|mg α-TE|mg|μg|kcal|g)'
+# “数字（含小数）+ 单位”，支持中文单位（克/毫升/升）和英文单位（mg/μg/ml/L）
+NUM_UNIT_PATTERN = r'(\d+\.?\d*)\s*[克毫升升mgμgmlL]'
+
+
+# ==================== 通用清洗函数 ====================
+def clean_for_category(text):
+    """去除NRV的百分比和克数等内容，只保留营养素名称"""
+    return re.sub(CATEGORY_CLEAN_PATTERN, '', text).strip()
+
+
+def nutrient_categories(texts):
+    """提取所有营养素名称（按首次出现顺序去重）"""
+    lines = pd.Series(texts).str.split('\n').explode().dropna()
+    cleaned = lines.str.replace(CATEGORY_CLEAN_PATTERN, '', regex=True).str.strip()
+    return cleaned[cleaned != ''].unique().tolist()
+
+
+def extract_num_unit(texts):
+    """提取“数字+单位”中的数字（无匹配或缺失时为空字符串）"""
+    texts = pd.Series(texts)
+    nums = texts.astype(str).str.extract(NUM_UNIT_PATTERN, flags=re.IGNORECASE, expand=False).str.strip()
+    return nums.where(texts.notna() & nums.notna(), "")
+
+
+def move_before(df, columns, anchor):
+    """将columns移动到anchor列之前"""
+    cols = [c for c in df.columns if c not in columns]
+    index = cols.index(anchor)
+    return df[cols[:index] + list(columns) + cols[index:]]
+
+
+# ==================== 列式存储读写 ====================
+def snapshot_path(path, sheet_name):
+    """Excel工作表对应的Parquet快照路径"""
+    return f"{os.path.splitext(path)[0]}.{sheet_name}.parquet"
+
+
+def read_table(path, sheet_name=None, columns=None):
+    """读取表格：.parquet/.feather 只解析需要的列；Excel优先读取不早于原文件的Parquet快照，没有则读取Excel并生成快照"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+    if ext in (".feather", ".arrow"):
+        return pd.read_feather(path, columns=columns)
+
+    snapshot = snapshot_path(path, sheet_name)
+    if HAS_PYARROW and os.path.exists(snapshot) and os.path.getmtime(snapshot) >= os.path.getmtime(path):
+        return pd.read_parquet(snapshot, columns=columns)
+
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    if HAS_PYARROW:
+        try:
+            df.to_parquet(snapshot, index=False)
+        except (ValueError, TypeError) as e:  # 混合类型列无法转为列式存储时只读Excel
+            logger.warning(f"生成Parquet快照失败（{path}）：{e}")
+    return df[columns] if columns else df
+
+
+def write_table(df, path):
+    """按扩展名写入 .parquet / .feather / .xlsx（营养素列先统一为可空类型）"""
+    df = enforce_nutrient_dtypes(df)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        df.to_parquet(path, index=False)
+    elif ext in (".feather", ".arrow"):
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_excel(path, index=False)
+    return df
+
+
+# ==================== 数据集差异部分 ====================
+def join_dish_categories(categories, info):
+    """按 (规范化菜品名称, 能量±容差) 关联菜品分类，每行最多匹配一个分类"""
+    categories = categories.copy()
+    categories['pure_calorie'] = categories['calorie'].str.extract(r'(\d+\.?\d*)\s*kcal', expand=False).astype(float)
+    matched, stats = match_categories(info, categories, 'dish_name', 'dish_name', ['category'],
+                                      detail_energy='energy_num', category_energy='pure_calorie')
+    log_match_stats(stats, "[dish] ")
+    info = info.copy()
+    info['category'] = matched['category'].fillna('/')  # 未匹配到的分类用'/'表示
+    return info
+
+
+def join_food_categories(categories, info):
+    """按规范化食物名称（去掉「」中的别名）关联一级、二级分类，每行最多匹配一个分类"""
+    info = info.copy()
+    info['food_name'] = info['food_name'].str.split('「').str[0]
+    matched, stats = match_categories(info, categories, 'food_name', 'name', ['first_category', 'second_category'])
+    log_match_stats(stats, "[food] ")
+    info['first_category'] = matched['first_category'].fillna('/')
+    info['second_category'] = matched['second_category'].fillna('/')
+    return info[~info['food_name'].str.contains('未获取到数据', regex=False)]
+
+
+DATASETS = {
+    "dish": {
+        "category_file": ("dish_data/my_h_dish_category.xlsx", "my_h_dish_category"),
+        "info_file": ("dish_data/my_h_dish_info_all.xlsx", "my_h_dish_info_all"),
+        "name_column": "dish_name",
+        "drop_columns": ["img_url", "img_path"],
+        "nutrient_columns": ["macronutrients", "vitamin", "minerals"],
+        "combined_column": "all_combined",
+        "measurement_column": "measurement_unit",
+        "measurement_numeric": True,
+        "placeholder_patterns": {"quantity": r'.*未获取到单位量.*', "cooking_method": r'.*未获取到数据\n.*'},
+        "join": join_dish_categories,
+        "temp_columns": ["macronutrients", "vitamin", "minerals", "all_combined"],
+        "category_columns": ["category"],
+        "output": "my_h_dish_info_alldata.parquet",
+        "excel_output": "my_h_dish_info_alldata.xlsx",
+    },
+    "food": {
+        "category_file": ("food_data/my_h_food_nutrition.xlsx", "my_h_food_nutrition"),
+        "info_file": ("food_data/my_h_food_info.xlsx", "my_h_food_info"),
+        "name_column": "food_name",
+        "drop_columns": ["image_url"],
+        "nutrient_columns": ["energy_and_macronutrients", "vitamins", "minerals"],
+        "combined_column": "vitamin_minerals_combined",
+        "measurement_column": "unit_of_measurement",
+        "measurement_numeric": False,
+        "placeholder_patterns": {"unit_amount": r'.*未获取到单位量.*'},
+        "join": join_food_categories,
+        "temp_columns": ["local_image_path", "energy_and_macronutrients", "vitamins", "minerals",
+                         "vitamin_minerals_combined"],
+        "category_columns": ["first_category", "second_category"],
+        "output": "my_h_food_info_alldata.parquet",
+        "excel_output": "my_h_food_info_alldata.xlsx",
+    },
+}
+
+
+# ==================== 流水线阶段 ====================
+# 每个阶段接收上一阶段的 (分类表, 数据表)，返回新的 (分类表, 数据表)
+def load_stage(frames, config):
+    """读取分类表和数据表"""
+    return tuple(read_table(os.path.join(BASE_DIR, path), sheet_name=sheet)
+                 for path, sheet in (config["category_file"], config["info_file"]))
+
+
+def normalize_stage(frames, config):
+    """删除空名称行和无用列，拼接营养素文本，清洗计量单位和占位文本"""
+    categories, info = frames
+    info = info.dropna(subset=[config["name_column"]]).drop(columns=config["drop_columns"])
+    info[config["combined_column"]] = combine_nutrient_text(info, config["nutrient_columns"])
+
+    measurement = extract_num_unit(info[config["measurement_column"]])
+    if config["measurement_numeric"]:
+        measurement = pd.to_numeric(measurement, errors='coerce')
+    info[config["measurement_column"]] = measurement
+    for col, pattern in config["placeholder_patterns"].items():
+        info[col] = info[col].fillna('').str.replace(pattern, '', regex=True)
+    return categories, info
+
+
+def parse_nutrients_stage(frames, config):
+    """整列解析营养素为 {en}_nrv_percent/_nrv_unit/_num/_unit 四列"""
+    categories, info = frames
+    unknown = [c for c in nutrient_categories(info[config["combined_column"]]) if c not in CN_TO_EN]
+    if unknown:
+        logger.warning(f"存在未收录的营养素（不会生成列）：{unknown}")
+    return categories, expand_nutrients(info, config["combined_column"])
+
+
+def join_categories_stage(frames, config):
+    """关联分类，删除临时列，分类列移到名称列之前"""
+    categories, info = frames
+    info = config["join"](categories, info)
+    info = info.drop(columns=[c for c in config["temp_columns"] if c in info.columns])
+    return categories, move_before(info, config["category_columns"], config["name_column"])
+
+
+def write_stage(frames, config):
+    """保存为Parquet（未安装pyarrow时退回Excel），Excel为可选导出"""
+    df = frames[1]
+    if HAS_PYARROW:
+        df = write_table(df, os.path.join(BASE_DIR, config["output"]))
+    else:
+        logger.warning("未安装pyarrow，只输出Excel")
+    if config.get("excel_export") or not HAS_PYARROW:
+        df = write_table(df, os.path.join(BASE_DIR, config["excel_output"]))
+    return frames[0], df
+
+
+def read_output(dataset, columns=(), nutrients=()):
+    """按列读取清洗结果，只解析需要的列
+
+    例：read_output("dish", ["dish_id", "dish_name"], nutrients=["energy", "protein"])
+    """
+    selected = list(columns) + nutrient_columns(*nutrients)
+    return read_table(os.path.join(BASE_DIR, DATASETS[dataset]["output"]), columns=selected or None)
+
+
+STAGES = [
+    ("load", load_stage),
+    ("normalize", normalize_stage),
+    ("parse_nutrients", parse_nutrients_stage),
+    ("join_categories", join_categories_stage),
+    ("write", write_stage),
+]
+
+
+# ==================== 缓存与调度 ====================
+def code_fingerprint(obj):
+    """函数源码（源码变化后缓存自动失效）"""
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return repr(obj)
+
+
+def input_fingerprint(config):
+    """输入文件的路径、大小和修改时间"""
+    parts = []
+    for path, sheet in (config["category_file"], config["info_file"]):
+        stat = os.stat(os.path.join(BASE_DIR, path))
+        parts.append(f"{path}:{sheet}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def stage_keys(config):
+    """逐阶段计算缓存键：上游键 + 阶段源码 + 配置（任一变化则该阶段及下游全部失效）"""
+    config_text = json.dumps(config, sort_keys=True, ensure_ascii=False,
+                             default=lambda o: code_fingerprint(o) if callable(o) else repr(o))
+    # 共用的解析/匹配模块源码也计入，修改后缓存同样失效
+    helpers = "".join(code_fingerprint(module) for module in (nutrient_schema, nutrient_parser, category_matcher))
+    key = hashlib.sha256(f"{input_fingerprint(config)}\n{helpers}".encode("utf-8")).hexdigest()
+    keys = {}
+    for name, stage in STAGES:
+        key = hashlib.sha256(f"{key}\n{code_fingerprint(stage)}\n{config_text}".encode("utf-8")).hexdigest()
+        keys[name] = key
+    return keys
+
+
+def cache_path(cache_dir, dataset, stage_name):
+    return os.path.join(cache_dir, dataset, f"{stage_name}.pkl")
+
+
+def read_cache(cache_dir, dataset, stage_name, key):
+    """缓存键一致时返回阶段输出，否则返回None"""
+    path = cache_path(cache_dir, dataset, stage_name)
+    try:
+        with open(f"{path}.key", 'r', encoding='utf-8') as f:
+            if f.read().strip() != key:
+                return None
+        return pd.read_pickle(path)
+    except (OSError, EOFError):
+        return None
+
+
+def write_cache(cache_dir, dataset, stage_name, key, frames):
+    path = cache_path(cache_dir, dataset, stage_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.to_pickle(frames, path)
+    with open(f"{path}.key", 'w', encoding='utf-8') as f:
+        f.write(key)
+
+
+def run_pipeline(dataset, use_cache=True, force=(), cache_dir=CACHE_DIR, excel=False):
+    """运行清洗流水线，返回 (最终数据表, 各阶段耗时)
+
+    use_cache: 复用输入未变化的阶段缓存，只重跑发生变化的阶段及其下游
+    force: 强制重跑的阶段名（其下游也会重跑）
+    excel: 同时导出Excel
+    """
+    keys = stage_keys(DATASETS[dataset])
+    config = {**DATASETS[dataset], "excel_export": excel}
+    names = [name for name, _ in STAGES]
+
+    # 找到最后一个可复用的缓存阶段，只读取这一份缓存
+    start, frames = 0, None
+    if use_cache:
+        first_forced = min([names.index(name) for name in force] + [len(names)])
+        for i in range(min(first_forced, len(names) - 1) - 1, -1, -1):
+            frames = read_cache(cache_dir, dataset, names[i], keys[names[i]])
+            if frames is not None:
+                logger.info(f"[{dataset}] 复用缓存：{names[i]}")
+                start = i + 1
+                break
+
+    timings = {}
+    for name, stage in STAGES[start:]:
+        start_ts = time.time()
+        frames = stage(frames, config)
+        timings[name] = round(time.time() - start_ts, 3)
+        if use_cache and name != "write":
+            write_cache(cache_dir, dataset, name, keys[name], frames)
+        logger.info(f"[{dataset}] 阶段 {name} 完成，耗时 {timings[name]} 秒，数据形状 {frames[1].shape}")
+
+    return frames[1], timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="菜品/食物数据清洗流水线")
+    parser.add_argument("datasets", nargs="*", help=f"要清洗的数据集：{'/'.join(DATASETS)}（默认全部）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写阶段缓存")
+    parser.add_argument("--force", nargs="+", default=[], choices=[name for name, _ in STAGES],
+                        help="强制重跑的阶段（下游阶段随之重跑）")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="阶段缓存目录")
+    parser.add_argument("--excel", action="store_true", help="同时导出Excel（默认只输出Parquet）")
+    args = parser.parse_args(argv)
+    unknown = [d for d in args.datasets if d not in DATASETS]
+    if unknown:
+        parser.error(f"未知数据集：{unknown}")
+
+    for dataset in args.datasets or list(DATASETS):
+        df, timings = run_pipeline(dataset, use_cache=not args.no_cache, force=args.force, cache_dir=args.cache_dir,
+                                     excel=args.excel)
+        logger.info(f"[{dataset}] 输出 {DATASETS[dataset]['output']}：{df.shape}，各阶段耗时：{timings}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
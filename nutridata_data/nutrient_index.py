@@ -0,0 +1,234 @@
+import re
+import sys
+import json
+import logging
+import argparse
+import warnings
+import threading
+
+import numpy as np
+
+from nutridata_data.nutrient_matrix import MATRIX_DIR, DATASET_COLUMNS, load_matrix
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+CONDITION_PATTERN = re.compile(r"^\s*(?P<column>\w+)\s*(?P<op>>=|<=|==|>|<)\s*(?P<value>-?\d+\.?\d*)\s*$")
+BATCH_SIZE = 1024  # kNN每批查询的向量数（控制距离矩阵的内存占用）
+
+
+def parse_condition(text):
+    """解析 "protein_num>=20" 形式的条件，返回 (列名, 运算符, 数值)"""
+    match = CONDITION_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"无法解析的条件：{text!r}（格式如 protein_num>=20）")
+    return match["column"], match["op"], float(match["value"])
+
+
+class NutrientIndex:
+    """营养素矩阵上的查询索引：按列排序的区间过滤 + 标准化向量的k近邻搜索
+
+    区间过滤：每列首次使用时建立排序索引（argsort），之后每个条件两次二分查找即可得到候选行。
+    k近邻：各营养素按本数据集的均值/标准差标准化（缺失值视为均值），分批矩阵乘法计算距离。
+    """
+
+    def __init__(self, matrix, nutrients=None):
+        self.matrix = matrix
+        self.nutrients = list(nutrients or matrix.columns)  # 参与相似度计算的营养素（英文名）
+        self._sorted = {}  # {(是否NRV%, 列号): (按值排序的行号, 排序后的值)}，缺失值不进入索引
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, dataset, base_dir=MATRIX_DIR, nutrients=None):
+        return cls(load_matrix(dataset, base_dir), nutrients)
+
+    # ---------- 区间过滤 ----------
+    def _resolve(self, column):
+        """列名 -> (矩阵, 列号)：{en}_num 为含量，{en}_nrv_percent 为NRV%"""
+        for suffix, values in (("_nrv_percent", self.matrix.nrv_percent), ("_num", self.matrix.amounts)):
+            en = column[:-len(suffix)]
+            if column.endswith(suffix) and en in self.matrix.columns:
+                return values, self.matrix.columns[en]
+        raise KeyError(f"未知的营养素列：{column}")
+
+    def sorted_column(self, column):
+        """列的排序索引（懒建立并缓存）：返回 (按值排序的行号, 对应的值)"""
+        values, j = self._resolve(column)
+        key = (values is self.matrix.nrv_percent, j)
+        entry = self._sorted.get(key)
+        if entry is None:
+            column_values = np.asarray(values[:, j])
+            order = np.argsort(column_values, kind="stable").astype(np.int32)
+            valid = int(np.count_nonzero(~np.isnan(column_values)))
+            entry = (order[:valid], column_values[order[:valid]])
+            with self._lock:
+                self._sorted[key] = entry
+        return entry
+
+    def _candidates(self, column, op, value):
+        """单个条件命中的行号（排序索引上的一个切片）"""
+        order, values = self.sorted_column(column)
+        value = values.dtype.type(value)  # 阈值转为列的精度（float32），否则 0.1 这类值与存储值比较会差一个舍入
+        lo, hi = 0, len(values)
+        if op in (">=", "=="):
+            lo = np.searchsorted(values, value, side="left")
+        elif op == ">":
+            lo = np.searchsorted(values, value, side="right")
+        if op in ("<=", "=="):
+            hi = np.searchsorted(values, value, side="right")
+        elif op == "<":
+            hi = np.searchsorted(values, value, side="left")
+        return order[lo:max(lo, hi)]
+
+    def filter(self, conditions):
+        """多个条件同时满足的行号（升序）
+
+        conditions: [(列名, 运算符, 数值), ...] 或 "protein_num>=20" 形式的字符串列表；缺失值不满足任何条件。
+        """
+        conditions = [parse_condition(c) if isinstance(c, str) else c for c in conditions]
+        if not conditions:
+            return np.arange(len(self.matrix))
+        candidates = [self._candidates(*condition) for condition in conditions]
+        smallest = min(range(len(candidates)), key=lambda i: len(candidates[i]))
+        rows = candidates[smallest]
+        # 从命中最少的条件出发，其余条件直接在矩阵上按行比较
+        for i, (column, op, value) in enumerate(conditions):
+            if i == smallest or not len(rows):
+                continue
+            values, j = self._resolve(column)
+            column_values = values[rows, j]
+            value = column_values.dtype.type(value)
+            rows = rows[{">=": column_values >= value, ">": column_values > value, "<=": column_values <= value,
+                         "<": column_values < value, "==": column_values == value}[op]]
+        return np.sort(rows)
+
+    # ---------- k近邻 ----------
+    def _columns(self):
+        return [self.matrix.columns[en] for en in self.nutrients]
+
+    def _standardize(self, raw):
+        return np.nan_to_num((raw - self._mean) / self._std, nan=0.0).astype(np.float32)
+
+    def vectors(self):
+        """标准化后的营养素向量（float32，首次调用时计算）"""
+        if self._vectors is None:
+            raw = np.asarray(self.matrix.amounts[:, self._columns()], dtype=np.float32)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # 整列缺失时均值为NaN，按缺失处理
+                mean = np.nanmean(raw, axis=0)
+                std = np.nanstd(raw, axis=0)
+            self._mean = np.nan_to_num(mean).astype(np.float32)
+            self._std = np.where(np.isfinite(std) & (std > 0), std, 1).astype(np.float32)
+            vectors = self._standardize(raw)
+            with self._lock:
+                self._norms = np.einsum("ij,ij->i", vectors, vectors)
+                self._vectors = vectors
+        return self._vectors
+
+    def normalize(self, raw):
+        """原始含量（营养素矩阵的行）按本索引的均值/标准差标准化，缺失值视为均值"""
+        self.vectors()
+        return self._standardize(np.asarray(raw, dtype=np.float32)[:, self._columns()])
+
+    def knn(self, raw, k=10, metric="euclidean", exclude=None, batch_size=BATCH_SIZE):
+        """批量k近邻：raw 为 (查询数, 全部营养素) 的原始含量，返回 (行号, 距离)，形状均为 (查询数, k)
+
+        metric: "euclidean" 标准化后的欧氏距离；"cosine" 1 - 余弦相似度
+        exclude: 每个查询要排除的行号（查询自身时用于排除自己），-1 表示不排除
+        """
+        vectors = self.vectors()
+        queries = self.normalize(raw)
+        norms = self._norms
+        if metric == "cosine":
+            scale = np.sqrt(norms)
+            scale[scale == 0] = 1
+            vectors, norms = vectors / scale[:, None], None
+            query_scale = np.linalg.norm(queries, axis=1)
+            query_scale[query_scale == 0] = 1
+            queries = queries / query_scale[:, None]
+        elif metric != "euclidean":
+            raise ValueError(f"未知的距离：{metric}")
+
+        k = min(k, len(vectors) - (exclude is not None))
+        rows = np.empty((len(queries), max(k, 0)), dtype=np.int64)
+        distances = np.empty((len(queries), max(k, 0)), dtype=np.float32)
+        if k <= 0:
+            return rows, distances
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            products = batch @ vectors.T
+            if metric == "cosine":
+                batch_distances = 1 - products
+            else:
+                batch_distances = np.einsum("ij,ij->i", batch, batch)[:, None] - 2 * products + norms[None, :]
+                np.maximum(batch_distances, 0, out=batch_distances)
+            if exclude is not None:
+                own = np.asarray(exclude[start:start + batch_size])
+                mask = own >= 0
+                batch_distances[np.nonzero(mask)[0], own[mask]] = np.inf
+            top = np.argpartition(batch_distances, k - 1, axis=1)[:, :k]
+            top_distances = np.take_along_axis(batch_distances, top, axis=1)
+            order = np.argsort(top_distances, axis=1, kind="stable")
+            rows[start:start + len(batch)] = np.take_along_axis(top, order, axis=1)
+            top_distances = np.take_along_axis(top_distances, order, axis=1)
+            distances[start:start + len(batch)] = np.sqrt(top_distances) if metric == "euclidean" else top_distances
+        return rows, distances
+
+    def nearest(self, source, ids, k=10, metric="euclidean"):
+        """source（营养素矩阵或索引）中的ID在本索引中的k个最近邻：{ID: [(ID, 名称, 距离), ...]}"""
+        source = getattr(source, "matrix", source)
+        mismatched = [en for en in self.nutrients
+                      if source.unit(en) and self.matrix.unit(en) and source.unit(en) != self.matrix.unit(en)]
+        if mismatched:
+            logger.warning(f"以下营养素单位不一致，距离可能失真：{mismatched}")
+        ids = np.asarray(ids, dtype=np.int64)
+        source_rows = source.rows(ids)
+        found = source_rows >= 0
+        if not found.all():
+            logger.warning(f"以下ID不在数据中：{ids[~found].tolist()}")
+        ids, source_rows = ids[found], source_rows[found]
+        exclude = source_rows if source.schema["dataset"] == self.matrix.schema["dataset"] else None
+        rows, distances = self.knn(source.amounts[source_rows], k, metric, exclude)
+        return {int(item_id): [(int(self.matrix.ids[r]), str(self.matrix.names[r]), float(d))
+                               for r, d in zip(row, distance)]
+                for item_id, row, distance in zip(ids, rows, distances)}
+
+    def describe(self, rows):
+        """行号 -> [(ID, 名称), ...]"""
+        return [(int(self.matrix.ids[r]), str(self.matrix.names[r])) for r in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="营养素区间过滤与相似度搜索（基于 nutrient_matrix 导出的矩阵）")
+    parser.add_argument("--matrix-dir", default=MATRIX_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    filter_parser = commands.add_parser("filter", help="按营养素区间过滤，如 protein_num>=20 sodium_num<=500")
+    filter_parser.add_argument("dataset", choices=sorted(DATASET_COLUMNS))
+    filter_parser.add_argument("conditions", nargs="+")
+    filter_parser.add_argument("--limit", type=int, default=20)
+
+    similar = commands.add_parser("similar", help="营养成分最接近的菜品/食物")
+    similar.add_argument("dataset", choices=sorted(DATASET_COLUMNS), help="查询ID所属的数据集")
+    similar.add_argument("ids", type=int, nargs="+")
+    similar.add_argument("--target", choices=sorted(DATASET_COLUMNS), help="在哪个数据集中查找（默认同一数据集）")
+    similar.add_argument("-k", type=int, default=10)
+    similar.add_argument("--metric", default="euclidean", choices=["euclidean", "cosine"])
+    similar.add_argument("--nutrients", nargs="+", help="参与计算的营养素英文名（默认全部）")
+    args = parser.parse_args(argv)
+
+    if args.command == "filter":
+        index = NutrientIndex.load(args.dataset, args.matrix_dir)
+        rows = index.filter(args.conditions)
+        print(json.dumps({"matched": len(rows), "rows": index.describe(rows[:args.limit])}, ensure_ascii=False))
+    else:
+        source = load_matrix(args.dataset, args.matrix_dir)
+        index = NutrientIndex.load(args.target or args.dataset, args.matrix_dir, args.nutrients)
+        print(json.dumps(index.nearest(source, args.ids, args.k, args.metric), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
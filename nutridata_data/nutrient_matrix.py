@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from nutridata_data.nutrient_schema import CN_TO_EN, NUTRIENT_NAMES
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MATRIX_DIR = os.path.join(BASE_DIR, "nutrient_matrix")  # 每个数据集一个子目录
+SCHEMA_FILE = "schema.json"  # 最后写入，存在即表示导出完整
+ARRAY_FILES = {"ids": "ids.npy", "names": "names.npy", "amounts": "amounts.npy", "nrv_percent": "nrv_percent.npy"}
+# 清洗结果中的ID列和名称列
+DATASET_COLUMNS = {"dish": ("dish_id", "dish_name"), "food": ("food_id", "food_name")}
+# 可换算的单位：(量纲, 换算到基准单位的系数)；质量以μg为基准，能量以kcal为基准
+UNIT_SCALES = {"g": ("mass", 1e6), "mg": ("mass", 1e3), "μg": ("mass", 1.0), "µg": ("mass", 1.0), "ug": ("mass", 1.0),
+               "mcg": ("mass", 1.0), "kcal": ("energy", 1.0), "kJ": ("energy", 1 / 4.184), "kj": ("energy", 1 / 4.184)}
+UNIT_PATTERN = re.compile(r"^\s*(?P<base>[^\s]+?)\s*(?P<qualifier>(?:RAE|α-TE|NE|DFE)?)\s*$")
+
+
+def matrix_dir(dataset, base_dir=MATRIX_DIR):
+    return os.path.join(base_dir, dataset)
+
+
+def save_array(path, array):
+    """原子写入.npy（先写临时文件再替换，已映射旧文件的进程不受影响）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def dominant_units(df):
+    """每个营养素出现最多的单位（写入schema；其他单位的含量导出时换算为该单位）"""
+    units = {}
+    for en in CN_TO_EN.values():
+        column = df.get(f"{en}_unit")
+        counts = column.dropna().value_counts() if column is not None else None
+        units[en] = str(counts.index[0]) if counts is not None and len(counts) else ""
+        if counts is not None and len(counts) > 1:
+            logger.info(f"{en} 存在多种单位：{counts.to_dict()}，矩阵统一换算为 {units[en]}")
+    return units
+
+
+def unit_factor(unit, target):
+    """unit 换算为 target 的系数（如 mg -> g 为0.001，"mg α-TE" -> "μg α-TE" 为1000）；无法换算时返回None"""
+    if unit == target:
+        return 1.0
+    source, dest = UNIT_PATTERN.match(unit), UNIT_PATTERN.match(target)
+    if not (source and dest) or source["qualifier"] != dest["qualifier"]:
+        return None
+    source_scale, dest_scale = UNIT_SCALES.get(source["base"]), UNIT_SCALES.get(dest["base"])
+    if source_scale is None or dest_scale is None or source_scale[0] != dest_scale[0]:
+        return None
+    return source_scale[1] / dest_scale[1]
+
+
+def convert_amounts(df, en, target):
+    """营养素含量列按行换算为 target 单位（float64）；单位为空的行视为 target，存在无法换算的单位时抛出ValueError"""
+    values = df[f"{en}_num"].astype("float64").to_numpy(na_value=np.nan)
+    column = df.get(f"{en}_unit")
+    if column is None or not target:
+        return values
+    units = column.astype(object).where(column.notna(), target).astype(str).to_numpy()
+    factors = {unit: unit_factor(unit, target) for unit in np.unique(units)}
+    bad = sorted(unit for unit, factor in factors.items()
+                 if factor is None and not np.isnan(values[units == unit]).all())
+    if bad:
+        raise ValueError(f"{en} 的单位 {bad} 无法换算为 {target}，拒绝导出")
+    scale = np.array([factors[unit] if factors[unit] is not None else np.nan for unit in units])
+    return values * scale
+
+
+# ==================== 导出 ====================
+def export_matrix(dataset, df=None, source=None, base_dir=MATRIX_DIR):
+    """将清洗结果导出为固定营养素顺序的float32矩阵（含量、NRV%）及ID、名称索引数组
+
+    df 为空时读取清洗输出（source 指定其他 .parquet/.feather/.xlsx 文件）；行按ID排序。
+    返回写入的schema。
+    """
+    id_column, name_column = DATASET_COLUMNS[dataset]
+    if df is None:
+        from nutridata_data.cleaning_pipeline import read_output, read_table  # 只有导出需要pandas
+        df = read_table(source) if source else read_output(dataset)
+    df = df.sort_values(id_column, kind="stable").reset_index(drop=True)
+
+    units = dominant_units(df)
+    arrays = {
+        "ids": df[id_column].to_numpy(dtype=np.int64),
+        "names": df[name_column].fillna("").astype(str).to_numpy(dtype=np.str_),
+    }
+    for key, suffix in (("amounts", "_num"), ("nrv_percent", "_nrv_percent")):
+        matrix = np.full((len(df), len(NUTRIENT_NAMES)), np.nan, dtype=np.float32)
+        for i, en in enumerate(CN_TO_EN.values()):
+            column = f"{en}{suffix}"
+            if column not in df:
+                continue
+            if key == "amounts":
+                matrix[:, i] = convert_amounts(df, en, units[en])
+            else:
+                matrix[:, i] = df[column].astype("float64").to_numpy(na_value=np.nan)
+        arrays[key] = matrix
+
+    directory = matrix_dir(dataset, base_dir)
+    os.makedirs(directory, exist_ok=True)
+    schema_path = os.path.join(directory, SCHEMA_FILE)
+    if os.path.exists(schema_path):
+        os.remove(schema_path)  # 写入过程中schema缺失，读取方不会读到新旧混合的文件
+    for key, filename in ARRAY_FILES.items():
+        save_array(os.path.join(directory, filename), arrays[key])
+
+    schema = {
+        "dataset": dataset,
+        "rows": len(df),
+        "id_column": id_column,
+        "name_column": name_column,
+        "dtype": "float32",
+        "missing": "NaN",
+        "nutrients": [{"index": i, "cn": cn, "en": CN_TO_EN[cn], "unit": units[CN_TO_EN[cn]]}
+                      for i, cn in enumerate(NUTRIENT_NAMES)],
+        "files": ARRAY_FILES,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(f"{schema_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+    os.replace(f"{schema_path}.tmp", schema_path)
+    logger.info(f"[{dataset}] 营养素矩阵已导出到 {directory}：{len(df)} 行 × {len(NUTRIENT_NAMES)} 个营养素")
+    return schema
+
+
+# ==================== 读取 ====================
+class NutrientMatrix:
+    """内存映射的营养素矩阵（只读）：多个进程打开同一份文件时共享页缓存，无需解析表格
+
+    amounts / nrv_percent 为 (行数, 营养素数) 的float32矩阵，列顺序见 schema["nutrients"]，缺失为NaN。
+    """
+
+    def __init__(self, directory, mmap_mode="r"):
+        with open(os.path.join(directory, SCHEMA_FILE), 'r', encoding='utf-8') as f:
+            self.schema = json.load(f)
+        files = self.schema["files"]
+        self.ids = np.load(os.path.join(directory, files["ids"]), mmap_mode=mmap_mode)
+        self.names = np.load(os.path.join(directory, files["names"]), mmap_mode=mmap_mode)
+        self.amounts = np.load(os.path.join(directory, files["amounts"]), mmap_mode=mmap_mode)
+        self.nrv_percent = np.load(os.path.join(directory, files["nrv_percent"]), mmap_mode=mmap_mode)
+        self.columns = {n["en"]: n["index"] for n in self.schema["nutrients"]}
+        if len(self.ids) != self.schema["rows"]:
+            raise ValueError(f"营养素矩阵文件不完整：{directory}"
+                             f"（ids {len(self.ids)} 行，schema {self.schema['rows']} 行）")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, en, nrv=False):
+        """单个营养素的一列（如 column("protein")），返回映射视图，不复制数据"""
+        return (self.nrv_percent if nrv else self.amounts)[:, self.columns[en]]
+
+    def unit(self, en):
+        return self.schema["nutrients"][self.columns[en]]["unit"]
+
+    def rows(self, ids):
+        """ID -> 行号（ids有序，二分查找）；不存在的ID为-1"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(ids.shape, -1)
+        positions = np.clip(np.searchsorted(self.ids, ids), 0, len(self.ids) - 1)
+        return np.where(self.ids[positions] == ids, positions, -1)
+
+
+def load_matrix(dataset, base_dir=MATRIX_DIR, mmap_mode="r"):
+    """打开数据集的营养素矩阵（mmap_mode=None 时整体读入内存）"""
+    return NutrientMatrix(matrix_dir(dataset, base_dir), mmap_mode)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出内存映射的营养素矩阵（.npy）")
+    parser.add_argument("datasets", nargs="*", help=f"要导出的数据集：{'/'.join(DATASET_COLUMNS)}（默认全部）")
+    parser.add_argument("--source", help="指定清洗结果文件（默认为清洗流水线的输出）")
+    parser.add_argument("--output-dir", default=MATRIX_DIR)
+    args = parser.parse_args(argv)
+    unknown = [d for d in args.datasets if d not in DATASET_COLUMNS]
+    if unknown:
+        parser.error(f"未知数据集：{unknown}")
+    if args.source and len(args.datasets) != 1:
+        parser.error("指定 --source 时须且只能指定一个数据集（清洗结果文件只对应一个数据集）")
+
+    for dataset in args.datasets or list(DATASET_COLUMNS):
+        export_matrix(dataset, source=args.source, base_dir=args.output_dir)
+        matrix = load_matrix(dataset, args.output_dir)
+        logger.info(f"[{dataset}] 校验：{len(matrix)} 行，含量矩阵 {matrix.amounts.shape}，"
+                    f"有能量数据 {int(np.isfinite(matrix.column('energy')).sum())} 行")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
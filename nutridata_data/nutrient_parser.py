@@ -0,0 +1,83 @@
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# 营养素名称表定义在 nutrient_schema（不依赖pandas，爬虫记录也使用），此处导入以保持原有导入路径
+from nutridata_data.nutrient_schema import CN_TO_EN, NRV_UNIT
+
+# 每个营养素展开的四列后缀，以及需要固定的可空类型
+NUTRIENT_SUFFIXES = ("_nrv_percent", "_nrv_unit", "_num", "_unit")
+NUTRIENT_DTYPES = {"_nrv_percent": "Int64", "_num": "float64"}
+
+
+@lru_cache(maxsize=8)
+def nutrient_pattern(names):
+    """按营养素名称生成整列匹配用的正则（每行一个条目，长名称优先）"""
+    alternation = "|".join(re.escape(cn) for cn in sorted(names, key=len, reverse=True))
+    # [^\S\n]* 只匹配行内空白，避免数值后的空白跨行吞掉下一条目
+    return re.compile(
+        rf"^(?P<cn>{alternation})"  # 行首的中文名称（如"维生素A"）
+        r"(?P<nrv_percent>\d+)% NRV"  # nrv百分比数值（如"16%"中的"16"）
+        r"(?P<num>\d+\.?\d*)[^\S\n]*"  # 含量数值（如"126.00"）
+        r"(?P<unit>.*)",  # 完整单位（如"μg RAE"、"mg α-TE"、"kcal"）
+        re.MULTILINE
+    )
+
+
+def combine_nutrient_text(df, columns):
+    """将多列营养素文本以换行拼接，并还原爬取时丢失的下标（维生素B6/B12 -> 维生素B₆/B₁₂）"""
+    combined = df[columns[0]].fillna("")
+    for col in columns[1:]:
+        combined = combined + "\n" + df[col].fillna("")
+    return combined.str.replace("维生素B6", "维生素B₆", regex=False).str.replace("维生素B12", "维生素B₁₂", regex=False)
+
+
+def parse_nutrients(texts, cn_to_en=CN_TO_EN):
+    """整列解析营养素文本，返回宽表：每个营养素四列 {en}_nrv_percent/_nrv_unit/_num/_unit
+
+    列按营养素首次出现的顺序排列；同一行同一营养素出现多次时以最后一次为准（与逐行循环写入的结果一致）。
+    """
+    texts = pd.Series(texts)
+    matches = texts.reset_index(drop=True).astype(str).str.extractall(nutrient_pattern(tuple(cn_to_en)))
+    if matches.empty:
+        return pd.DataFrame(index=texts.index)
+
+    matches["row"] = matches.index.get_level_values(0)
+    matches["en"] = matches["cn"].map(cn_to_en)
+    order = matches["en"].unique()
+    wide = (matches.drop_duplicates(["row", "en"], keep="last")
+            .set_index(["row", "en"])[["nrv_percent", "num", "unit"]]
+            .unstack("en")
+            .reindex(range(len(texts))))
+
+    columns = {}
+    for en in order:
+        nrv_percent = pd.to_numeric(wide["nrv_percent"][en])
+        unit = wide["unit"][en].str.strip().astype(object)
+        unit.loc[nrv_percent.notna() & (unit.isna() | (unit == ""))] = pd.NA  # 匹配到但单位为空时记为 NA
+        columns[f"{en}_nrv_percent"] = nrv_percent.astype("Int64")
+        columns[f"{en}_nrv_unit"] = pd.Series(NRV_UNIT, index=wide.index, dtype=object).where(nrv_percent.notna())
+        columns[f"{en}_num"] = pd.to_numeric(wide["num"][en]).astype("float64")
+        columns[f"{en}_unit"] = unit
+
+    result = pd.DataFrame(columns)
+    result.index = texts.index
+    return result
+
+
+def nutrient_columns(*nutrients):
+    """营养素英文名对应的四列列名，如 nutrient_columns("energy") -> energy_nrv_percent/…/energy_unit"""
+    return [f"{en}{suffix}" for en in nutrients for suffix in NUTRIENT_SUFFIXES]
+
+
+def enforce_nutrient_dtypes(df):
+    """营养素列统一为可空类型（_nrv_percent -> Int64，_num -> float64），保证写入列式文件后类型不漂移"""
+    dtypes = {col: dtype for col in df.columns for suffix, dtype in NUTRIENT_DTYPES.items() if col.endswith(suffix)}
+    return df.astype(dtypes)
+
+
+def expand_nutrients(df, column, cn_to_en=CN_TO_EN):
+    """解析df[column]并一次性追加营养素列（已存在的同名列会被替换），返回新的DataFrame"""
+    nutrients = parse_nutrients(df[column], cn_to_en)
+    return pd.concat([df.drop(columns=[c for c in nutrients.columns if c in df.columns]), nutrients], axis=1)
@@ -0,0 +1,41 @@
+# 营养素中文名 -> 英文列名前缀（字典顺序即营养素的固定顺序）
+CN_TO_EN = {
+    "能量": "energy",
+    "蛋白质": "protein",
+    "脂肪": "fat",
+    "碳水化合物": "carbohydrates",
+    "维生素A": "vitamin_A",
+    "维生素E": "vitamin_E",
+    "硫胺素": "thiamine",
+    "核黄素": "riboflavin",
+    "维生素B₆": "vitamin_B₆",
+    "维生素B₁₂": "vitamin_B₁₂",
+    "烟酸": "niacin",
+    "叶酸": "folic_acid",
+    "维生素C": "vitamin_C",
+    "生物素": "biotin",
+    "总胆碱": "total_choline",
+    "维生素D": "vitamin_D",
+    "维生素K": "vitamin_K",
+    "泛酸": "pantothenic_acid",
+    "钠": "sodium",
+    "钾": "potassium",
+    "镁": "magnesium",
+    "铁": "iron",
+    "锌": "zinc",
+    "钙": "calcium",
+    "磷": "phosphorus",
+    "硒": "selenium",
+    "碘": "iodine",
+    "铜": "copper",
+    "锰": "manganese"
+}
+
+NRV_UNIT = "% NRV"
+
+# 页面上下标丢失的写法 -> 规范名（清洗时还原，见 nutrient_parser.combine_nutrient_text）
+PAGE_NAMES = {"维生素B6": "维生素B₆", "维生素B12": "维生素B₁₂"}
+
+# 营养素固定顺序：数值数组、矩阵列均按该顺序排列
+NUTRIENT_NAMES = tuple(CN_TO_EN)
+NUTRIENT_INDEX = {cn: i for i, cn in enumerate(NUTRIENT_NAMES)}
@@ -0,0 +1,79 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """令牌桶 + AIMD 自适应限速（同一进程内所有抓取线程共用一个实例）
+
+    每次请求前 acquire() 取令牌；请求结束后 report() 反馈结果：
+    响应正常时速率线性增加，超时、慢响应或被重定向到登录页时速率成倍下降。
+    current_rate 与 backoff_counts() 供指标导出（见 CrawlMetrics.watch_rate_limiter）。
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=0.2, max_rate=10.0, increase_step=0.05,
+                 decrease_factor=0.5, slow_threshold=5.0, burst=1, cooldown=2.0):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step  # 每次正常响应增加的速率（次/秒）
+        self.decrease_factor = decrease_factor  # 异常时速率乘以该系数
+        self.slow_threshold = slow_threshold  # 响应耗时超过该值（秒）视为慢响应
+        self.burst = burst
+        self.cooldown = cooldown  # 两次降速的最小间隔，避免并发失败连续降速
+
+        self._rate = initial_rate
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._backoffs = {"error": 0, "slow": 0, "login_redirect": 0}  # 各原因的降速次数
+        self._lock = threading.Lock()
+
+    @property
+    def current_rate(self):
+        """当前速率（次/秒）"""
+        return self._rate
+
+    def backoff_counts(self):
+        """各原因的累计降速次数 {error/slow/login_redirect: 次数}"""
+        with self._lock:
+            return dict(self._backoffs)
+
+    def scale(self, factor):
+        """按比例缩放速率上下限和当前速率（多个进程共用一个账号时，各自只使用总速率的一份）"""
+        with self._lock:
+            self.min_rate *= factor
+            self.max_rate *= factor
+            self._rate *= factor
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞到允许发出请求为止"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self._rate)
+            self._last_refill = now
+            self._tokens -= 1  # 令牌为负表示预支，后来者排队等待更久
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+    def report(self, ok=True, latency=None, login_redirect=False):
+        """反馈请求结果，调整速率"""
+        slow = latency is not None and latency > self.slow_threshold
+        with self._lock:
+            if ok and not slow and not login_redirect:
+                self._rate = min(self.max_rate, self._rate + self.increase_step)
+                return
+
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            old_rate = self._rate
+            self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+            reason = "login_redirect" if login_redirect else ("slow" if slow else "error")
+            self._backoffs[reason] += 1
+
+        reason = {"login_redirect": "登录失效", "slow": "慢响应", "error": "请求失败"}[reason]
+        logger.warning(f"限速器降速（{reason}）：{old_rate:.2f} -> {self._rate:.2f} 次/秒")
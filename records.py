@@ -0,0 +1,315 @@
+import re
+import math
+import threading
+from array import array
+from dataclasses import dataclass
+
+# 营养素固定顺序与 nutridata_data 的清洗代码共用（nutrient_schema 不依赖pandas）
+from nutridata_data.nutrient_schema import NUTRIENT_NAMES, NUTRIENT_INDEX, PAGE_NAMES
+
+# ==================== 营养素数值 ====================
+# 详情页三个营养素图表对应的字段
+NUTRIENT_FIELDS = ("能量及宏量营养素", "维生素", "矿物质")
+# 页面上的营养素名（下标在页面文本中丢失，如"维生素B6"）同样可以识别，展示文本不做改写
+NUTRIENT_LINE_PATTERN = re.compile(
+    rf"^(?P<cn>{'|'.join(re.escape(cn) for cn in sorted({*NUTRIENT_NAMES, *PAGE_NAMES}, key=len, reverse=True))})"
+    r"(?P<sp1>\s*)(?P<nrv>\d+(?:\.\d+)?)%(?P<sp2>\s*)NRV(?P<sp3>\s*)(?P<num>\d+(?:\.\d+)?)(?P<sp4>\s*)(?P<unit>.*)$"
+)
+# 规范名下标 -> 页面写法（如 维生素B₆ -> 维生素B6）
+PAGE_SPELLINGS = {NUTRIENT_INDEX[cn]: name for name, cn in PAGE_NAMES.items()}
+
+
+class CodeTable:
+    """进程内共享的编码表：值 -> 小整数编码（新值自动登记，编码达到 limit 时返回None）"""
+
+    def __init__(self, limit, values=()):
+        self.limit = limit
+        self.values = list(values)
+        self.codes = {value: i for i, value in enumerate(self.values)}
+        self.lock = threading.Lock()
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(value)
+                if code is None:
+                    if len(self.values) >= self.limit:
+                        return None
+                    code = self.codes[value] = len(self.values)
+                    self.values.append(value)
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+
+# 单位编码表：每条记录只存1字节编码，0 表示缺失
+UNITS = CodeTable(256, [""])
+# 行格式编码表：(名称后空白, NRV小数位, %后空白, NRV后空白, 含量小数位, 单位前空白)，同一站点只有少数几种
+LINE_FORMATS = CodeTable(512)
+
+# 行布局（每行一个16位编码）：字段分隔 / 原文行（低15位为 raw 下标）/ 数值行（格式编码<<6 | 页面写法<<5 | 营养素下标）
+FIELD_END = 0xFFFF
+RAW_LINE = 0x8000
+
+
+def decimals(number):
+    """数字原文的小数位数"""
+    return len(number) - number.index(".") - 1 if "." in number else 0
+
+
+@dataclass(slots=True, eq=False)
+class Nutrients:
+    """三个营养素图表：按固定营养素顺序对齐的数值数组 + 页面行布局
+
+    amounts / nrv_percent 为float64数组（缺失为NaN），units 为单位编码，供数值计算使用。
+    页面文本不整段保存：能由数值按行格式原样还原的行只记2字节布局编码，其余行（无法识别、
+    写法特殊）原文存入 raw；text() 按布局还原出与页面逐字节一致的原文，断点文件照常写出。
+    """
+
+    layout: bytes
+    raw: tuple
+    amounts: array
+    nrv_percent: array
+    units: array
+
+    @classmethod
+    def parse(cls, texts):
+        """解析 {字段: 换行拼接的营养素文本}（字段为 NUTRIENT_FIELDS 中的名称）"""
+        size = len(NUTRIENT_NAMES)
+        nutrients = cls(b"", (), array('d', [math.nan]) * size, array('d', [math.nan]) * size,
+                        array('B', bytes(size)))
+        layout, raw, lines = array('H'), [], {}
+        for key in NUTRIENT_FIELDS:
+            text = texts.get(key) or ""
+            for line in text.split("\n") if text else ():
+                match = NUTRIENT_LINE_PATTERN.match(line.strip())
+                code = UNITS.code(match["unit"].strip()) if match else None
+                if code is None:
+                    # 无法识别的行只保留原文
+                    layout.append(RAW_LINE | len(raw))
+                    raw.append(line)
+                    continue
+                i = NUTRIENT_INDEX[PAGE_NAMES.get(match["cn"], match["cn"])]
+                nutrients.amounts[i] = float(match["num"])
+                nutrients.nrv_percent[i] = float(match["nrv"])
+                nutrients.units[i] = code
+                if i in lines:
+                    # 同一营养素出现多次时数值取最后一行，之前的行改存原文
+                    position, previous = lines.pop(i)
+                    layout[position] = RAW_LINE | len(raw)
+                    raw.append(previous)
+                line_format = LINE_FORMATS.code((match["sp1"], decimals(match["nrv"]), match["sp2"], match["sp3"],
+                                                 decimals(match["num"]), match["sp4"]))
+                entry = None if line_format is None else line_format << 6 | (match["cn"] in PAGE_NAMES) << 5 | i
+                if entry is None or nutrients.render(entry) != line:
+                    layout.append(RAW_LINE | len(raw))  # 数值无法原样还原（如前导0、行首尾空白）
+                    raw.append(line)
+                    continue
+                lines[i] = (len(layout), line)
+                layout.append(entry)
+            layout.append(FIELD_END)
+        nutrients.layout, nutrients.raw = layout.tobytes(), tuple(raw)
+        return nutrients
+
+    def render(self, entry):
+        """按布局编码还原一行页面文本"""
+        if entry & RAW_LINE:
+            return self.raw[entry & ~RAW_LINE]
+        i = entry & 0x1F
+        sp1, nrv_decimals, sp2, sp3, num_decimals, sp4 = LINE_FORMATS[entry >> 6]
+        name = PAGE_SPELLINGS[i] if entry & 0x20 else NUTRIENT_NAMES[i]
+        return (f"{name}{sp1}{self.nrv_percent[i]:.{nrv_decimals}f}%{sp2}NRV{sp3}"
+                f"{self.amounts[i]:.{num_decimals}f}{sp4}{UNITS[self.units[i]]}")
+
+    def texts(self):
+        """各字段换行拼接的页面原文（按 NUTRIENT_FIELDS 顺序）"""
+        layout = array('H')
+        layout.frombytes(self.layout)
+        texts, lines = [], []
+        for entry in layout:
+            if entry == FIELD_END:
+                texts.append("\n".join(lines))
+                lines = []
+            else:
+                lines.append(self.render(entry))
+        return tuple(texts)
+
+    def get(self, cn):
+        """单个营养素 (含量, NRV%, 单位)，缺失时返回None"""
+        i = NUTRIENT_INDEX[cn]
+        if math.isnan(self.amounts[i]):
+            return None
+        return self.amounts[i], self.nrv_percent[i], UNITS[self.units[i]]
+
+    def text(self, key):
+        """字段的页面原文（如"能量8% NRV163.00千卡\n蛋白质..."），供断点文件和清洗代码使用"""
+        return self.texts()[NUTRIENT_FIELDS.index(key)]
+
+    def __eq__(self, other):
+        # 数值由原文解析得到，比较还原出的原文即可
+        if not isinstance(other, Nutrients):
+            return NotImplemented
+        return self.texts() == other.texts()
+
+
+# ==================== 爬虫记录 ====================
+def record_error(data, name_key):
+    """断点文件中记录的错误信息，成功记录返回空字符串（判定与 checkpoint_store.is_failed_record 一致）"""
+    if "错误信息" in data:
+        return data["错误信息"] or "未知错误"
+    name = data.get(name_key) or ""
+    if not name:
+        return "名称为空"
+    return name if "处理失败" in name else ""
+
+
+class RecordMixin:
+    """记录类与断点文件（中文键字典）之间的转换
+
+    KEYS 按断点文件的字段顺序列出 中文键 -> 属性名；属性名为 None 的是营养素文本字段，由 nutrients 给出原文。
+    FAILED_KEYS 为原脚本失败记录的字段（首个为ID），错误信息写在 ERROR_KEY 字段，其余字段为空字符串。
+    """
+
+    __slots__ = ()
+    KEYS = {}
+    FAILED_KEYS = ()
+    ERROR_KEY = ""
+
+    def to_dict(self):
+        """转为断点文件中的中文键字典（失败记录为原脚本的失败记录格式）"""
+        if self.error:
+            return self.failed_dict()
+        texts = self.nutrients.texts() if self.nutrients else ("",) * len(NUTRIENT_FIELDS)
+        return {key: getattr(self, attr) if attr else texts[NUTRIENT_FIELDS.index(key)]
+                for key, attr in self.KEYS.items()}
+
+    def failed_dict(self):
+        """原脚本的失败记录格式"""
+        id_key = self.FAILED_KEYS[0]
+        values = {id_key: getattr(self, self.KEYS[id_key]), self.ERROR_KEY: self.error}
+        return {key: values.get(key, "") for key in self.FAILED_KEYS}
+
+    @classmethod
+    def from_dict(cls, data):
+        """从断点文件的记录构建（营养素文本解析为数值）"""
+        id_key, name_key = list(cls.KEYS)[:2]
+        values = {attr: data.get(key) or "" for key, attr in cls.KEYS.items() if attr}
+        values[cls.KEYS[id_key]] = data.get(id_key)
+        return cls(**values, error=record_error(data, name_key),
+                   nutrients=Nutrients.parse({key: data.get(key) for key in NUTRIENT_FIELDS}))
+
+    @classmethod
+    def failed(cls, item_id, error):
+        """失败记录"""
+        return cls(item_id, error=error)
+
+
+@dataclass(slots=True)
+class DishRecord(RecordMixin):
+    """菜品详情记录"""
+
+    KEYS = {"菜品ID": "dish_id", "菜品名称": "name", "成分": "composition", "计量单位": "unit",
+            "图片URL": "image_url", "本地图片路径": "image_path", "菜肴做法": "cooking_method",
+            "能量及宏量营养素": None, "维生素": None, "矿物质": None, "单位量": "quantity"}
+    FAILED_KEYS = ("菜品ID", "错误信息", "图片URL", "本地保存路径")
+    ERROR_KEY = "错误信息"
+
+    dish_id: int
+    name: str = ""
+    composition: str = ""
+    unit: str = ""
+    image_url: str = ""
+    image_path: str = ""
+    cooking_method: str = ""
+    quantity: str = ""
+    nutrients: Nutrients = None
+    error: str = ""  # 非空表示失败记录
+
+
+@dataclass(slots=True)
+class FoodRecord(RecordMixin):
+    """食物详情记录"""
+
+    KEYS = {"食物ID": "food_id", "食物名称": "name", "成分": "composition", "计量单位": "unit",
+            "图片URL": "image_url", "本地图片路径": "image_path", "单位量": "quantity",
+            "能量及宏量营养素": None, "维生素": None, "矿物质": None}
+    # 食物的失败记录把错误信息写在名称字段
+    FAILED_KEYS = ("食物ID", "食物名称", "成分", "计量单位", "图片URL", "本地保存路径", "单位量")
+    ERROR_KEY = "食物名称"
+
+    food_id: int
+    name: str = ""
+    composition: str = ""
+    unit: str = ""
+    image_url: str = ""
+    image_path: str = ""
+    quantity: str = ""
+    nutrients: Nutrients = None
+    error: str = ""
+
+
+RECORD_TYPES = {"dish": DishRecord, "food": FoodRecord}
+
+
+def as_dict(record):
+    """记录类转为中文键字典（已是字典的原样返回）"""
+    return record.to_dict() if isinstance(record, RecordMixin) else record
+
+
+# ==================== 列表页行 ====================
+class RowMixin:
+    """列表页行与CSV行（中文表头）之间的转换"""
+
+    __slots__ = ()
+    HEADERS = {}
+
+    def to_dict(self):
+        return {header: getattr(self, attr) for header, attr in self.HEADERS.items()}
+
+    @classmethod
+    def from_dict(cls, row):
+        return cls(**{attr: row.get(header, "") for header, attr in cls.HEADERS.items()})
+
+    @classmethod
+    def fieldnames(cls):
+        return list(cls.HEADERS)
+
+
+@dataclass(slots=True)
+class DishListRow(RowMixin):
+    """菜品列表页的一行"""
+
+    HEADERS = {"总序号": "seq", "页码": "page", "名称": "name", "能量": "energy", "分类": "category",
+               "配料": "ingredients"}
+
+    seq: int
+    page: int
+    name: str
+    energy: str
+    category: str
+    ingredients: str
+
+    def __post_init__(self):
+        self.seq, self.page = int(self.seq), int(self.page)  # 从CSV读入时为字符串
+
+
+@dataclass(slots=True)
+class FoodCategoryRow(RowMixin):
+    """食物分类表格的一行（含所属一级/二级分类）"""
+
+    HEADERS = {"一级分类": "primary", "二级分类": "secondary", "食部(%)": "edible", "水分(%)": "water",
+               "能量(kcal)": "energy", "蛋白质(g)": "protein", "脂肪(g)": "fat", "碳水化合物(g)": "carbohydrates",
+               "钠(mg)": "sodium", "名称": "name"}
+
+    primary: str
+    secondary: str
+    edible: str
+    water: str
+    energy: str
+    protein: str
+    fat: str
+    carbohydrates: str
+    sodium: str
+    name: str
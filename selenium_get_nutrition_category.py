@@ -5,14 +5,22 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import (NoSuchElementException, TimeoutException,
                                         ElementClickInterceptedException)
+import os
 import csv
+import json
 import time
-import random
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from selenium.webdriver.common.keys import Keys
+from rate_limiter import AdaptiveRateLimiter
+from records import DishListRow
 
+# 自适应限速器：替代固定随机延迟，翻页正常时逐步提速，超时或失败时降速
+rate_limiter = AdaptiveRateLimiter(initial_rate=1.0, max_rate=5.0)
 
-# 工具函数：随机延迟（提取通用逻辑）
-def random_delay(min_sec=0.2, max_sec=1):
-    time.sleep(random.uniform(min_sec, max_sec))
+LIST_URL = "https://nutridata.cn/database/list?id=2"
+SHARD_MANIFEST = "manifest.json"  # 本次运行写出的分片文件清单，合并时只读清单中的文件
 
 
 # 1. 初始化浏览器驱动（精简配置项，保留核心反爬设置）
@@ -61,7 +69,6 @@ def extract_single_page(driver, page_num):
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.TAG_NAME, "tbody"))
         )
-        random_delay()
 
         # 提取页面文本并处理
         lines = [line.strip() for line in driver.find_element(By.TAG_NAME, "body").text.split('\n')
@@ -96,39 +103,40 @@ def extract_single_page(driver, page_num):
             return []
 
         # 组装数据
-        return [{
-            "总序号": (page_num - 1) * 10 + i + 1,
-            "页码": page_num,
-            "名称": name_list[i],
-            "能量": data_list[3 * i],
-            "分类": data_list[3 * i + 1],
-            "配料": data_list[3 * i + 2]
-        } for i in range(match_count)]
+        return [DishListRow(
+            seq=(page_num - 1) * 10 + i + 1,
+            page=page_num,
+            name=name_list[i],
+            energy=data_list[3 * i],
+            category=data_list[3 * i + 1],
+            ingredients=data_list[3 * i + 2]
+        ) for i in range(match_count)]
 
     except Exception as e:
         print(f"第{page_num}页提取异常: {str(e)[:50]}")
         return []
 
 
-# 3. 分页爬取核心逻辑（简化分页跳转，合并重复判断）
+# 3. 分页爬取核心逻辑（简化分页跳转，单页失败不终止整个爬取）
 def crawl_all_pages(driver, start_page, max_page, batch_size=5):
     all_dishes = []  # 存储所有数据
     current_batch = []  # 存储当前批次数据
+    failed_pages = []  # 跳转或提取失败的页码（可交给 crawl_pages_parallel 重爬）
     batch_number = 1  # 批次编号
     current_page = start_page
-    target_url = "https://nutridata.cn/database/list?id=2"
 
     try:
-        driver.get(target_url)
+        driver.get(LIST_URL)
         print(f"🚀 开始从第{start_page}页爬取，共{max_page}页，每批{batch_size}页")
+        page_ready = start_page == 1 or goto_page(driver, start_page)
 
         while current_page <= max_page:
             # 提取当前页数据
-            page_data = extract_single_page(driver, current_page)
+            page_data = extract_single_page(driver, current_page) if page_ready else []
             if page_data:
                 all_dishes.extend(page_data)
                 current_batch.extend(page_data)
-                print(f"✅ 第{current_page}页提取成功: {len(page_data)} 条菜品")
+                print(f"✅ 第{current_page}页提取成功: {len(page_data)} 条菜品 | 当前速率：{rate_limiter.current_rate:.2f} 页/秒")
 
                 # 当达到批次大小或最后一页时，保存批次数据
                 if len(current_batch) >= batch_size * 10 or current_page == max_page:
@@ -145,13 +153,19 @@ def crawl_all_pages(driver, start_page, max_page, batch_size=5):
                     # 重置当前批次并递增批次编号
                     current_batch = []
                     batch_number += 1
+            else:
+                failed_pages.append(current_page)
+                print(f"⚠️  第{current_page}页失败，已记录并继续")
 
-            # 跳转下一页
+            # 跳转下一页：优先点击下一页，失败（或当前页未就绪）时直接跳转到目标页
             if current_page < max_page:
-                if not navigate_next_page(driver, current_page):
-                    break  # 跳转失败则终止
+                rate_limiter.acquire()
+                nav_start_ts = time.time()
+                page_ready = page_ready and navigate_next_page(driver, current_page)
+                if not page_ready:
+                    page_ready = goto_page(driver, current_page + 1)
+                rate_limiter.report(ok=page_ready, latency=time.time() - nav_start_ts)
             current_page += 1
-            random_delay()
 
     except Exception as e:
         print(f"❌ 爬取中断: {e}")
@@ -163,20 +177,162 @@ def crawl_all_pages(driver, start_page, max_page, batch_size=5):
             save_matched_data(current_batch, "总数据_所有菜品信息.csv", mode='a')
             print(f"💾 最后批次{batch_number}保存完成，文件: {batch_filename}")
 
+        if failed_pages:
+            print(f"⚠️  失败页码（共{len(failed_pages)}页）：{failed_pages}")
         print(f"🎉 爬取完成！共提取{len(all_dishes)}条菜品信息")
         print(f"📁 总数据文件：总数据_所有菜品信息.csv")
         return all_dishes
 
+
+# 3.1 按页码直接跳转（分片并行爬取的基础）
+def wait_active_page(driver, page_num, timeout=10):
+    """等待分页器高亮页码变为page_num（精确匹配，不再扫描整个page_source）"""
+    WebDriverWait(driver, timeout).until(
+        lambda d: d.find_element(By.CSS_SELECTOR, ".el-pager li.active").text.strip() == str(page_num)
+    )
+
+
+def active_page(driver):
+    """分页器当前高亮的页码（读取失败时返回None）"""
+    try:
+        return int(driver.find_element(By.CSS_SELECTOR, ".el-pager li.active").text.strip())
+    except (NoSuchElementException, ValueError):
+        return None
+
+
+def goto_page(driver, page_num, timeout=10):
+    """通过分页器的跳页输入框直接跳到第page_num页，成功返回True（已在该页时直接返回）"""
+    try:
+        if active_page(driver) == page_num:
+            return True  # 表格不会刷新，等待首行变化只会白等到超时
+        first_row = driver.find_elements(By.CSS_SELECTOR, "tbody tr")
+        old_text = first_row[0].text if first_row else ""
+
+        jumper = WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, ".el-pagination__jump input"))
+        )
+        jumper.send_keys(Keys.CONTROL, "a")
+        jumper.send_keys(str(page_num), Keys.ENTER)
+        wait_active_page(driver, page_num, timeout)
+
+        # 等待表格内容刷新（首行文本变化），避免读到上一页的数据
+        if old_text:
+            try:
+                WebDriverWait(driver, timeout).until(
+                    lambda d: d.find_element(By.CSS_SELECTOR, "tbody tr").text != old_text
+                )
+            except TimeoutException:
+                pass
+        return True
+    except Exception as e:
+        print(f"❌ 跳转到第{page_num}页失败: {str(e)[:50]}")
+        return False
+
+
+def crawl_page_shard(driver, pages):
+    """爬取一个分片内的页码（逐页直接跳转），返回 (数据, 失败页码)"""
+    shard_data = []
+    failed_pages = []
+    for page_num in pages:
+        rate_limiter.acquire()
+        page_start_ts = time.time()
+        page_data = extract_single_page(driver, page_num) if goto_page(driver, page_num) else []
+        rate_limiter.report(ok=bool(page_data), latency=time.time() - page_start_ts)
+
+        if page_data:
+            shard_data.extend(page_data)
+        else:
+            failed_pages.append(page_num)
+    return shard_data, failed_pages
+
+
+def crawl_pages_parallel(pages, workers=3, shard_size=20, max_retries=2, shard_dir="菜品信息_分片",
+                         output_file="菜品信息.csv"):
+    """按页码分片并行爬取：每个线程独立浏览器，从队列领取分片；失败页单独重试，不影响其他页"""
+    os.makedirs(shard_dir, exist_ok=True)
+    pending = sorted(set(pages))
+    shard_files = []  # 本次运行写出的分片文件（目录中上次运行的残留文件不参与合并）
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        shard_queue = queue.Queue()
+        for i in range(0, len(pending), shard_size):
+            shard_queue.put(pending[i:i + shard_size])
+        print(f"🚀 第{attempt + 1}轮：{len(pending)} 页，{shard_queue.qsize()} 个分片，{workers} 个线程")
+
+        failed_pages = []
+        lock = threading.Lock()
+
+        def worker():
+            driver = init_driver()
+            if not driver:
+                return
+            try:
+                try:
+                    driver.get(LIST_URL)
+                except Exception as e:
+                    # 列表页打不开：本线程退出，未领取的分片留在队列中，本轮结束后计入失败页重试
+                    print(f"⚠️  列表页加载失败，线程退出：{str(e)[:50]}")
+                    return
+                while True:
+                    try:
+                        shard = shard_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    shard_data, shard_failed = crawl_page_shard(driver, shard)
+                    # 每个分片独立写文件，互不影响
+                    shard_file = f"第{shard[0]}-{shard[-1]}页_{attempt}.csv"
+                    save_batch_data(shard_data, os.path.join(shard_dir, shard_file))
+                    with lock:
+                        failed_pages.extend(shard_failed)
+                        if shard_data:
+                            shard_files.append(shard_file)
+                    print(f"💾 分片 第{shard[0]}-{shard[-1]}页 完成：{len(shard_data)} 条，失败 {len(shard_failed)} 页")
+            finally:
+                driver.quit()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(worker) for _ in range(workers)]:
+                future.result()
+
+        # 浏览器初始化失败时队列中可能残留分片，一并计入失败
+        while not shard_queue.empty():
+            failed_pages.extend(shard_queue.get_nowait())
+        pending = sorted(failed_pages)
+
+    if pending:
+        print(f"⚠️  重试后仍失败的页码（共{len(pending)}页）：{pending}")
+
+    with open(os.path.join(shard_dir, SHARD_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(sorted(shard_files), f, ensure_ascii=False, indent=2)
+    all_dishes = merge_shards(shard_dir, output_file)
+    print(f"🎉 并行爬取完成！共{len(all_dishes)}条菜品信息，文件：{output_file}")
+    return all_dishes
+
+
+def merge_shards(shard_dir, output_file):
+    """合并本次运行清单中的分片文件（按总序号去重、排序）"""
+    with open(os.path.join(shard_dir, SHARD_MANIFEST), 'r', encoding='utf-8') as f:
+        shard_files = json.load(f)
+    rows = {}
+    for filename in shard_files:
+        with open(os.path.join(shard_dir, filename), 'r', encoding='utf-8-sig', newline='') as f:
+            for row in map(DishListRow.from_dict, csv.DictReader(f)):
+                rows[row.seq] = row
+    all_dishes = [rows[key] for key in sorted(rows)]
+    save_batch_data(all_dishes, output_file)
+    return all_dishes
+
 # 辅助函数：保存批次数据（带表头）
 def save_batch_data(batch_data, filename):
     if not batch_data:
         return
 
-    headers = ["总序号", "页码", "名称", "能量", "分类", "配料"]
     with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
+        writer = csv.DictWriter(f, fieldnames=DishListRow.fieldnames())
         writer.writeheader()
-        writer.writerows(batch_data)
+        writer.writerows(row.to_dict() for row in batch_data)
 
 # 辅助函数：处理下一页跳转（分离关注点）
 def navigate_next_page(driver, current_page):
@@ -191,9 +347,7 @@ def navigate_next_page(driver, current_page):
             return False
 
         driver.execute_script("arguments[0].click();", next_btn)
-        WebDriverWait(driver, 10).until(
-            lambda d: str(current_page + 1) in d.page_source
-        )
+        wait_active_page(driver, current_page + 1)
         return True
 
     except Exception as e:
@@ -206,7 +360,6 @@ def save_matched_data(dish_list, filename="总数据_所有菜品信息.csv", mo
     if not dish_list:
         return
 
-    headers = ["总序号", "页码", "名称", "能量", "分类", "配料"]
     # 检查文件是否存在，不存在则写入表头
     file_exists = False
     try:
@@ -216,10 +369,10 @@ def save_matched_data(dish_list, filename="总数据_所有菜品信息.csv", mo
         pass
 
     with open(filename, mode, encoding='utf-8-sig', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
+        writer = csv.DictWriter(f, fieldnames=DishListRow.fieldnames())
         if mode == 'w' or (mode == 'a' and not file_exists):
             writer.writeheader()
-        writer.writerows(dish_list)
+        writer.writerows(row.to_dict() for row in dish_list)
 
 
 # 5. 主执行逻辑
@@ -227,6 +380,14 @@ if __name__ == '__main__':
     print("=" * 60)
     print("      菜品数据库全量爬取（2218页）      ")
     print("=" * 60)
+    START_PAGE = 1
+    MAX_PAGE = 2218
+    WORKERS = 1  # 大于1时按页码分片并行爬取（每个线程一个浏览器，直接跳转到目标页）
+
+    if WORKERS > 1:
+        all_dishes = crawl_pages_parallel(range(START_PAGE, MAX_PAGE + 1), workers=WORKERS)
+        print(f"\n📊 最终结果：共爬取{len(all_dishes)}条菜品信息")
+        exit()
 
     driver = init_driver()
     if not driver:
@@ -234,7 +395,7 @@ if __name__ == '__main__':
         exit()
 
     try:
-        all_dishes = crawl_all_pages(driver, start_page=1, max_page=2218, batch_size=100)
+        all_dishes = crawl_all_pages(driver, start_page=START_PAGE, max_page=MAX_PAGE, batch_size=100)
         print(f"\n📊 最终结果：共爬取{len(all_dishes)}条菜品信息")
         print(f"📁 数据文件：匹配后的菜品信息.csv")
     finally:
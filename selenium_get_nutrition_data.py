@@ -1,8 +1,4 @@
-import os
-import json
 import time
-import requests
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -10,54 +6,32 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from concurrent.futures import ThreadPoolExecutor, as_completed
-
-
-def get_text(soup, selector, is_single=True):
-    """提取选择器匹配的文本内容"""
-    try:
-        if is_single:
-            elem = soup.select_one(selector)
-            return elem.get_text(strip=True) if elem else "未获取到数据"
-        else:
-            elems = soup.select(selector)
-            return [el.get_text(strip=True) for el in elems] if elems else []
-    except Exception as e:
-        print(f"解析 [{selector}] 失败：{e}")
-        return "" if is_single else []
-
-
-def download_image(image_url, save_dir, dish_id):
-    """下载图片并以菜品ID命名"""
-    os.makedirs(save_dir, exist_ok=True)
-    filename = f"{dish_id}.jpg" if str(dish_id).strip() else "none.jpg"
-    save_path = os.path.join(save_dir, filename)
-
-    try:
-        with requests.Session() as session:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
-            }
-            resp = session.get(image_url, headers=headers, timeout=15, stream=True)
-            resp.raise_for_status()
-
-            with open(save_path, "wb") as f:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        return save_path
-    except Exception as e:
-        print(f"❌ 图片下载失败（ID:{dish_id}）：{e}")
-        return ""
-
-
-def save_to_json(data, filename):
-    """保存数据到JSON文件"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"📥 已保存到：{filename}")
+from functools import lru_cache
+from detail_parser import (make_tree, parse_dish_page, extract_image_url, needs_unit_click,
+                           READY_STATE_SCRIPT, TITLE_SELECTOR, EMPTY_STATE_SELECTOR)
+from http_fetch_engine import HttpFetchEngine, SessionExpiredError
+from driver_pool import DriverPool, DriverLoginError
+from checkpoint_store import CheckpointStore, is_failed_record
+from records import DishRecord, as_dict
+from image_pipeline import ImageDownloader
+from rate_limiter import AdaptiveRateLimiter
+from crawl_metrics import CrawlMetrics
+
+# 自适应限速器（所有线程共用）：响应健康时逐步提速，超时或登录失效时降速
+rate_limiter = AdaptiveRateLimiter(initial_rate=1.0, max_rate=5.0)
+# 逐ID各步骤耗时统计（所有线程共用）
+metrics = CrawlMetrics("dish")
+metrics.watch_rate_limiter(rate_limiter)
+
+
+@lru_cache(maxsize=1)
+def chromedriver_path():
+    """解析chromedriver路径（整个进程只解析一次）"""
+    return ChromeDriverManager().install()
 
 
 def init_driver():
-    """初始化Chrome浏览器配置（每个线程独立调用）"""
+    """初始化Chrome浏览器配置（由浏览器池按需调用）"""
     options = webdriver.ChromeOptions()
     options.add_argument("--headless=new")  # 无头模式
     options.add_argument("--disable-gpu")
@@ -78,7 +52,7 @@ def init_driver():
     options.page_load_strategy = 'eager'  # 只等待DOM加载完成，不等待资源加载
 
     driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
+        service=Service(chromedriver_path()),
         options=options
     )
 
@@ -123,9 +97,33 @@ def login_driver(driver, username, password):
         return False
 
 
+def wait_page_ready(driver, timeout=3):
+    """等待页面渲染完成（单个组合JS条件），返回 "ready"/"login"/"empty"，超时返回None"""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(READY_STATE_SCRIPT, TITLE_SELECTOR, EMPTY_STATE_SELECTOR)
+        )
+    except:
+        return None
+
+
+def expand_unit_dropdown(driver):
+    """点击展开单位下拉菜单（仅在选项未预先渲染到DOM时使用）"""
+    try:
+        WebDriverWait(driver, 2).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, 'div.unit-select .el-select__caret'))
+        ).click()
+        WebDriverWait(driver, 2).until(
+            EC.visibility_of_element_located((By.CSS_SELECTOR, ".el-select-dropdown__list .el-select-dropdown__item"))
+        )
+        return True
+    except:
+        return False
+
+
 def process_dish_batch(args):
-    """处理一批菜品数据提取（每个线程登录一次处理500个ID）"""
-    batch_id, dish_ids, username, password = args  # 接收参数：批次ID、菜品ID列表、账号、密码
+    """处理一批菜品数据提取（从浏览器池取出已登录的driver，处理完归还）"""
+    batch_id, dish_ids, pool, downloader = args  # 接收参数：批次ID、菜品ID列表、浏览器池、图片下载器
     driver = None
     batch_results = []
 
@@ -133,17 +131,13 @@ def process_dish_batch(args):
     start_time_ts = time.time()
 
     try:
-        # 每个线程创建独立的driver并登录一次
-        driver = init_driver()
-        if not login_driver(driver, username, password):
+        try:
+            with metrics.span("driver_acquire"):
+                driver = pool.acquire()
+        except DriverLoginError:
             # 登录失败，为该批次所有ID记录错误
             for dish_id in dish_ids:
-                batch_results.append({
-                    "菜品ID": dish_id,
-                    "错误信息": "登录失败",
-                    "图片URL": "",
-                    "本地保存路径": ""
-                })
+                batch_results.append(DishRecord.failed(dish_id, "登录失败"))
             return batch_results
 
         print(f"\n===== 开始处理批次 {batch_id}，共 {len(dish_ids)} 个菜品 =====")
@@ -154,84 +148,54 @@ def process_dish_batch(args):
                 url = f"https://nutridata.cn/database/dishes/{dish_id}"
                 print(f"[{batch_id}批次-{idx}/{len(dish_ids)}] 处理菜品 ID: {dish_id} | URL: {url}")
 
+                with metrics.span("rate_limit_wait"):
+                    rate_limiter.acquire()
+                page_start_ts = time.time()
+                page_ok = True
                 try:
-                    driver.get(url)
+                    with metrics.span("driver_get"):
+                        driver.get(url)
                 except:
+                    page_ok = False
+                    metrics.event("page_load_error")
                     print(f"页面加载超时，尝试继续处理 ID: {dish_id}")
 
-                # 等待关键元素
-                try:
-                    WebDriverWait(driver, 3).until(
-                        EC.visibility_of_element_located((By.CSS_SELECTOR, ".info-title.ellipsis-1"))
-                    )
-                except:
+                # 等待页面渲染完成（一次组合判断，不再分别等待标题、图片和下拉菜单）
+                with metrics.span("wait_ready"):
+                    state = wait_page_ready(driver)
+                if state is None:
+                    metrics.event("wait_ready_timeout")
                     print(f"核心元素加载超时，尝试继续处理 ID: {dish_id}")
-
-                # 提取图片信息
-                img_url = "未获取到图片URL"
+                rate_limiter.report(ok=page_ok, latency=time.time() - page_start_ts,
+                                    login_redirect=state == "login" or "login" in driver.current_url.lower())
+
+                # 图片和单位选项直接从DOM读取（下拉选项已隐藏渲染在页面中，无需点击）
+                with metrics.span("page_source"):
+                    soup = make_tree(driver.page_source)
+                if state == "ready" and needs_unit_click(soup):
+                    with metrics.span("unit_dropdown"):
+                        if expand_unit_dropdown(driver):
+                            soup = make_tree(driver.page_source)
+                        else:
+                            metrics.event("unit_dropdown_timeout")
+
+                img_url = extract_image_url(soup, driver.current_url)
                 img_local_path = ""
-                try:
-                    img_elem = WebDriverWait(driver, 2).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "span.el-link--inner img"))
-                    )
-                    img_url = img_elem.get_attribute("src") or img_url
-                    if img_url.startswith("http"):
-                        img_local_path = download_image(img_url, "dish_images", dish_id)
-                except:
-                    pass
-
-                # 展开单位下拉菜单
-                try:
-                    dropdown = WebDriverWait(driver, 2).until(
-                        EC.element_to_be_clickable((By.CSS_SELECTOR, 'div.unit-select .el-select__caret'))
-                    )
-                    dropdown.click()
-                    WebDriverWait(driver, 2).until(
-                        EC.visibility_of_element_located(
-                            (By.CSS_SELECTOR, ".el-select-dropdown__list .el-select-dropdown__item"))
-                    )
-                except:
-                    pass
-
-                # 解析页面数据
-                soup = BeautifulSoup(driver.page_source, "html.parser")
-                ingredients = get_text(soup, ".ingredients span")
-                steps = get_text(soup, ".practice-step", is_single=False)
-
-                batch_results.append({
-                    "菜品ID": dish_id,
-                    "菜品名称": get_text(soup, ".info-title.ellipsis-1"),
-                    "成分":"\n".join([i.replace("\n", " ").strip() for i in
-                                      get_text(soup, ".info-tag .tag-item", False)]),
-                    "计量单位": get_text(soup, ".title-tip"),
-                    "图片URL": img_url,
-                    "本地图片路径": img_local_path,
-                    "菜肴做法": f"{ingredients}\n" + "\n".join(steps) if (ingredients or steps) else "未获取到做法",
-                    "能量及宏量营养素": "\n".join([i.replace("\n", " ").strip() for i in
-                                                   get_text(soup, ".chart-item.color-class-0 .item-chart-outer",
-                                                            False)]),
-                    "维生素": "\n".join([i.replace("\n", " ").strip() for i in
-                                         get_text(soup, ".chart-item.color-class-1 .item-chart-outer", False)]),
-                    "矿物质": "\n".join([i.replace("\n", " ").strip() for i in
-                                         get_text(soup, ".chart-item.color-class-2 .item-chart-outer", False)]),
-                    "单位量": "\n".join(
-                        get_text(soup, ".el-select-dropdown__list .el-select-dropdown__item", False)) or "未获取到单位量"
-                })
+                if img_url.startswith("http"):
+                    with metrics.span("image_submit"):
+                        img_local_path = downloader.submit(dish_id, img_url)  # 异步下载，不阻塞页面抓取
+                with metrics.span("parse"):
+                    batch_results.append(parse_dish_page(soup, dish_id, img_url, img_local_path))
 
             except Exception as e:
                 error = f"处理失败: {e}"
                 print(f"❌ {error}")
-                batch_results.append({
-                    "菜品ID": dish_id,
-                    "错误信息": error,
-                    "图片URL": "",
-                    "本地保存路径": ""
-                })
+                batch_results.append(DishRecord.failed(dish_id, error))
 
         # 记录批次结束时间（仅用于控制台输出）
         end_time_ts =time.time()
         duration = round(end_time_ts - start_time_ts, 2)
-        print(f"===== 批次 {batch_id} 完成 | 总耗时：{duration} 秒 =====")
+        print(f"===== 批次 {batch_id} 完成 | 总耗时：{duration} 秒 | 当前速率：{rate_limiter.current_rate:.2f} 次/秒 =====")
 
         return batch_results
 
@@ -240,26 +204,141 @@ def process_dish_batch(args):
         print(f"❌ {error}")
         # 为该批次剩余未处理的ID记录错误
         for dish_id in dish_ids[len(batch_results):]:
-            batch_results.append({
-                "菜品ID": dish_id,
-                "错误信息": error,
-                "图片URL": "",
-                "本地保存路径": ""
-            })
+            batch_results.append(DishRecord.failed(dish_id, error))
         return batch_results
     finally:
         if driver:
-            driver.quit()  # 批次处理完成后关闭driver
+            pool.release(driver)  # 批次处理完成后归还driver，供后续批次复用
 
 
-def crawl_dish_data(start_id, end_id, username, password, batch_size=100, max_workers=3):
-    """批量爬取菜品数据（每次登录处理100条数据）"""
-    all_data = []
-    total = end_id - start_id + 1
-    print(f"🚀 开始爬取 [{start_id}-{end_id}]，共 {total} 条数据，每批处理 {batch_size} 条，线程数：{max_workers}")
+def fetch_dish_http(engine, downloader, dish_id):
+    """HTTP引擎抓取单个菜品（返回None表示需要Selenium兜底）"""
+    with metrics.span("rate_limit_wait"):
+        rate_limiter.acquire()
+    start_time_ts = time.time()
+    try:
+        with metrics.span("http_fetch"):
+            dish_data = engine.fetch_dish(dish_id)
+    except Exception as e:
+        metrics.event("http_fetch_error")
+        rate_limiter.report(ok=False, login_redirect=isinstance(e, SessionExpiredError))
+        print(f"HTTP抓取失败，转由Selenium处理 ID: {dish_id}：{e}")
+        return None
+    rate_limiter.report(latency=time.time() - start_time_ts)
+
+    if dish_data and dish_data.image_url.startswith("http"):
+        dish_data.image_path = downloader.submit(dish_id, dish_data.image_url)
+    return dish_data
+
+
+def save_progress(store, stats, batch_data, total):
+    """追加保存批次结果（只写新增记录）并输出总进度，同时刷新指标文件"""
+    store.append_many(batch_data)
+    metrics.flush()
+    stats["processed"] += len(batch_data)
+    # 与结束时的统计和断点续爬的判定一致（名称为空等记录同样算失败）
+    stats["success"] += len([d for d in batch_data if not is_failed_record(as_dict(d), "菜品名称")])
+    print(f"\n📊 总进度：{stats['processed']}/{total} | 成功：{stats['success']} | 失败：{stats['processed'] - stats['success']}")
+
+
+def crawl_dish_data_http(dish_ids, pool, downloader, batch_size, max_workers, store, stats, total, http_engine=None):
+    """HTTP引擎批量抓取菜品数据（复用池中浏览器的登录Cookie），返回需要Selenium兜底的ID列表
+
+    http_engine: 调用方已建立的HTTP引擎（多次调用共用，由调用方关闭）；为空时从浏览器池新建，结束后关闭
+    """
+    engine = http_engine
+    if engine is None:
+        try:
+            engine = HttpFetchEngine.from_pool(pool, pool_size=max_workers)
+        except Exception as e:  # 登录失败、页面加载超时或浏览器异常
+            print(f"❌ HTTP引擎获取登录态失败，全部转由Selenium处理：{e}")
+            return dish_ids
+
+    fallback_ids = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for i in range(0, len(dish_ids), batch_size):
+                batch_ids = dish_ids[i:i + batch_size]
+                batch_data = []
+                results = executor.map(lambda dish_id: fetch_dish_http(engine, downloader, dish_id), batch_ids)
+                for dish_id, dish_data in zip(batch_ids, results):
+                    if dish_data is None:
+                        fallback_ids.append(dish_id)
+                    else:
+                        batch_data.append(dish_data)
 
+                # 实时保存进度
+                save_progress(store, stats, batch_data, total)
+                print(f"🔁 [HTTP] 待Selenium兜底：{len(fallback_ids)}")
+    finally:
+        if http_engine is None:
+            engine.close()
+
+    return fallback_ids
+
+
+def crawl_dish_data(start_id, end_id, username, password, batch_size=100, max_workers=3, engine="selenium",
+                    progress_file="dishes_data_progress.jsonl", resume=False, image_workers=4,
+                    clean_db=None, metrics_file="dishes_crawl_metrics.prom", id_index=None):
+    """批量爬取菜品数据（每次登录处理100条数据），结果追加写入断点文件
+
+    engine: "selenium" 逐页浏览器渲染；"http" 免浏览器请求详情页，解析不到内容的ID再由Selenium兜底
+    resume: 断点续爬，只调度断点文件中缺失或失败的ID
+    image_workers: 后台图片下载并发数
+    clean_db: 流式清洗输出的SQLite文件，爬取过程中按块清洗写入（None 不启用）
+    metrics_file: 各步骤耗时直方图（Prometheus文本格式），每批次刷新一次（None 不写文件）
+    id_index: ID索引缓存文件，跳过已确认不存在的ID（None 不启用）
+    """
+    metrics.reset(metrics_file)
     # 生成所有菜品ID
     all_dish_ids = list(range(start_id, end_id + 1))
+    if id_index:
+        from id_discovery import refresh_index, NOT_FOUND_NAME
+        all_dish_ids = refresh_index("dish", id_index, progress_file).schedule(all_dish_ids)
+        print(f"🔎 ID索引：跳过已确认不存在的ID {end_id - start_id + 1 - len(all_dish_ids)} 个")
+    store = CheckpointStore(progress_file, "菜品ID")
+    cleaner = None
+    if clean_db:
+        from stream_cleaner import StreamCleaner  # 依赖pandas，只在启用时导入
+        cleaner = StreamCleaner("dish", clean_db)
+        store.add_listener(cleaner.add_many)  # 新记录写入断点文件的同时送入流式清洗
+    if resume:
+        scheduled = len(all_dish_ids)
+        # 启用ID索引时“未获取到数据”的ID也重新抓取，直到累计未命中次数确认其不存在（已由索引跳过）
+        all_dish_ids = store.pending_ids(all_dish_ids, "菜品名称", retry_names=(NOT_FOUND_NAME,) if id_index else ())
+        print(f"♻️ 断点续爬：跳过已成功 {scheduled - len(all_dish_ids)} 条，待爬取 {len(all_dish_ids)} 条")
+
+    total = len(all_dish_ids)
+    print(f"🚀 开始爬取 [{start_id}-{end_id}]，共 {total} 条数据，每批处理 {batch_size} 条，线程数：{max_workers}，引擎：{engine}")
+    stats = {"processed": 0, "success": 0}
+
+    # 已登录浏览器池，整个爬取过程共用（浏览器数量不超过线程数）
+    pool = DriverPool(max_workers, init_driver, login_driver, username, password)
+    # 图片下载独立成后台阶段，与页面抓取并行
+    downloader = ImageDownloader("dish_images", concurrency=image_workers, metrics=metrics)
+    try:
+        crawl_dish_batches(all_dish_ids, pool, downloader, batch_size, max_workers, engine, store, stats, total)
+    finally:
+        pool.close()
+        # 等待剩余图片下载完成，下载失败的记录清空本地图片路径
+        store.patch(downloader.close(), {"本地图片路径": ""})
+        if cleaner:
+            cleaner.close()
+        store.close()
+        print(f"⏱️ 浏览器获取耗时统计：{pool.acquire_stats()}")
+        metrics.flush()
+        print(f"⏱️ {metrics.summary()}")
+
+    return store
+
+
+def crawl_dish_batches(all_dish_ids, pool, downloader, batch_size, max_workers, engine, store, stats, total):
+    """按批次调度菜品ID，结果追加写入断点存储"""
+    if engine == "http":
+        all_dish_ids = crawl_dish_data_http(all_dish_ids, pool, downloader, batch_size, max_workers, store, stats, total)
+        if not all_dish_ids:
+            return
+        print(f"🔁 共 {len(all_dish_ids)} 个ID转由Selenium处理")
 
     # 分成多个批次
     batches = []
@@ -269,8 +348,8 @@ def crawl_dish_data(start_id, end_id, username, password, batch_size=100, max_wo
 
     print(f"📦 共分为 {len(batches)} 个批次")
 
-    # 准备任务参数：每个任务包含（批次号, 该批次的ID列表, 用户名, 密码）
-    task_args = [(batch_id, batch_ids, username, password) for batch_id, batch_ids in batches]
+    # 准备任务参数：每个任务包含（批次号, 该批次的ID列表, 浏览器池, 图片下载器）
+    task_args = [(batch_id, batch_ids, pool, downloader) for batch_id, batch_ids in batches]
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # 提交所有批次任务
@@ -281,25 +360,15 @@ def crawl_dish_data(start_id, end_id, username, password, batch_size=100, max_wo
             batch_id = futures[future]
             try:
                 batch_data = future.result()
-                all_data.extend(batch_data)
-
-                # 实时保存进度
-                success = len([d for d in all_data if '错误信息' not in d])
-                processed = len(all_data)
-                print(f"\n📊 总进度：{processed}/{total} | 成功：{success} | 失败：{processed - success}")
-                save_to_json(all_data, "dishes_data_progress.json")
             except Exception as e:
                 print(f"处理批次 {batch_id} 时发生异常: {e}")
 
                 # 记录该批次所有ID的错误
                 batch_ids = next(b[1] for b in batches if b[0] == batch_id)
-                for dish_id in batch_ids:
-                    all_data.append({
-                        "菜品ID": dish_id,
-                        "错误信息": f"批次处理异常: {e}"
-                    })
+                batch_data = [DishRecord.failed(dish_id, f"批次处理异常: {e}") for dish_id in batch_ids]
 
-    return all_data
+            # 实时保存进度
+            save_progress(store, stats, batch_data, total)
 
 
 if __name__ == "__main__":
@@ -308,10 +377,16 @@ if __name__ == "__main__":
     START_ID = 8456  # 起始ID
     END_ID = 34123  # 结束ID
     BATCH_SIZE = 500  # 每批处理的数量
-    MAX_WORKERS = 1  # 线程数（不宜过多，避免触发反爬）
-
-    result = crawl_dish_data(START_ID, END_ID, USERNAME, PASSWORD, BATCH_SIZE, MAX_WORKERS)
-    save_to_json(result, "dishes_data_complete.json")
-
-    success_count = len([d for d in result if '错误信息' not in d])
+    MAX_WORKERS = 3  # 线程数（总请求速率由自适应限速器控制）
+    FETCH_ENGINE = "selenium"  # 抓取引擎：selenium（浏览器渲染）/ http（免浏览器，失败ID自动回退Selenium）
+    RESUME = True  # 断点续爬：只重新抓取断点文件中缺失或失败的ID，无需手动修改START_ID
+    CLEAN_DB = "dishes_clean.db"  # 流式清洗输出（爬取中即可查询清洗后的数据；设为None不启用）
+    ID_INDEX = "dish_id_index.json"  # ID索引缓存：跳过多次抓取都没有内容的ID（设为None不启用）
+
+    store = crawl_dish_data(START_ID, END_ID, USERNAME, PASSWORD, BATCH_SIZE, MAX_WORKERS, engine=FETCH_ENGINE,
+                            resume=RESUME, clean_db=CLEAN_DB, id_index=ID_INDEX)
+    # 最终压缩：断点文件按ID去重（以最新记录为准）后输出完整JSON
+    result = store.compact("dishes_data_complete.json")
+
+    success_count = len([d for d in result if not is_failed_record(d, "菜品名称")])
     print(f"\n🎉 爬取完成！总数量：{len(result)} | 成功：{success_count} | 失败：{len(result) - success_count}")
@@ -1,24 +1,33 @@
 import os
+import re
 import csv
+import json
 import time
-import random
+import queue
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import (TimeoutException, StaleElementReferenceException,
-                                        ElementClickInterceptedException, NoSuchElementException)
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from logging.handlers import RotatingFileHandler
+from rate_limiter import AdaptiveRateLimiter
+from records import FoodCategoryRow
 
 # ==================== 配置常量 ====================
 TARGET_URL = "https://nutridata.cn/database/list?id=1"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
 TOTAL_DATA_FILE = "food_categories.csv"
+SHARD_DIR = "food_category_shards"  # 每个(一级, 二级)分类一个分片文件 + 完成标记
+SHARD_LIST_FILE = os.path.join(SHARD_DIR, "shards.json")  # 分类树遍历结果
 LOG_FILE = "category_crawl.log"
-DELAY_RANGE = (0.5, 2.5)  # 统一随机延迟范围（秒）
+TABLE_ROW_SELECTOR = ".el-table__body tr.el-table__row"
+EMPTY_TABLE_SELECTOR = ".el-table__empty-block"  # 表格“暂无数据”
+SECONDARY_WAIT = 5  # 点击一级分类后等待二级分类区块出现的时间（秒），超时且页面正常视为没有二级分类
 
 # 表格字段与列索引映射
 COLUMN_MAPPING = {
@@ -50,33 +59,60 @@ def setup_logging():
 logger = setup_logging()
 
 
+# 自适应限速器（替代固定随机延迟）：点击/翻页前取令牌，按响应情况自动调速
+rate_limiter = AdaptiveRateLimiter(initial_rate=1.0, max_rate=4.0)
+
+
 # ==================== 工具函数 ====================
-def random_delay():
-    """随机延迟"""
-    delay = random.uniform(*DELAY_RANGE)
-    time.sleep(delay)
+FIELDNAMES = FoodCategoryRow.fieldnames()  # 一级分类、二级分类 + COLUMN_MAPPING 各列
+
 
+def shard_name(primary, secondary):
+    """分片文件名（一级/二级分类名去除非法字符）"""
+    return re.sub(r'[\\/:*?"<>|\s]', '_', f"{primary}__{secondary or '全部'}")
 
-def init_csv():
-    """初始化CSV"""
-    if not os.path.exists(TOTAL_DATA_FILE):
-        with open(TOTAL_DATA_FILE, 'w', newline='', encoding='utf-8') as f:
-            csv.DictWriter(f, fieldnames=["一级分类", "二级分类"] + list(COLUMN_MAPPING.keys())).writeheader()
 
+def shard_done(shard):
+    """分片是否已完成（存在完成标记）"""
+    return os.path.exists(os.path.join(SHARD_DIR, f"{shard_name(*shard)}.done"))
 
-def save_data(primary, secondary, data_list):
-    """保存数据"""
-    with open(TOTAL_DATA_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=["一级分类", "二级分类"] + list(COLUMN_MAPPING.keys()))
-        for data in data_list:
-            writer.writerow({"一级分类": primary, "二级分类": secondary, **data})
+
+def save_shard(primary, secondary, data_list):
+    """保存单个分片数据：先写临时文件再替换，最后写完成标记"""
+    path = os.path.join(SHARD_DIR, f"{shard_name(primary, secondary)}.csv")
+    with open(f"{path}.tmp", 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(row.to_dict() for row in data_list)
+    os.replace(f"{path}.tmp", path)
+    with open(os.path.join(SHARD_DIR, f"{shard_name(primary, secondary)}.done"), 'w', encoding='utf-8') as f:
+        f.write(str(len(data_list)))
+
+
+def merge_shards(shards):
+    """按分类树顺序合并已完成的分片到总数据文件"""
+    total = 0
+    with open(TOTAL_DATA_FILE, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for shard in shards:
+            path = os.path.join(SHARD_DIR, f"{shard_name(*shard)}.csv")
+            if not shard_done(shard) or not os.path.exists(path):
+                continue
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            writer.writerows(rows)
+            total += len(rows)
+    logger.info(f"分片合并完成：{TOTAL_DATA_FILE}，共{total}条")
+    return total
 
 
 # ==================== 浏览器配置 ====================
 def init_driver():
-    """初始化浏览器"""
+    """初始化浏览器（无头模式，每个工作线程一个实例）"""
     options = webdriver.ChromeOptions()
-    options.add_argument("--start-maximized")
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1920,1080")
     options.add_argument(f"--user-agent={USER_AGENT}")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
@@ -96,11 +132,11 @@ def crawl_table_data(driver, primary_category, secondary_category):
     try:
         # 等待表格加载完成
         WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".el-table__body tr.el-table__row"))
+            EC.presence_of_element_located((By.CSS_SELECTOR, TABLE_ROW_SELECTOR))
         )
 
         data_list = []
-        rows = driver.find_elements(By.CSS_SELECTOR, ".el-table__body tr.el-table__row")
+        rows = driver.find_elements(By.CSS_SELECTOR, TABLE_ROW_SELECTOR)
 
         for row in rows:
             cells = row.find_elements(By.CSS_SELECTOR, "td.el-table__cell")
@@ -109,7 +145,7 @@ def crawl_table_data(driver, primary_category, secondary_category):
             if not cells[COLUMN_MAPPING["名称"]].text.strip():
                 continue
 
-            row_data = {}
+            row_data = {"一级分类": primary_category, "二级分类": secondary_category}
             for field, index in COLUMN_MAPPING.items():
                 try:
                     value = cells[index].text.strip().replace('\n', ' ')
@@ -117,12 +153,13 @@ def crawl_table_data(driver, primary_category, secondary_category):
                 except IndexError:
                     row_data[field] = ""
 
-            data_list.append(row_data)
+            data_list.append(FoodCategoryRow.from_dict(row_data))
 
         logger.info(f"已爬取 {primary_category} -> {secondary_category} 数据 {len(data_list)} 条")
         return data_list
 
     except TimeoutException:
+        rate_limiter.report(ok=False)
         logger.warning(f"{primary_category} -> {secondary_category} 表格加载超时")
         return []
     except Exception as e:
@@ -131,126 +168,257 @@ def crawl_table_data(driver, primary_category, secondary_category):
 
 
 def handle_pagination(driver, primary, secondary):
-    """处理分页"""
+    """处理分页，返回当前分类的全部数据
+
+    只有下一页按钮不存在或已禁用才视为最后一页；翻页或表格加载失败时抛出异常，由调用方重新入队整个分片。
+    """
     all_data = []
     current_page = 1
 
     while True:
         page_data = crawl_table_data(driver, primary, secondary)
         if not page_data:
-            break
+            if current_page == 1:
+                break  # 第一页为空：由 crawl_shard 区分“暂无数据”与加载失败
+            raise TimeoutException(f"[{primary}→{secondary}] 第{current_page}页表格未加载")
         all_data.extend(page_data)
 
-        # 尝试点击下一页
+        next_buttons = driver.find_elements(By.CSS_SELECTOR, ".btn-next")
+        if not next_buttons or next_buttons[0].get_attribute("disabled") is not None:
+            logger.info(f"[{primary}→{secondary}] 共{current_page}页，无更多数据")
+            break
+
+        rate_limiter.acquire()
+        page_start_ts = time.time()
         try:
-            next_btn = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, ".btn-next:not([disabled])"))
-            )
-            next_btn.click()
-            current_page += 1
-            random_delay()
+            WebDriverWait(driver, 10).until(EC.element_to_be_clickable(next_buttons[0])).click()
             # 验证页码切换
             WebDriverWait(driver, 10).until(
-                EC.text_to_be_present_in_element((By.CSS_SELECTOR, ".el-pager li.active"), str(current_page))
+                EC.text_to_be_present_in_element((By.CSS_SELECTOR, ".el-pager li.active"), str(current_page + 1))
             )
-        except (NoSuchElementException, TimeoutException):
-            logger.info(f"[{primary}→{secondary}] 共{current_page}页，无更多数据")
-            break
-        except Exception as e:
-            logger.error(f"[{primary}→{secondary}] 分页失败：{str(e)}")
-            break
+        except Exception:
+            rate_limiter.report(ok=False)
+            logger.error(f"[{primary}→{secondary}] 切换到第{current_page + 1}页失败")
+            raise
+        rate_limiter.report(latency=time.time() - page_start_ts)
+        current_page += 1
 
-    if all_data:
-        save_data(primary, secondary, all_data)
-    return len(all_data)
+    return all_data
 
 
-def get_categories(driver, level):
-    """获取分类（支持一级/二级）"""
-    xpath = f"//div[contains(text(), '{level}分类：')]/following-sibling::div[@class='field-detail']"
+def get_categories(driver, level, raise_errors=False):
+    """获取分类（支持一级/二级）；raise_errors 为True时获取失败抛出异常，否则返回空列表"""
+    xpath = category_xpath(level)
     try:
         driver.execute_script("window.scrollTo(0, 300);")
-        random_delay()
+        rate_limiter.acquire()
         container = WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.XPATH, xpath)))
         # 提取非"全部"的分类
         return [cat for cat in container.find_elements(By.CSS_SELECTOR, ".field-group-item")
                 if cat.text.strip() and cat.text.strip() != "全部"]
     except Exception as e:
-	    logger.warning(f"获取{level}分类失败：{str(e)}")
-	    return []
+        if raise_errors:
+            raise
+        logger.warning(f"获取{level}分类失败：{str(e)}")
+        return []
 
 
-def crawl_all(driver):
-    """主爬取逻辑"""
-    init_csv()
+def open_list_page(driver):
+    """打开食物列表页并等待加载完成"""
+    driver.get(TARGET_URL)
+    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.CLASS_NAME, "database-warp-container")))
+    rate_limiter.acquire()
 
-    # 获取一级分类
-    primary_cats = get_categories(driver, "一级")
-    if not primary_cats:
-        logger.error("无一级分类，终止爬取")
-        return
 
-    # 遍历一级分类
-    for i, primary_cat in enumerate(primary_cats, 1):
-        try:
-            primary_name = primary_cat.text.strip()
-            logger.info(f"\n===== 处理一级分类 {i}/{len(primary_cats)}：{primary_name} =====")
-
-            # 点击一级分类
-            WebDriverWait(driver, 10).until(EC.element_to_be_clickable(primary_cat)).click()
-            random_delay()
-
-            # 获取二级分类（允许为空）
-            secondary_cats = get_categories(driver, "二级")
-
-            # 如果没有二级分类，创建一个虚拟的空二级分类处理
-            if not secondary_cats:
-                logger.info(f"[{primary_name}] 无二级分类，直接爬取数据")
-                # 二级分类设为空字符串
-                total = handle_pagination(driver, primary_name, "")
-                logger.info(f"[{primary_name}→(无二级分类)] 完成，共{total}条")
-                continue
+def category_xpath(level):
+    """一级/二级分类区块的XPath"""
+    return f"//div[contains(text(), '{level}分类：')]/following-sibling::div[@class='field-detail']"
 
-            # 遍历二级分类
-            for j, secondary_cat in enumerate(secondary_cats, 1):
-                try:
-                    secondary_name = secondary_cat.text.strip()
-                    logger.info(f"[{primary_name}] 处理二级分类 {j}/{len(secondary_cats)}：{secondary_name}")
 
-                    # 点击二级分类
-                    WebDriverWait(driver, 10).until(EC.element_to_be_clickable(secondary_cat)).click()
-                    random_delay()
+def xpath_literal(text):
+    """文本转为XPath字符串字面量（含单引号的名称用双引号或concat()拼接）"""
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    return "concat(" + ", \"'\", ".join(f"'{part}'" for part in text.split("'")) + ")"
 
-                    # 爬取当前分类数据
-                    total = handle_pagination(driver, primary_name, secondary_name)
-                    logger.info(f"[{primary_name}→{secondary_name}] 完成，共{total}条")
 
-                except StaleElementReferenceException:
-                    logger.warning(f"[{secondary_name}] 元素失效，跳过")
-                except ElementClickInterceptedException:
-                    logger.warning(f"[{secondary_name}] 点击被拦截，跳过")
-                except Exception as e:
-                    logger.error(f"[{secondary_name}] 处理失败：{str(e)}")
+def select_category(driver, level, name):
+    """按名称点击分类（每次重新定位元素，不持有可能失效的元素引用）"""
+    xpath = f"{category_xpath(level)}//*[contains(@class, 'field-group-item') and normalize-space(.)={xpath_literal(name)}]"
+    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, xpath))).click()
+    rate_limiter.acquire()
+
+
+def has_secondary_block(driver):
+    """点击一级分类后是否出现二级分类区块
+
+    区块在 SECONDARY_WAIT 秒内未出现时，一级分类区块和表格仍正常则视为该一级分类没有二级分类；
+    页面本身未加载好时抛出异常（按获取失败处理）。
+    """
+    try:
+        WebDriverWait(driver, SECONDARY_WAIT).until(EC.presence_of_element_located((By.XPATH, category_xpath("二级"))))
+        return True
+    except TimeoutException:
+        WebDriverWait(driver, 10).until(lambda d: d.find_elements(By.XPATH, category_xpath("一级")) and
+                                        d.find_elements(By.CSS_SELECTOR, f"{TABLE_ROW_SELECTOR}, {EMPTY_TABLE_SELECTOR}"))
+        return False
 
-        except StaleElementReferenceException:
-            logger.warning(f"[{primary_name}] 元素失效，跳过")
+
+def get_secondary_names(driver, primary_name, retries=1):
+    """一级分类下的二级分类名，返回 (名称列表, 是否获取成功)；失败时重新打开列表页重试"""
+    for attempt in range(retries + 1):
+        try:
+            if attempt:
+                open_list_page(driver)
+            select_category(driver, "一级", primary_name)
+            if not has_secondary_block(driver):
+                return [], True  # 没有二级分类：与原逻辑一致，按二级分类为空的一个分片抓取
+            return [cat.text.strip() for cat in get_categories(driver, "二级", raise_errors=True)], True
         except Exception as e:
-            logger.error(f"[{primary_name}] 处理失败：{str(e)}")
+            logger.warning(f"[{primary_name}] 获取二级分类失败（{attempt + 1}/{retries + 1}）：{str(e)[:100]}")
+    return [], False
+
+
+def discover_shards(driver, primary_names=None):
+    """遍历分类树，返回 ([(一级分类, 二级分类)] 分片列表, 二级分类获取失败的一级分类)
+
+    无二级分类时二级为空字符串；获取失败的一级分类暂时整体作为一个分片，下次运行重新获取。
+    primary_names 为空时遍历全部一级分类。
+    """
+    shards, unresolved = [], []
+    if primary_names is None:
+        primary_names = [cat.text.strip() for cat in get_categories(driver, "一级")]
+    for i, primary_name in enumerate(primary_names, 1):
+        secondary_names, ok = get_secondary_names(driver, primary_name)
+        if not ok:
+            logger.error(f"[{primary_name}] 获取二级分类失败，本次整体作为一个分片，下次运行重新获取")
+            unresolved.append(primary_name)
+        shards.extend((primary_name, name) for name in secondary_names or [""])
+        logger.info(f"一级分类 {i}/{len(primary_names)}：{primary_name}，二级分类 {len(secondary_names)} 个")
+    return shards, unresolved
+
+
+def load_shards(driver):
+    """读取分片列表，不存在时遍历分类树生成并保存；上次二级分类获取失败的一级分类重新获取"""
+    shards, unresolved = [], None
+    if os.path.exists(SHARD_LIST_FILE):
+        with open(SHARD_LIST_FILE, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if isinstance(saved, list):  # 旧格式：只有分片列表
+            saved = {"shards": saved, "rediscover": []}
+        shards = [tuple(shard) for shard in saved["shards"]]
+        unresolved = saved["rediscover"]
+        if not unresolved:
+            return shards
+
+    open_list_page(driver)
+    if unresolved is None:
+        shards, unresolved = discover_shards(driver)
+    else:
+        logger.info(f"重新获取二级分类：{unresolved}")
+        rediscovered, unresolved = discover_shards(driver, unresolved)
+        # 按原分类树顺序替换这些一级分类的分片
+        replaced = {}
+        for primary, secondary in rediscovered:
+            replaced.setdefault(primary, []).append((primary, secondary))
+        merged, done = [], set()
+        for primary, secondary in shards:
+            if primary not in replaced:
+                merged.append((primary, secondary))
+            elif primary not in done:
+                merged.extend(replaced[primary])
+                done.add(primary)
+        shards = merged
+    if shards:
+        with open(SHARD_LIST_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"shards": shards, "rediscover": unresolved}, f, ensure_ascii=False, indent=2)
+    return shards
+
+
+def crawl_shard(driver, primary, secondary):
+    """爬取单个分片：从列表页重新进入分类后逐页抓取，返回行数"""
+    open_list_page(driver)
+    select_category(driver, "一级", primary)
+    if secondary:
+        select_category(driver, "二级", secondary)
+
+    data_list = handle_pagination(driver, primary, secondary)
+    # 没有数据且页面不是"暂无数据"，视为加载失败（交给重试）
+    if not data_list and not driver.find_elements(By.CSS_SELECTOR, EMPTY_TABLE_SELECTOR):
+        raise TimeoutException("表格未加载")
+    save_shard(primary, secondary, data_list)
+    return len(data_list)
+
+
+def crawl_shards_parallel(shards, workers=3, max_retries=2):
+    """多个无头浏览器并行处理分片队列，失败分片单独重新入队；返回最终失败的分片"""
+    task_queue = queue.Queue()
+    for shard in shards:
+        task_queue.put((shard, 0))
+    failed = []
+    lock = threading.Lock()
+
+    def worker():
+        driver = None
+        try:
+            driver = init_driver()
+            while True:
+                try:
+                    (primary, secondary), attempt = task_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    total = crawl_shard(driver, primary, secondary)
+                    logger.info(f"[{primary}→{secondary or '(无二级分类)'}] 完成，共{total}条 | 当前速率：{rate_limiter.current_rate:.2f} 次/秒")
+                except Exception as e:
+                    if attempt < max_retries:
+                        logger.warning(f"[{primary}→{secondary}] 失败，重新入队（{attempt + 1}/{max_retries}）：{str(e)[:100]}")
+                        task_queue.put(((primary, secondary), attempt + 1))
+                    else:
+                        logger.error(f"[{primary}→{secondary}] 重试后仍失败：{str(e)[:100]}")
+                        with lock:
+                            failed.append((primary, secondary))
+        except Exception as e:
+            logger.error(f"工作线程异常：{str(e)}")
+        finally:
+            if driver:
+                driver.quit()
 
-    logger.info("\n===== 所有分类爬取完成 =====")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
 
+    # 所有浏览器都初始化失败时，未处理的分片计入失败
+    while not task_queue.empty():
+        failed.append(task_queue.get_nowait()[0])
+    return failed
 
-def main():
+
+def main(workers=3):
     driver = None
     try:
         logger.info("===== 启动爬取程序 =====")
+        os.makedirs(SHARD_DIR, exist_ok=True)
+
+        # 分类树只遍历一次，生成分片列表
         driver = init_driver()
-        driver.get(TARGET_URL)
-        # 等待页面加载
-        WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.CLASS_NAME, "database-warp-container")))
-        random_delay()
-        # 开始爬取
-        crawl_all(driver)
+        shards = load_shards(driver)
+        driver.quit()
+        driver = None
+        if not shards:
+            logger.error("无一级分类，终止爬取")
+            return
+
+        # 已有完成标记的分片不再重复爬取
+        pending = [shard for shard in shards if not shard_done(shard)]
+        logger.info(f"共{len(shards)}个分片，待爬取{len(pending)}个，线程数：{workers}")
+        failed = crawl_shards_parallel(pending, workers=workers)
+        if failed:
+            logger.warning(f"失败分片（重新运行将只爬取这些分片）：{failed}")
+
+        merge_shards(shards)
     except Exception as e:
         logger.error(f"主程序错误：{str(e)}")
     finally:
@@ -261,4 +429,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    WORKERS = 3  # 并行浏览器数量（总请求速率由自适应限速器控制）
+    main(WORKERS)
@@ -1,10 +1,5 @@
-import os
-import json
 import time
-import random
 import logging
-import requests
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -13,15 +8,26 @@ from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from logging.handlers import RotatingFileHandler
+from detail_parser import (make_tree, parse_food_page, extract_image_url, needs_unit_click,
+                           READY_STATE_SCRIPT, TITLE_SELECTOR, EMPTY_STATE_SELECTOR)
+from http_fetch_engine import HttpFetchEngine, SessionExpiredError
+from driver_pool import DriverPool, DriverLoginError
+from checkpoint_store import CheckpointStore, is_failed_record
+from records import FoodRecord, as_dict
+from image_pipeline import ImageDownloader
+from rate_limiter import AdaptiveRateLimiter
+from crawl_metrics import CrawlMetrics
 
 # ==================== 配置常量 ====================
 BASE_URL = "https://nutridata.cn"
 LOGIN_URL = f"{BASE_URL}/login"
 FOOD_DETAIL_URL = f"{BASE_URL}/database/ingredient/{{food_id}}?baseId=1"
 IMAGE_SAVE_DIR = "food_images"
-PROGRESS_JSON = "foods_data_progress.json"  # 修正笔误 foodes->foods
+PROGRESS_JSONL = "foods_data_progress.jsonl"  # 追加写入的断点文件（每行一条记录）
 COMPLETE_JSON = "foods_data_complete.json"
+METRICS_FILE = "foods_crawl_metrics.prom"  # 各步骤耗时直方图（Prometheus文本格式）
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
 
 
@@ -53,64 +59,20 @@ def setup_logging():
 
 logger = setup_logging()
 
+# 自适应限速器（所有线程共用）：响应健康时逐步提速，超时或登录失效时降速
+rate_limiter = AdaptiveRateLimiter(initial_rate=1.0, max_rate=5.0)
+# 逐ID各步骤耗时统计（所有线程共用）
+metrics = CrawlMetrics("food")
+metrics.watch_rate_limiter(rate_limiter)
 
-# ==================== 工具函数 ====================
-def get_text(soup, selector, is_single=True):
-    """提取选择器匹配的文本内容"""
-    try:
-        if is_single:
-            elem = soup.select_one(selector)
-            return elem.get_text(strip=True) if elem else "未获取到数据"
-        else:
-            elems = soup.select(selector)
-            return [el.get_text(strip=True) for el in elems] if elems else []
-    except Exception as e:
-        logger.error(f"解析选择器 [{selector}] 失败：{e}")
-        return "" if is_single else []
-
-
-def download_image(image_url, save_dir, food_id, max_retries=2):
-    """下载图片并以食物ID命名（支持重试）"""
-    os.makedirs(save_dir, exist_ok=True)
-    filename = f"{food_id}.jpg" if str(food_id).strip() else "none.jpg"
-    save_path = os.path.join(save_dir, filename)
-
-    for retry in range(max_retries):
-        try:
-            with requests.Session() as session:
-                headers = {"User-Agent": USER_AGENT}
-                resp = session.get(
-                    image_url,
-                    headers=headers,
-                    timeout=15,
-                    stream=True
-                )
-                resp.raise_for_status()
-
-                with open(save_path, "wb") as f:
-                    for chunk in resp.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            logger.info(f"图片下载成功（ID:{food_id}）：{save_path}")
-            return save_path
-        except Exception as e:
-            logger.warning(f"图片下载失败（ID:{food_id}，重试 {retry + 1}/{max_retries}）：{e}")
-            if retry < max_retries - 1:
-                time.sleep(1)  # 重试间隔
-    logger.error(f"图片下载最终失败（ID:{food_id}）")
-    return ""
 
-
-def save_to_json(data, filename):
-    """保存数据到JSON文件"""
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        logger.info(f"数据已保存到：{filename}")
-    except Exception as e:
-        logger.error(f"保存JSON失败（{filename}）：{e}")
+# ==================== 浏览器配置 ====================
+@lru_cache(maxsize=1)
+def chromedriver_path():
+    """解析chromedriver路径（整个进程只解析一次）"""
+    return ChromeDriverManager().install()
 
 
-# ==================== 浏览器配置 ====================
 def init_driver():
     """初始化Chrome浏览器配置（增强反检测）"""
     options = webdriver.ChromeOptions()
@@ -135,7 +97,7 @@ def init_driver():
 
     # 初始化driver
     driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
+        service=Service(chromedriver_path()),
         options=options
     )
 
@@ -197,132 +159,119 @@ def login_driver(driver, username, password, max_retries=3):
 
 
 # ==================== 数据处理 ====================
-def process_single_food(driver, food_id):
+def wait_page_ready(driver, timeout=3):
+    """等待页面渲染完成（单个组合JS条件），返回 "ready"/"login"/"empty"，超时返回None"""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(READY_STATE_SCRIPT, TITLE_SELECTOR, EMPTY_STATE_SELECTOR)
+        )
+    except Exception:
+        return None
+
+
+def expand_unit_dropdown(driver):
+    """点击展开单位下拉菜单（仅在选项未预先渲染到DOM时使用）"""
+    try:
+        WebDriverWait(driver, 2).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, 'div.unit-select .el-select__caret'))
+        ).click()
+        WebDriverWait(driver, 2).until(
+            EC.visibility_of_element_located((By.CSS_SELECTOR, ".el-select-dropdown__list .el-select-dropdown__item"))
+        )
+        return True
+    except Exception as e:
+        logger.warning(f"展开单位下拉菜单失败：{e}")
+        return False
+
+
+def process_single_food(driver, food_id, downloader):
     """处理单个食物ID的数据提取"""
     try:
         url = FOOD_DETAIL_URL.format(food_id=food_id)
         logger.info(f"处理食物 ID: {food_id} | URL: {url}")
 
-        # 加载页面
+        # 加载页面（按限速器节奏发出请求）
+        with metrics.span("rate_limit_wait"):
+            rate_limiter.acquire()
+        page_start_ts = time.time()
+        page_ok = True
         try:
-            driver.get(url)
+            with metrics.span("driver_get"):
+                driver.get(url)
         except TimeoutException:
+            page_ok = False
+            metrics.event("page_load_error")
             logger.warning(f"页面加载超时（ID: {food_id}），继续处理")
         except Exception as e:
+            page_ok = False
+            metrics.event("page_load_error")
             logger.warning(f"页面加载错误（ID: {food_id}）：{e}")
 
-        # 等待关键元素
-        try:
-            WebDriverWait(driver, 3).until(
-                EC.visibility_of_element_located((By.CSS_SELECTOR, ".info-title.ellipsis-1"))
-            )
-        except TimeoutException:
+        # 等待页面渲染完成（一次组合判断，不再分别等待标题、图片和下拉菜单）
+        with metrics.span("wait_ready"):
+            state = wait_page_ready(driver)
+        if state is None:
+            metrics.event("wait_ready_timeout")
             logger.warning(f"核心元素加载超时（ID: {food_id}）")
-
-        # 提取图片信息
-        img_url = "未获取到图片URL"
+        rate_limiter.report(ok=page_ok, latency=time.time() - page_start_ts,
+                            login_redirect=state == "login" or "login" in driver.current_url.lower())
+
+        # 图片和单位选项直接从DOM读取（下拉选项已隐藏渲染在页面中，无需点击）
+        with metrics.span("page_source"):
+            soup = make_tree(driver.page_source)
+        if state == "ready" and needs_unit_click(soup):
+            with metrics.span("unit_dropdown"):
+                if expand_unit_dropdown(driver):
+                    soup = make_tree(driver.page_source)
+                else:
+                    metrics.event("unit_dropdown_timeout")
+
+        img_url = extract_image_url(soup, driver.current_url)
         img_local_path = ""
-        try:
-            img_elem = WebDriverWait(driver, 2).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "span.el-link--inner img"))
-            )
-            img_url = img_elem.get_attribute("src") or img_url
-            if img_url.startswith(("http://", "https://")):
-                img_local_path = download_image(img_url, IMAGE_SAVE_DIR, food_id)
-        except Exception as e:
-            logger.warning(f"提取图片失败（ID: {food_id}）：{e}")
-
-        # 展开单位下拉菜单
-        try:
-            dropdown = WebDriverWait(driver, 2).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, 'div.unit-select .el-select__caret'))
-            )
-            dropdown.click()
-            WebDriverWait(driver, 2).until(
-                EC.visibility_of_element_located(
-                    (By.CSS_SELECTOR, ".el-select-dropdown__list .el-select-dropdown__item"))
-            )
-        except Exception as e:
-            logger.warning(f"展开单位下拉菜单失败（ID: {food_id}）：{e}")
+        if img_url.startswith(("http://", "https://")):
+            with metrics.span("image_submit"):
+                img_local_path = downloader.submit(food_id, img_url)  # 异步下载，不阻塞页面抓取
 
         # 解析页面数据
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-
-        # 成分提取映射（减少重复代码）
-        components = [
-            ("能量及宏量营养素", ".chart-item.color-class-0 .item-chart-outer"),
-            ("维生素", ".chart-item.color-class-1 .item-chart-outer"),
-            ("矿物质", ".chart-item.color-class-2 .item-chart-outer")
-        ]
-
-        food_data = {
-            "食物ID": food_id,
-            "食物名称": get_text(soup, ".info-title.ellipsis-1"),
-            "成分": "\n".join([i.replace("\n", " ").strip() for i in
-                               get_text(soup, ".info-desc .desc-item", False)]),
-            "计量单位": get_text(soup, ".title-tip"),
-            "图片URL": img_url,
-            "本地图片路径": img_local_path,
-            "单位量": "\n".join(
-                get_text(soup, ".el-select-dropdown__list .el-select-dropdown__item", False)) or "未获取到单位量"
-        }
-
-        # 批量提取成分数据
-        for name, selector in components:
-            food_data[name] = "\n".join([i.replace("\n", " ").strip() for i in get_text(soup, selector, False)])
+        with metrics.span("parse"):
+            food_data = parse_food_page(soup, food_id, img_url, img_local_path)
 
         return food_data
 
     except Exception as e:
         error = f"处理失败: {str(e)}"
         logger.error(f"{error}（ID: {food_id}）")
-        return {
-            "食物ID": food_id,
-            "食物名称": error,
-            "成分": "",
-            "计量单位": "",
-            "图片URL": "",
-            "本地保存路径": "",
-            "单位量": ""
-        }
+        return FoodRecord.failed(food_id, error)
 
 
 def process_food_batch(args):
-    """处理一批食物数据（每个线程独立处理）"""
-    batch_id, food_ids, username, password = args
+    """处理一批食物数据（从浏览器池取出已登录的driver，处理完归还）"""
+    batch_id, food_ids, pool, downloader = args
     driver = None
     batch_results = []
     start_time_ts = time.time()
 
     try:
-        driver = init_driver()
-        if not login_driver(driver, username, password):
+        try:
+            with metrics.span("driver_acquire"):
+                driver = pool.acquire()
+        except DriverLoginError:
             # 登录失败，标记批次内所有ID错误
             for food_id in food_ids:
-                batch_results.append({
-                    "食物ID": food_id,
-                    "食物名称": "",
-                    "成分": "",
-                    "计量单位": "",
-                    "图片URL": "",
-                    "本地保存路径": "",
-                    "单位量": ""
-                })
+                batch_results.append(FoodRecord.failed(food_id, "处理失败: 登录失败"))
             return batch_results
 
         logger.info(f"\n===== 开始处理批次 {batch_id}，共 {len(food_ids)} 个食物 =====")
 
         for idx, food_id in enumerate(food_ids, 1):
             logger.info(f"[{batch_id}批次-{idx}/{len(food_ids)}] 启动处理")
-            food_data = process_single_food(driver, food_id)
+            food_data = process_single_food(driver, food_id, downloader)
             batch_results.append(food_data)
-            # 随机延迟避免反爬（模拟人工操作）
-            time.sleep(random.uniform(0.3, 1.5))
 
         # 批次完成统计
         end_time_ts = time.time()
         duration = round(end_time_ts - start_time_ts, 2)
-        logger.info(f"===== 批次 {batch_id} 完成 | 耗时：{duration} 秒 =====")
+        logger.info(f"===== 批次 {batch_id} 完成 | 耗时：{duration} 秒 | 当前速率：{rate_limiter.current_rate:.2f} 次/秒 =====")
         return batch_results
 
     except Exception as e:
@@ -331,36 +280,149 @@ def process_food_batch(args):
         # 补充未处理的ID错误信息
         processed_count = len(batch_results)
         for food_id in food_ids[processed_count:]:
-            batch_results.append({
-                "食物ID": food_id,
-                "食物名称": error,
-                "成分": "",
-                "计量单位": "",
-                "图片URL": "",
-                "本地保存路径": "",
-                "单位量": ""
-            })
+            batch_results.append(FoodRecord.failed(food_id, error))
         return batch_results
     finally:
         if driver:
-            driver.quit()
-            logger.info(f"批次 {batch_id} 的浏览器已关闭")
+            pool.release(driver)
+            logger.info(f"批次 {batch_id} 的浏览器已归还")
 
 
-def crawl_food_data(start_id, end_id, username, password, batch_size=100, max_workers=3):
-    """批量爬取食物数据主函数"""
-    all_data = []
-    total = end_id - start_id + 1
-    logger.info(f"开始爬取 [{start_id}-{end_id}]，共 {total} 条数据，每批 {batch_size} 条，线程数：{max_workers}")
+def fetch_food_http(engine, downloader, food_id):
+    """HTTP引擎抓取单个食物（返回None表示需要Selenium兜底）"""
+    with metrics.span("rate_limit_wait"):
+        rate_limiter.acquire()
+    start_time_ts = time.time()
+    try:
+        with metrics.span("http_fetch"):
+            food_data = engine.fetch_food(food_id)
+    except Exception as e:
+        metrics.event("http_fetch_error")
+        rate_limiter.report(ok=False, login_redirect=isinstance(e, SessionExpiredError))
+        logger.warning(f"HTTP抓取失败，转由Selenium处理（ID: {food_id}）：{e}")
+        return None
+    rate_limiter.report(latency=time.time() - start_time_ts)
+
+    if food_data and food_data.image_url.startswith(("http://", "https://")):
+        food_data.image_path = downloader.submit(food_id, food_data.image_url)
+    return food_data
+
+
+def save_progress(store, stats, batch_data, total):
+    """追加保存批次结果（只写新增记录）并输出总进度，同时刷新指标文件"""
+    store.append_many(batch_data)
+    metrics.flush()
+    stats["processed"] += len(batch_data)
+    # 与结束时的统计和断点续爬的判定一致（名称为空等记录同样算失败）
+    stats["success"] += len([d for d in batch_data if not is_failed_record(as_dict(d), "食物名称")])
+    logger.info(f"总进度：{stats['processed']}/{total} | 成功：{stats['success']} | 失败：{stats['processed'] - stats['success']}")
+
+
+def crawl_food_data_http(food_ids, pool, downloader, batch_size, max_workers, store, stats, total, http_engine=None):
+    """HTTP引擎批量抓取食物数据（复用池中浏览器的登录Cookie），返回需要Selenium兜底的ID列表
+
+    http_engine: 调用方已建立的HTTP引擎（多次调用共用，由调用方关闭）；为空时从浏览器池新建，结束后关闭
+    """
+    engine = http_engine
+    if engine is None:
+        try:
+            engine = HttpFetchEngine.from_pool(pool, pool_size=max_workers)
+        except Exception as e:  # 登录失败、页面加载超时或浏览器异常
+            logger.error(f"HTTP引擎获取登录态失败，全部转由Selenium处理：{e}")
+            return food_ids
+
+    fallback_ids = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for i in range(0, len(food_ids), batch_size):
+                batch_ids = food_ids[i:i + batch_size]
+                batch_data = []
+                results = executor.map(lambda food_id: fetch_food_http(engine, downloader, food_id), batch_ids)
+                for food_id, food_data in zip(batch_ids, results):
+                    if food_data is None:
+                        fallback_ids.append(food_id)
+                    else:
+                        batch_data.append(food_data)
 
-    # 生成所有食物ID并分批次
+                # 实时保存进度
+                save_progress(store, stats, batch_data, total)
+                logger.info(f"[HTTP] 待Selenium兜底：{len(fallback_ids)}")
+    finally:
+        if http_engine is None:
+            engine.close()
+
+    return fallback_ids
+
+
+def crawl_food_data(start_id, end_id, username, password, batch_size=100, max_workers=3, engine="selenium",
+                    resume=False, image_workers=4,
+                    clean_db=None, metrics_file=METRICS_FILE, id_index=None):
+    """批量爬取食物数据主函数，结果追加写入断点文件
+
+    engine: "selenium" 逐页浏览器渲染；"http" 免浏览器请求详情页，解析不到内容的ID再由Selenium兜底
+    resume: 断点续爬，只调度断点文件中缺失或失败的ID
+    image_workers: 后台图片下载并发数
+    clean_db: 流式清洗输出的SQLite文件，爬取过程中按块清洗写入（None 不启用）
+    metrics_file: 各步骤耗时直方图（Prometheus文本格式），每批次刷新一次（None 不写文件）
+    id_index: ID索引缓存文件，跳过已确认不存在的ID（None 不启用）
+    """
+    metrics.reset(metrics_file)
+    # 生成所有食物ID
     all_food_ids = list(range(start_id, end_id + 1))
+    if id_index:
+        from id_discovery import refresh_index, NOT_FOUND_NAME
+        all_food_ids = refresh_index("food", id_index, PROGRESS_JSONL).schedule(all_food_ids)
+        logger.info(f"ID索引：跳过已确认不存在的ID {end_id - start_id + 1 - len(all_food_ids)} 个")
+    store = CheckpointStore(PROGRESS_JSONL, "食物ID")
+    cleaner = None
+    if clean_db:
+        from stream_cleaner import StreamCleaner  # 依赖pandas，只在启用时导入
+        cleaner = StreamCleaner("food", clean_db)
+        store.add_listener(cleaner.add_many)  # 新记录写入断点文件的同时送入流式清洗
+    if resume:
+        scheduled = len(all_food_ids)
+        # 启用ID索引时“未获取到数据”的ID也重新抓取，直到累计未命中次数确认其不存在（已由索引跳过）
+        all_food_ids = store.pending_ids(all_food_ids, "食物名称", retry_names=(NOT_FOUND_NAME,) if id_index else ())
+        logger.info(f"断点续爬：跳过已成功 {scheduled - len(all_food_ids)} 条，待爬取 {len(all_food_ids)} 条")
+
+    total = len(all_food_ids)
+    logger.info(f"开始爬取 [{start_id}-{end_id}]，共 {total} 条数据，每批 {batch_size} 条，线程数：{max_workers}，引擎：{engine}")
+    stats = {"processed": 0, "success": 0}
+
+    # 已登录浏览器池，整个爬取过程共用（浏览器数量不超过线程数）
+    pool = DriverPool(max_workers, init_driver, login_driver, username, password)
+    # 图片下载独立成后台阶段，与页面抓取并行
+    downloader = ImageDownloader(IMAGE_SAVE_DIR, concurrency=image_workers, metrics=metrics)
+    try:
+        crawl_food_batches(all_food_ids, pool, downloader, batch_size, max_workers, engine, store, stats, total)
+    finally:
+        pool.close()
+        # 等待剩余图片下载完成，下载失败的记录清空本地图片路径
+        store.patch(downloader.close(), {"本地图片路径": ""})
+        if cleaner:
+            cleaner.close()
+        store.close()
+        logger.info(f"浏览器获取耗时统计：{pool.acquire_stats()}")
+        metrics.flush()
+        logger.info(metrics.summary())
+
+    return store
+
+
+def crawl_food_batches(all_food_ids, pool, downloader, batch_size, max_workers, engine, store, stats, total):
+    """按批次调度食物ID，结果追加写入断点存储"""
+    if engine == "http":
+        all_food_ids = crawl_food_data_http(all_food_ids, pool, downloader, batch_size, max_workers, store, stats, total)
+        if not all_food_ids:
+            return
+        logger.info(f"共 {len(all_food_ids)} 个ID转由Selenium处理")
+
     batches = [(i + 1, all_food_ids[i:i + batch_size])
                for i in range(0, len(all_food_ids), batch_size)]
     logger.info(f"共分为 {len(batches)} 个批次")
 
     # 提交线程任务
-    task_args = [(batch_id, batch_ids, username, password) for batch_id, batch_ids in batches]
+    task_args = [(batch_id, batch_ids, pool, downloader) for batch_id, batch_ids in batches]
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = {executor.submit(process_food_batch, args): args[0] for args in task_args}
 
@@ -369,21 +431,14 @@ def crawl_food_data(start_id, end_id, username, password, batch_size=100, max_wo
             batch_id = futures[future]
             try:
                 batch_data = future.result()
-                all_data.extend(batch_data)
-
-                # 实时保存进度
-                success = len([d for d in all_data if '错误信息' not in d])
-                processed = len(all_data)
-                logger.info(f"\n总进度：{processed}/{total} | 成功：{success} | 失败：{processed - success}")
-                save_to_json(all_data, PROGRESS_JSON)
             except Exception as e:
                 logger.error(f"处理批次 {batch_id} 时发生异常: {e}")
                 # 标记该批次所有ID为异常
                 batch_ids = next(b[1] for b in batches if b[0] == batch_id)
-                for food_id in batch_ids:
-                    all_data.append({"食物ID": food_id, "错误信息": f"批次异常: {e}"})
+                batch_data = [FoodRecord.failed(food_id, f"批次处理失败: {e}") for food_id in batch_ids]
 
-    return all_data
+            # 实时保存进度
+            save_progress(store, stats, batch_data, total)
 
 
 if __name__ == "__main__":
@@ -394,13 +449,19 @@ if __name__ == "__main__":
     END_ID = 5004  # 结束ID（包含）
     # 5004
     BATCH_SIZE = 500  # 每批次数量（建议根据反爬严格程度调整）
-    MAX_WORKERS = 1  # 线程数（建议1-3，避免触发反爬）
+    MAX_WORKERS = 3  # 线程数（总请求速率由自适应限速器控制）
+    FETCH_ENGINE = "selenium"  # 抓取引擎：selenium（浏览器渲染）/ http（免浏览器，失败ID自动回退Selenium）
+    RESUME = True  # 断点续爬：只重新抓取断点文件中缺失或失败的ID，无需手动修改START_ID
+    CLEAN_DB = "foods_clean.db"  # 流式清洗输出（爬取中即可查询清洗后的数据；设为None不启用）
+    ID_INDEX = "food_id_index.json"  # ID索引缓存：跳过多次抓取都没有内容的ID（设为None不启用）
 
     logger.info("===== 启动食物数据爬取任务 =====")
-    result = crawl_food_data(START_ID, END_ID, USERNAME, PASSWORD, BATCH_SIZE, MAX_WORKERS)
-    save_to_json(result, COMPLETE_JSON)
+    store = crawl_food_data(START_ID, END_ID, USERNAME, PASSWORD, BATCH_SIZE, MAX_WORKERS, engine=FETCH_ENGINE,
+                            resume=RESUME, clean_db=CLEAN_DB, id_index=ID_INDEX)
+    # 最终压缩：断点文件按ID去重（以最新记录为准）后输出完整JSON
+    result = store.compact(COMPLETE_JSON)
 
     # 统计结果
-    success_count = len([d for d in result if '错误信息' not in d])
+    success_count = len([d for d in result if not is_failed_record(d, "食物名称")])
     logger.info(f"\n===== 爬取完成 =====")
     logger.info(f"总数量：{len(result)} | 成功：{success_count} | 失败：{len(result) - success_count}")
@@ -0,0 +1,170 @@
+import sys
+import sqlite3
+import logging
+import threading
+import pandas as pd
+from checkpoint_store import CheckpointStore, is_failed_record
+
+# 清洗逻辑与 nutridata_data/cleaning_pipeline.py 共用
+from nutridata_data.nutrient_parser import (CN_TO_EN, NUTRIENT_DTYPES, combine_nutrient_text, expand_nutrients,
+                                            nutrient_columns)
+from nutridata_data.cleaning_pipeline import DATASETS, extract_num_unit
+
+logger = logging.getLogger(__name__)
+
+# ==================== 配置常量 ====================
+NOT_FOUND_NAME = "未获取到数据"  # 页面没有内容时的占位名称，与 cleaning_pipeline 一样不写入清洗结果
+# 爬虫记录字段 -> 数据表列名（与README中的表结构一致）
+RECORD_COLUMNS = {
+    "dish": {
+        "菜品ID": "dish_id",
+        "菜品名称": "dish_name",
+        "成分": "composition",
+        "计量单位": "measurement_unit",
+        "图片URL": "img_url",
+        "本地图片路径": "img_path",
+        "单位量": "quantity",
+        "菜肴做法": "cooking_method",
+        "能量及宏量营养素": "macronutrients",
+        "维生素": "vitamin",
+        "矿物质": "minerals",
+    },
+    "food": {
+        "食物ID": "food_id",
+        "食物名称": "food_name",
+        "成分": "ingredients",
+        "计量单位": "unit_of_measurement",
+        "图片URL": "image_url",
+        "本地图片路径": "local_image_path",
+        "单位量": "unit_amount",
+        "能量及宏量营养素": "energy_and_macronutrients",
+        "维生素": "vitamins",
+        "矿物质": "minerals",
+    },
+}
+
+
+def sql_type(column, config):
+    """列对应的SQLite类型"""
+    if column.endswith("_id"):
+        return "INTEGER"
+    for suffix, dtype in NUTRIENT_DTYPES.items():
+        if column.endswith(suffix):
+            return "INTEGER" if dtype == "Int64" else "REAL"
+    if column == config["measurement_column"] and config["measurement_numeric"]:
+        return "REAL"
+    return "TEXT"
+
+
+def sql_value(value):
+    """pandas/numpy取值转为SQLite可写入的Python值（缺失值 -> NULL）"""
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+class StreamCleaner:
+    """流式清洗：爬虫记录攒满一小块即解析营养素、提取计量单位，并追加写入SQLite
+
+    内存只保留一个块的数据，与ID范围大小无关；表采用WAL模式，爬取过程中即可查询已清洗的数据。
+    同一ID重复写入时以最后一次为准。
+    """
+
+    def __init__(self, dataset, db_path, chunk_size=500):
+        self.dataset = dataset
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.config = DATASETS[dataset]
+        self.record_columns = RECORD_COLUMNS[dataset]
+        self.id_key, self.name_key = list(self.record_columns)[:2]
+        self.table = f"{dataset}_clean"
+
+        # 固定表结构：基础列 + 全部营养素四列（无需随数据增加列）
+        base = [c for c in self.record_columns.values() if c not in self.config["nutrient_columns"]]
+        self.columns = base + nutrient_columns(*CN_TO_EN.values())
+
+        self.written = 0
+        self.skipped = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        column_defs = ", ".join(
+            f'"{c}" {sql_type(c, self.config)}' + (" PRIMARY KEY" if i == 0 else "")
+            for i, c in enumerate(self.columns)
+        )
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" ({column_defs})')
+        self._conn.commit()
+
+    def add_many(self, records):
+        """接收爬虫记录（失败记录和“未获取到数据”的占位记录跳过，等重新爬取成功后再写入）"""
+        with self._lock:
+            for record in records:
+                if is_failed_record(record, self.name_key) or NOT_FOUND_NAME in (record.get(self.name_key) or ""):
+                    self.skipped += 1
+                else:
+                    self._buffer.append(record)
+            if len(self._buffer) >= self.chunk_size:
+                self._flush()
+
+    def add(self, record):
+        self.add_many([record])
+
+    def clean_chunk(self, records):
+        """清洗一块记录，返回与表结构一致的DataFrame"""
+        config = self.config
+        df = pd.DataFrame.from_records(records).rename(columns=self.record_columns)
+        df = df.reindex(columns=list(self.record_columns.values()))
+        df[config["combined_column"]] = combine_nutrient_text(df, config["nutrient_columns"])
+
+        measurement = extract_num_unit(df[config["measurement_column"]])
+        if config["measurement_numeric"]:
+            measurement = pd.to_numeric(measurement, errors='coerce')
+        df[config["measurement_column"]] = measurement
+        for col, pattern in config["placeholder_patterns"].items():
+            df[col] = df[col].fillna('').str.replace(pattern, '', regex=True)
+
+        return expand_nutrients(df, config["combined_column"]).reindex(columns=self.columns)
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        chunk, self._buffer = self._buffer, []
+        df = self.clean_chunk(chunk)
+        placeholders = ", ".join("?" for _ in self.columns)
+        rows = [tuple(sql_value(v) for v in row) for row in df.itertuples(index=False, name=None)]
+        self._conn.executemany(f'INSERT OR REPLACE INTO "{self.table}" VALUES ({placeholders})', rows)
+        self._conn.commit()
+        self.written += len(rows)
+        logger.info(f"[流式清洗] 写入 {len(rows)} 条到 {self.db_path}（累计 {self.written} 条，跳过失败/占位记录 {self.skipped} 条）")
+
+    def flush(self):
+        """立即清洗并写入缓冲中的记录"""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+
+def backfill(dataset, progress_file, db_path, chunk_size=500):
+    """将已有的断点文件按块流式清洗写入SQLite（逐行读取，不整体加载）"""
+    id_key = list(RECORD_COLUMNS[dataset])[0]
+    cleaner = StreamCleaner(dataset, db_path, chunk_size)
+    try:
+        for record in CheckpointStore(progress_file, id_key).iter_records():
+            cleaner.add(record)
+    finally:
+        cleaner.close()
+    return cleaner.written
+
+
+if __name__ == "__main__":
+    # 用法：python stream_cleaner.py dish dishes_data_progress.jsonl dishes_clean.db
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 4 or sys.argv[1] not in RECORD_COLUMNS:
+        print("用法：python stream_cleaner.py {dish|food} <断点文件.jsonl> <输出.db>")
+        sys.exit(1)
+    backfill(*sys.argv[1:])
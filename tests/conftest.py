@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 脚本和清洗代码都从仓库根目录导入（清洗代码按 nutridata_data.<模块> 导入）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
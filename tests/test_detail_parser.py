@@ -0,0 +1,78 @@
+import os
+import json
+
+import pytest
+
+from detail_parser import (FIXTURE_DIR, GOLDEN_DIR, make_soup, make_tree, extract_image_url, dump_record,
+                           parse_dish_page, parse_food_page, lxml_html)
+from records import DishRecord, FoodRecord, Nutrients
+
+PAGES = sorted(f[:-len(".html")] for f in os.listdir(FIXTURE_DIR) if f.endswith(".html"))
+TREES = [pytest.param(make_soup, id="bs4"),
+         pytest.param(make_tree, id="lxml", marks=pytest.mark.skipif(lxml_html is None, reason="未安装lxml"))]
+
+
+def read_page(name):
+    with open(os.path.join(FIXTURE_DIR, f"{name}.html"), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def read_golden(name):
+    with open(os.path.join(GOLDEN_DIR, f"{name}.json"), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def parse_page(name, build_tree):
+    tree = build_tree(read_page(name))
+    parse = parse_dish_page if name.startswith("dish") else parse_food_page
+    return parse(tree, 1, extract_image_url(tree), "")
+
+
+def test_every_page_has_golden():
+    assert PAGES
+    for name in PAGES:
+        assert os.path.exists(os.path.join(GOLDEN_DIR, f"{name}.json")), name
+
+
+@pytest.mark.parametrize("build_tree", TREES)
+@pytest.mark.parametrize("name", PAGES)
+def test_matches_baseline_output(name, build_tree):
+    """解析结果与原脚本（get_text + BeautifulSoup）的输出逐字节一致"""
+    assert dump_record(parse_page(name, build_tree)) == read_golden(name)
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_checkpoint_round_trip(name):
+    """断点文件中的记录读回后写出不变"""
+    record = parse_page(name, make_soup)
+    data = record.to_dict()
+    assert type(record).from_dict(json.loads(json.dumps(data, ensure_ascii=False))).to_dict() == data
+
+
+def test_nutrient_values_parsed_from_page_text():
+    nutrients = parse_page("dish_3_layout", make_soup).nutrients
+    assert nutrients.get("能量") == (163.0, 23.0, "千卡")
+    assert nutrients.get("碳水化合物") == (123456.78, 1.0, "克")
+    assert nutrients.get("维生素B₆") == (0.14, 10.0, "mg")
+    assert nutrients.get("钠") == (900.0, 45.0, "mg")
+    assert nutrients.get("维生素A") is None
+
+
+def test_nutrient_text_keeps_only_irregular_lines():
+    """能由数值还原的行不存原文；前导0、行首空白、重复营养素等写法原文保留，还原结果不变"""
+    texts = {"能量及宏量营养素": "能量8% NRV163.00千卡\n膳食纤维—", "维生素": "维生素B61% NRV 0.10mg",
+             "矿物质": "钙01% NRV 11mg\n 钾5% NRV100.0mg\n钠2% NRV 50mg\n钠3% NRV 60mg"}
+    nutrients = Nutrients.parse(texts)
+    assert nutrients.raw == ("膳食纤维—", "钙01% NRV 11mg", " 钾5% NRV100.0mg", "钠2% NRV 50mg")
+    assert all(nutrients.text(key) == text for key, text in texts.items())
+    assert nutrients.get("钠") == (60.0, 3.0, "mg")
+    assert nutrients.get("维生素B₆") == (0.1, 1.0, "mg")
+
+
+def test_failed_records_keep_baseline_shape():
+    assert DishRecord.failed(5, "处理失败: 超时").to_dict() == {
+        "菜品ID": 5, "错误信息": "处理失败: 超时", "图片URL": "", "本地保存路径": ""}
+    assert FoodRecord.failed(5, "处理失败: 超时").to_dict() == {
+        "食物ID": 5, "食物名称": "处理失败: 超时", "成分": "", "计量单位": "", "图片URL": "", "本地保存路径": "",
+        "单位量": ""}
+    assert FoodRecord.from_dict(FoodRecord.failed(5, "处理失败: 超时").to_dict()).error == "处理失败: 超时"
@@ -0,0 +1,112 @@
+import os
+import json
+
+import requests
+
+from checkpoint_store import CheckpointStore
+from detail_parser import FIXTURE_DIR
+from id_discovery import IdIndex, MIN_MISSES, probe_ids
+
+EMPTY_PAGE = '<html><body><div id="app"><div class="el-empty"><p>暂无数据</p></div></div></body></html>'
+
+
+def read_page(filename):
+    with open(os.path.join(FIXTURE_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class PageEngine:
+    """按ID返回固定页面的抓取引擎（值为异常时抛出）"""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def fetch_html(self, path):
+        page = self.pages[int(path.rsplit("/", 1)[-1])]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_probe_classification(tmp_path):
+    engine = PageEngine({1: read_page("dish_1.html"), 2: read_page("dish_2_shell.html"), 3: EMPTY_PAGE,
+                         4: http_error(404), 5: http_error(503), 6: requests.ConnectionError()})
+    index = probe_ids(IdIndex(str(tmp_path / "index.json")), range(1, 7), engine, "dish", workers=2)
+
+    assert index.valid == {1}
+    assert index.absent == {4}
+    assert index.misses == {3: 1}
+
+
+def test_probe_shell_pages_never_become_missing(tmp_path):
+    engine = PageEngine({i: read_page("dish_2_shell.html") for i in range(1, 11)})
+    index = IdIndex(str(tmp_path / "index.json"))
+    for _ in range(MIN_MISSES + 1):
+        probe_ids(index, range(1, 11), engine, "dish", workers=2)
+
+    assert index.schedule(range(1, 11)) == list(range(1, 11))
+    assert index.summary(range(1, 11))["missing"] == 0
+
+
+def test_probe_empty_pages_reach_missing(tmp_path):
+    engine = PageEngine({1: EMPTY_PAGE})
+    index = IdIndex(str(tmp_path / "index.json"))
+    for _ in range(MIN_MISSES):
+        probe_ids(index, [1], engine, "dish", workers=1)
+
+    assert index.schedule([1]) == []
+
+
+def write_lines(path, records, tail=""):
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.write(tail)
+
+
+def test_update_from_checkpoint_offsets(tmp_path):
+    progress = str(tmp_path / "progress.jsonl")
+    index_path = str(tmp_path / "index.json")
+    write_lines(progress, [{"菜品ID": 1, "菜品名称": "拍黄瓜"},
+                           {"菜品ID": 2, "菜品名称": "未获取到数据"},
+                           {"菜品ID": 2, "菜品名称": "未获取到数据"},  # 同一次刷新内的重复行只算一次
+                           {"菜品ID": 3, "错误信息": "超时"}],
+                tail='{"菜品ID": 4, "菜品名')  # 未写完的末行留到下次读取
+
+    index = IdIndex(index_path)
+    index.update_from_checkpoint(progress, "菜品ID", "菜品名称")
+    index.save()
+    assert index.valid == {1}
+    assert index.misses == {2: 1}
+
+    # 重新加载后只统计新写入的记录，已统计的行不重复计数
+    write_lines(progress, [], tail='称": "宫保鸡丁"}\n')
+    index = IdIndex(index_path)
+    index.update_from_checkpoint(progress, "菜品ID", "菜品名称")
+    assert index.valid == {1, 4}
+    assert index.misses == {2: 1}
+
+    write_lines(progress, [{"菜品ID": 2, "菜品名称": "未获取到数据"}])
+    index.update_from_checkpoint(progress, "菜品ID", "菜品名称")
+    assert index.misses == {2: MIN_MISSES}
+    assert index.schedule([1, 2, 3, 4]) == [1, 3, 4]
+
+
+def test_update_from_checkpoint_rereads_replaced_file(tmp_path):
+    progress = str(tmp_path / "progress.jsonl")
+    write_lines(progress, [{"菜品ID": 1, "菜品名称": "拍黄瓜"}, {"菜品ID": 2, "菜品名称": "宫保鸡丁"}])
+    index = IdIndex(str(tmp_path / "index.json"))
+    index.update_from_checkpoint(progress, "菜品ID", "菜品名称")
+
+    # 断点文件被压缩替换为更短的文件时从头读取
+    os.remove(progress)
+    write_lines(progress, [{"菜品ID": 5, "菜品名称": "米饭"}])
+    index.update_from_checkpoint(progress, "菜品ID", "菜品名称")
+    assert index.valid == {1, 2, 5}
+    assert CheckpointStore(progress, "菜品ID").records_since(0)[1] == os.path.getsize(progress)
@@ -0,0 +1,53 @@
+import os
+
+from detail_parser import FIXTURE_DIR, make_tree, extract_image_url
+from image_url_service import ImageUrlService
+
+# 已渲染但没有图片的详情页
+NO_IMAGE_PAGE = '<html><body><div class="info-title ellipsis-1">拍黄瓜</div></body></html>'
+
+
+def read_page(filename):
+    with open(os.path.join(FIXTURE_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class PageEngine:
+    """按ID返回固定页面的抓取引擎"""
+
+    base_url = "http://example.test"
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = 0
+
+    def fetch_html(self, path):
+        self.requests += 1
+        return self.pages[int(path.rsplit("/", 1)[-1])]
+
+
+def test_shell_pages_are_unresolved_not_cached(tmp_path):
+    engine = PageEngine({1: read_page("dish_1.html"), 2: read_page("dish_2_shell.html"), 3: NO_IMAGE_PAGE})
+    service = ImageUrlService("dish", engine, cache_db=str(tmp_path / "cache.db"), workers=2)
+    try:
+        urls = service.get_many([1, 2, 3])
+        assert urls == {1: extract_image_url(make_tree(read_page("dish_1.html")), "http://example.test/x"), 3: None}
+        assert service.stats["unresolved"] == 1 and service.stats["missing"] == 1
+
+        # 空壳页面下次重新请求，“没有图片”走缓存
+        requests = engine.requests
+        service.get_many([2, 3])
+        assert engine.requests == requests + 1
+    finally:
+        service.close()
+
+
+def test_shell_pages_use_fallback(tmp_path):
+    engine = PageEngine({2: read_page("dish_2_shell.html")})
+    service = ImageUrlService("dish", engine, fallback=lambda item_id: f"https://img.test/{item_id}.jpg",
+                              cache_db=str(tmp_path / "cache.db"), workers=1)
+    try:
+        assert service.get_many([2]) == {2: "https://img.test/2.jpg"}
+        assert service.stats["fallback"] == 1
+    finally:
+        service.close()
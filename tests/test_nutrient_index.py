@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nutridata_data.nutrient_index import NutrientIndex
+from nutridata_data.nutrient_matrix import export_matrix, load_matrix
+
+
+@pytest.fixture
+def index(tmp_path):
+    # 0.1 等值以float32存储，与float64的阈值不相等；第4行蛋白质缺失
+    df = pd.DataFrame({"dish_id": [1, 2, 3, 4], "dish_name": ["甲", "乙", "丙", "丁"],
+                       "protein_num": [0.05, 0.1, 0.3, None], "protein_unit": ["g", "g", "g", None],
+                       "fat_num": [0.1, 0.1, 0.2, 0.1], "fat_unit": ["g", "g", "g", "g"]})
+    export_matrix("dish", df=df, base_dir=tmp_path)
+    return NutrientIndex(load_matrix("dish", tmp_path))
+
+
+@pytest.mark.parametrize("op, expected", [
+    ("==", [1]),
+    ("<=", [0, 1]),
+    (">=", [1, 2]),
+    ("<", [0]),
+    (">", [2]),
+])
+def test_filter_boundary(index, op, expected):
+    assert index.filter([f"protein_num{op}0.1"]).tolist() == expected
+
+
+@pytest.mark.parametrize("op, expected", [
+    ("==", [1]),
+    ("<=", [1]),
+    (">=", [1]),
+    ("<", []),
+    (">", []),
+])
+def test_filter_boundary_follow_up_condition(index, op, expected):
+    # fat_num==0.1 命中3行，protein_num 条件在其候选行上逐行比较
+    rows = index.filter(["protein_num>=0.1", "protein_num<=0.1", f"fat_num{op}0.1"])
+    assert rows.tolist() == expected
+
+
+@pytest.mark.parametrize("condition", ["protein_num>=0", "protein_num<1", "protein_num==0.1"])
+def test_filter_excludes_missing(index, condition):
+    assert 3 not in index.filter([condition]).tolist()
+    assert 3 not in index.filter(["fat_num==0.1", condition]).tolist()
+
+
+def test_sorted_column_skips_missing(index):
+    order, values = index.sorted_column("protein_num")
+    assert order.tolist() == [0, 1, 2]
+    assert not np.isnan(values).any()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nutridata_data.nutrient_matrix import export_matrix, load_matrix, main, unit_factor
+
+
+def dishes(**columns):
+    return pd.DataFrame({"dish_id": [1, 2, 3], "dish_name": ["拍黄瓜", "宫保鸡丁", "米饭"], **columns})
+
+
+@pytest.mark.parametrize("unit, target, factor", [
+    ("mg", "g", 0.001),
+    ("g", "mg", 1000.0),
+    ("μg RAE", "mg RAE", 0.001),
+    ("μgRAE", "μg RAE", 1.0),
+    ("kJ", "kcal", 1 / 4.184),
+    ("mg", "mg", 1.0),
+])
+def test_unit_factor(unit, target, factor):
+    assert unit_factor(unit, target) == pytest.approx(factor)
+
+
+@pytest.mark.parametrize("unit, target", [("mg", "kcal"), ("mg α-TE", "mg"), ("IU", "μg")])
+def test_unit_factor_inconvertible(unit, target):
+    assert unit_factor(unit, target) is None
+
+
+def test_export_converts_to_dominant_unit(tmp_path):
+    df = dishes(protein_num=[2.5, 300.0, None], protein_unit=["g", "mg", None],
+                sodium_num=[120.0, 0.5, 80.0], sodium_unit=["mg", "g", "mg"])
+    schema = export_matrix("dish", df=df, base_dir=tmp_path)
+    matrix = load_matrix("dish", tmp_path)
+
+    units = {n["en"]: n["unit"] for n in schema["nutrients"]}
+    assert units["protein"] == "g" and units["sodium"] == "mg"
+    np.testing.assert_allclose(matrix.column("protein"), [2.5, 0.3, np.nan])
+    np.testing.assert_allclose(matrix.column("sodium"), [120.0, 500.0, 80.0])
+
+
+def test_export_refuses_inconvertible_units(tmp_path):
+    df = dishes(energy_num=[163.0, 215.0, 116.0], energy_unit=["kcal", "kcal", "mg"])
+    with pytest.raises(ValueError, match="energy"):
+        export_matrix("dish", df=df, base_dir=tmp_path)
+
+
+def test_source_requires_single_dataset():
+    with pytest.raises(SystemExit):
+        main(["--source", "dish.parquet"])
+    with pytest.raises(SystemExit):
+        main(["dish", "food", "--source", "dish.parquet"])